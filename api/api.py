@@ -1,8 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import os
+import os, sys
+from pathlib import Path
 from . import engine
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:  # proxy/ и tools/ лежат в корне репозитория
+    sys.path.insert(0, str(ROOT))
+from proxy import timeouts, transport
+from proxy.lease import LeaseManager
+from proxy.ledger import get_ledger
+from proxy.pool import ProxyPool
+from proxy.revalidate import Revalidator
+from proxy.source_registry import get_registry
+
 app = FastAPI(title="AiChrome API", version="1.0")
 app.add_middleware(
     CORSMiddleware,
@@ -11,6 +22,44 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+pool = ProxyPool()
+revalidator = Revalidator(pool)
+leases = LeaseManager(pool, profiles_dir=engine.PROFILES_DIR)
+
+@app.on_event("startup")
+def _start_revalidation():
+    revalidator.start()
+
+@app.on_event("shutdown")
+def _stop_revalidation():
+    revalidator.stop(timeout=5)
+    get_registry().save()
+    get_ledger().flush()
+
+@app.get("/pool/revalidation")
+def pool_revalidation():
+    return revalidator.stats()
+
+@app.get("/pool/leases")
+def pool_leases():
+    return leases.occupancy()
+
+@app.get("/pool/sources")
+def pool_sources():
+    return get_registry().stats()
+
+@app.get("/pool/ledger")
+def pool_ledger():
+    return get_ledger().stats()
+
+@app.get("/pool/timeouts")
+def pool_timeouts():
+    return timeouts.stats()
+
+@app.get("/pool/sessions")
+def pool_sessions():
+    return transport.stats()
+
 @app.get("/health")
 def health(): 
     return {"ok": True}
@@ -0,0 +1,36 @@
+"""Shared fixtures: local stand-ins (tools/local_services) wired into proxy validation."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from proxy import geo, geoip
+from proxy.geo import GeoResolver
+from tools.local_services import EchoStandIn, GeoStandIn, ProxyFarm
+
+
+@pytest.fixture
+def no_offline_geoip():
+    """Offline geoip index switched off for the test; the previous one is restored on teardown."""
+    with geoip._index_lock:
+        saved = geoip._index, geoip._index_loaded
+    geoip.set_index(None)
+    yield
+    with geoip._index_lock:
+        geoip._index, geoip._index_loaded = saved
+
+
+@pytest.fixture
+def geo_stand_in(monkeypatch, tmp_path, no_offline_geoip):
+    """ip-api stand-in behind a fresh GeoResolver; fill .table for the IPs the test resolves."""
+    with GeoStandIn() as server:
+        monkeypatch.setattr(geo, "_resolver", GeoResolver(tmp_path / "geo.json", batch_url=server.batch_url, window=0))
+        yield server
+
+
+@pytest.fixture
+def stand_ins(monkeypatch, geo_stand_in):
+    """Echo target, proxy farm and ip-api stand-in; validate_proxy reaches the echo via AICHROME_ECHO_URL."""
+    with EchoStandIn() as echo, ProxyFarm(seed=0) as farm:
+        monkeypatch.setenv("AICHROME_ECHO_URL", echo.url)
+        yield SimpleNamespace(echo=echo, farm=farm, geo=geo_stand_in)
@@ -17,7 +17,9 @@ except Exception:  # pragma: no cover - fallback when ttkbootstrap missing
     tb = None
 
 from proxy.models import Proxy
+from proxy.lease import LeaseManager
 from proxy.pool import ProxyPool
+from proxy.revalidate import Revalidator
 from proxy.validate import ValidationResult, validate_proxy
 from tools.logging_setup import app_root, get_logger
 from ui.proxy_lab import ProxyLabFrame
@@ -577,12 +579,18 @@ class BrowserManagerApp:
         self.store = ProfileStore(PROFILES_PATH)
         self.profiles: List[Profile] = self.store.load()
         self.pool = ProxyPool()
+        # кэш проверок и запас под страны профилей греются фоном — Автопрокси не ждёт сети
+        self._want_proxies()
+        self.revalidator = Revalidator(self.pool).start()
+        # один прокси — не больше MAX_LEASES профилей одновременно; аренда живёт вместе с Chrome
+        self.leases = LeaseManager(self.pool, profiles_dir=ROOT / "profiles")
 
         self.status_var = tk.StringVar(value="Готово")
 
         self._build_ui()
         self._refresh_tree()
         self._start_status_timer()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _build_ui(self) -> None:
         toolbar = ttk.Frame(self.root, padding=10)
@@ -687,8 +695,14 @@ class BrowserManagerApp:
 
     def _save_profiles(self) -> None:
         self.store.save(self.profiles)
+        self._want_proxies()
         self._refresh_tree()
 
+    def _want_proxies(self) -> None:
+        for profile in self.profiles:
+            if profile.proxy_country:
+                self.pool.want(profile.proxy_country, profile.proxy_scheme or "http")
+
     def _human_dt(self, value: Optional[str]) -> str:
         if not value:
             return ""
@@ -736,6 +750,7 @@ class BrowserManagerApp:
         if not messagebox.askyesno("AiChrome", f"Удалить профиль '{profile.name}'?"):
             return
         self.profiles = [p for p in self.profiles if p.id != profile.id]
+        self.leases.release(profile.id)
         # удалить папку профиля
         prof_dir = ROOT / "profiles" / profile.id
         if prof_dir.exists():
@@ -766,6 +781,7 @@ class BrowserManagerApp:
 
     def reload_profiles(self) -> None:
         self.profiles = self.store.load()
+        self._want_proxies()
         self._refresh_tree()
         self.status_var.set("Профили обновлены")
 
@@ -856,16 +872,19 @@ class BrowserManagerApp:
         try:
             flags = [f"--window-size={profile.screen_width},{profile.screen_height}"]
 
-            # Pre-check proxy via validate_proxy (non-blocking) and decide fallback strategy
+            # Pre-check proxy via validate_proxy and decide fallback strategy;
+            # a proxy from the warm inventory validated moments ago is not re-checked
             use_pac = False
             try:
-                info = validate_proxy(proxy) if proxy else None
-                if proxy and not info:
+                info = (self.pool.fresh_result(proxy) or validate_proxy(proxy)) if proxy else None
+                if proxy and not info.ok:
                     # failed quick validation, fallback to PAC
                     use_pac = True
             except Exception:
                 use_pac = True
 
+            lock = ProfileLock(ROOT / "profiles" / profile.id)
+            lock.acquire()
             pid = launch_chrome(
                 profile_id=profile.id,
                 user_agent=profile.user_agent,
@@ -880,6 +899,8 @@ class BrowserManagerApp:
             log.error("Failed to launch Chrome: %s", exc)
             messagebox.showerror("AiChrome", f"Не удалось запустить Chrome: {exc}")
             return
+        # PID в lock-файле — по нему аренда прокси живёт, пока открыт Chrome
+        lock.update_pid(pid)
         details = f"PID {pid}"
         if proxy:
             details += f" — {proxy.scheme} {proxy.host}:{proxy.port} ({source})"
@@ -892,13 +913,13 @@ class BrowserManagerApp:
 
     def _autoproxy_for_profile(self, profile: Profile) -> Tuple[Proxy, str, Optional[ValidationResult]]:
         sticky = self.pool.get_sticky(profile.id)
-        if sticky:
-            log.info("Using sticky proxy for %s", profile.id)
-            return sticky, "sticky", None
         scheme = profile.proxy_scheme or "http"
-        proxy, result = self.pool.select_live(profile.proxy_country, scheme)
+        proxy, result = self.leases.acquire(profile.id, profile.proxy_country, scheme, prefer=sticky)
         if not proxy:
             raise RuntimeError("Не найден живой прокси: заполните пул через Proxy Lab")
+        if sticky and proxy == sticky:
+            log.info("Using sticky proxy for %s", profile.id)
+            return sticky, "sticky", None
         self.pool.set_sticky(profile.id, proxy)
         return proxy, "fresh", result
 
@@ -912,6 +933,14 @@ class BrowserManagerApp:
                 return profile
         return None
 
+    def _on_close(self) -> None:
+        # фоновая перепроверка отпускает revalidate.lock — её сразу подхватывает API
+        try:
+            self.revalidator.stop(timeout=2)
+        except Exception as e:
+            log.warning("revalidator stop error: %s", e)
+        self.root.destroy()
+
     def run(self) -> None:
         self.root.mainloop()
 
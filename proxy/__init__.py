@@ -4,7 +4,9 @@ from .models import Proxy
 from .pool import ProxyPool
 from .parse import parse_line, parse_lines_to_candidates
 from .validate import validate_proxy, ValidationResult
+from .async_validate import async_validate_many, async_validate_proxy, validate_many
 from .sources import gather_proxies_from_sources
+from .revalidate import Revalidator
 
 __all__ = [
     "Proxy",
@@ -13,5 +15,9 @@ __all__ = [
     "parse_lines_to_candidates",
     "validate_proxy",
     "ValidationResult",
+    "async_validate_many",
+    "async_validate_proxy",
+    "validate_many",
     "gather_proxies_from_sources",
+    "Revalidator",
 ]
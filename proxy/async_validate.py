@@ -0,0 +1,257 @@
+from __future__ import annotations
+import asyncio, queue, ssl, threading, time
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
+from proxy import timeouts
+from proxy.models import Proxy
+from proxy.countries import country_name
+from proxy.geo import lookup_country
+from proxy.geoip import lookup_cc
+from proxy.prescreen import CONNECT_TIMEOUT
+from proxy.prober import (
+    check_http_connect_reply, check_socks4_reply, check_socks5_auth,
+    check_socks5_method, default_echo_url, extract_ip, http_connect_request, http_get_request,
+    norm_scheme, parse_http_head, socks4_request, socks5_auth, socks5_connect, socks5_greeting,
+    socks5_reply_tail, split_url,
+)
+from proxy.validate import VALIDATE_TIMEOUT, ValidationResult
+
+DEFAULT_CONCURRENCY = 200   # одновременных проверок всего
+DEFAULT_PER_HOST = 4        # одновременных проверок на один хост прокси
+_MAX_BODY = 64 * 1024
+
+Item = Tuple[Proxy, ValidationResult]
+
+
+# ------------------------------------------------------------------
+# Рукопожатия HTTP CONNECT / SOCKS4(a) / SOCKS5 (байты — proxy.prober)
+async def _send(writer, data: bytes) -> None:
+    writer.write(data)
+    await writer.drain()
+
+
+async def _connect_http(reader, writer, p: Proxy, host: str, port: int) -> None:
+    await _send(writer, http_connect_request(host, port, p.username, p.password))
+    check_http_connect_reply(await reader.readuntil(b"\r\n\r\n"))
+
+
+async def _connect_socks4(reader, writer, p: Proxy, host: str, port: int) -> None:
+    await _send(writer, socks4_request(host, port, p.username))
+    check_socks4_reply(await reader.readexactly(8))
+
+
+async def _connect_socks5(reader, writer, p: Proxy, host: str, port: int) -> None:
+    await _send(writer, socks5_greeting(bool(p.username)))
+    if check_socks5_method(await reader.readexactly(2)) == 2:
+        await _send(writer, socks5_auth(p.username, p.password))
+        check_socks5_auth(await reader.readexactly(2))
+    await _send(writer, socks5_connect(host, port))
+    await reader.readexactly(socks5_reply_tail(await reader.readexactly(5)))
+
+
+_HANDSHAKES = {"http": _connect_http, "socks4": _connect_socks4, "socks5": _connect_socks5}
+
+
+# ------------------------------------------------------------------
+# Минимальный HTTP/1.1 клиент поверх готового потока
+async def _read_http_response(reader, marks: Optional[dict] = None) -> Tuple[int, bytes]:
+    first = await reader.readexactly(1)
+    if marks is not None:
+        marks["first_byte"] = time.perf_counter()
+    head = first + await reader.readuntil(b"\r\n\r\n")
+    status, headers = parse_http_head(head)
+    if "content-length" in headers:
+        body = await reader.readexactly(min(int(headers["content-length"]), _MAX_BODY))
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    else:
+        body = await reader.read(_MAX_BODY)
+    return status, body
+
+
+async def _http_get(reader, writer, host: str, path: str, marks: Optional[dict] = None) -> Tuple[int, bytes]:
+    await _send(writer, http_get_request(host, path))
+    return await _read_http_response(reader, marks)
+
+
+async def _start_tls(reader, writer, host: str):
+    """TLS поверх уже открытого туннеля; StreamWriter.start_tls есть только с Python 3.11."""
+    ctx = ssl.create_default_context()
+    if hasattr(writer, "start_tls"):
+        await writer.start_tls(ctx, server_hostname=host)
+        return reader, writer
+    loop = asyncio.get_running_loop()
+    tls_reader = asyncio.StreamReader()
+    protocol = asyncio.StreamReaderProtocol(tls_reader)
+    transport = await loop.start_tls(writer.transport, protocol, ctx, server_hostname=host)
+    protocol.connection_made(transport)
+    return tls_reader, asyncio.StreamWriter(transport, protocol, tls_reader, loop)
+
+
+async def _close(writer) -> None:
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+async def _geo_lookup(ip: str, timeout: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+    cc = lookup_cc(ip)
+    if cc:
+        return country_name(cc), cc
+    # сетевой fallback — GeoResolver (кэш + batch), в отдельном потоке
+    return await asyncio.to_thread(lookup_country, ip, timeout)
+
+
+# ------------------------------------------------------------------
+# Публичное API
+async def async_validate_proxy(p: Proxy, timeout: Optional[float] = None, *, echo_url: Optional[str] = None,
+                               geo: bool = True, connect_timeout: float = CONNECT_TIMEOUT,
+                               source: str = "async") -> ValidationResult:
+    """
+    Асинхронный аналог validate_proxy: туннель через прокси до эхо-сервиса.
+    connect_timeout — отдельный короткий лимит на TCP connect: мёртвый адрес
+    не ждёт полный timeout. timeout=None — адаптивный (proxy.timeouts).
+    """
+    if timeout is None:
+        timeout = timeouts.timeout_for(source, p.scheme, VALIDATE_TIMEOUT)
+    res = await _validate(p, timeout, echo_url, geo, connect_timeout)
+    timeouts.observe(source, p.scheme, res.ping_ms, res.ok, res.error)
+    return res
+
+
+async def _validate(p: Proxy, timeout: float, echo_url: Optional[str], geo: bool,
+                    connect_timeout: float) -> ValidationResult:
+    handshake = _HANDSHAKES.get(norm_scheme(p.scheme))
+    if handshake is None:
+        return ValidationResult(False, error=f"unsupported scheme {p.scheme}")
+    t_scheme, t_host, t_port, t_path = split_url(echo_url or default_echo_url())
+    t0 = time.perf_counter()
+    marks: dict = {}
+    writer = None
+
+    async def _probe() -> Tuple[int, bytes]:
+        nonlocal writer
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(p.host, int(p.port)),
+                                                min(connect_timeout, timeout))
+        marks["connect"] = time.perf_counter()
+        await handshake(reader, writer, p, t_host, t_port)
+        if t_scheme == "https":
+            reader, writer = await _start_tls(reader, writer, t_host)
+        marks["handshake"] = time.perf_counter()
+        return await _http_get(reader, writer, t_host, t_path, marks)
+
+    try:
+        status, body = await asyncio.wait_for(_probe(), timeout)
+        if status != 200:
+            return ValidationResult(False, error=f"echo HTTP {status}")
+        ip = extract_ip(body)
+        if not ip:
+            return ValidationResult(False, error="echo: empty ip")
+        ping = int((time.perf_counter() - t0) * 1000)
+    except asyncio.TimeoutError:
+        return ValidationResult(False, error=f"timeout {timeout}s")
+    except Exception as e:
+        return ValidationResult(False, error=(str(e) or type(e).__name__)[:200])
+    finally:
+        if writer is not None:
+            await _close(writer)
+
+    country = cc = None
+    if geo:
+        country, cc = await _geo_lookup(ip)
+    ms = lambda a, b: int((marks[b] - (marks[a] if a else t0)) * 1000)
+    return ValidationResult(True, ip=ip, country=country, cc=cc, ping_ms=ping,
+                            connect_ms=ms(None, "connect"), handshake_ms=ms("connect", "handshake"),
+                            first_byte_ms=ms("handshake", "first_byte"))
+
+
+async def _stream(proxies: Iterable[Proxy], stop: Optional[threading.Event], *,
+                  concurrency: int, per_host: int, **kwargs) -> AsyncIterator[Item]:
+    host_sems: Dict[str, asyncio.Semaphore] = {}
+
+    async def _one(p: Proxy) -> Item:
+        sem = host_sems.get(p.host)
+        if sem is None:
+            sem = host_sems[p.host] = asyncio.Semaphore(per_host)
+        async with sem:
+            return p, await async_validate_proxy(p, **kwargs)
+
+    it = iter(proxies)
+    exhausted = False
+    pending: set = set()
+    try:
+        while True:
+            # окно задач не больше concurrency — не создаём 100k корутин разом
+            while not exhausted and len(pending) < concurrency:
+                p = next(it, None)
+                if p is None:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(_one(p)))
+            if not pending or (stop is not None and stop.is_set()):
+                break
+            done, pending = await asyncio.wait(pending, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                yield t.result()
+    finally:
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def async_validate_many(proxies: Iterable[Proxy], *, concurrency: int = DEFAULT_CONCURRENCY,
+                              per_host: int = DEFAULT_PER_HOST, timeout: Optional[float] = None,
+                              echo_url: Optional[str] = None, geo: bool = True,
+                              connect_timeout: float = CONNECT_TIMEOUT, source: str = "async") -> AsyncIterator[Item]:
+    """
+    Проверяет прокси конкурентно и отдаёт (proxy, ValidationResult) по мере готовности.
+    concurrency — общий лимит, per_host — лимит на один хост прокси.
+    """
+    async for item in _stream(proxies, None, concurrency=concurrency, per_host=per_host,
+                              timeout=timeout, echo_url=echo_url, geo=geo, connect_timeout=connect_timeout,
+                              source=source):
+        yield item
+
+
+_DONE = object()
+
+
+def validate_many(proxies: Iterable[Proxy], **kwargs) -> Iterator[Item]:
+    """
+    Синхронная обёртка над async_validate_many для потоков (Tk, ThreadPool).
+    Event loop живёт в отдельном потоке; если перестать итерировать —
+    незавершённые проверки отменяются.
+    """
+    out: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    concurrency = kwargs.pop("concurrency", DEFAULT_CONCURRENCY)
+    per_host = kwargs.pop("per_host", DEFAULT_PER_HOST)
+
+    async def _main() -> None:
+        async for item in _stream(proxies, stop, concurrency=concurrency, per_host=per_host, **kwargs):
+            out.put(item)
+
+    def _runner() -> None:
+        try:
+            asyncio.run(_main())
+        finally:
+            out.put(_DONE)
+
+    threading.Thread(target=_runner, name="proxy-validate", daemon=True).start()
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import socket, sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from proxy.models import Proxy
+
+# Плотный список прокси для больших выгрузок (сотни тысяч записей): IPv4 —
+# 4 байта в array('I'), порт — 2 байта, схема и страна — номер в таблице
+# значений. Редкое (имена хостов, логины) — в словарях по номеру строки.
+# Proxy собирается при обращении, поэтому держать так выгодно, а итерировать — как список.
+_NO_IP = 0xFFFFFFFF  # метка "хост — в _names" (сам 255.255.255.255 тоже хранится там)
+
+
+class ProxyArray:
+    __slots__ = ("_ips", "_ports", "_schemes", "_countries", "_tables", "_codes",
+                 "_names", "_users", "_passwords")
+
+    def __init__(self, items: Iterable[Proxy] = ()):
+        self._ips = array("I")
+        self._ports = array("H")
+        self._schemes = array("B")
+        self._countries = array("H")
+        self._tables: Tuple[List[str], List[Optional[str]]] = ([], [None])  # схемы, страны (0 — нет)
+        self._codes: Tuple[Dict[str, int], Dict[Optional[str], int]] = ({}, {None: 0})
+        self._names: Dict[int, str] = {}
+        self._users: Dict[int, str] = {}
+        self._passwords: Dict[int, str] = {}
+        self.extend(items)
+
+    def _code(self, which: int, value: Optional[str]) -> int:
+        codes = self._codes[which]
+        code = codes.get(value)
+        if code is None:
+            table = self._tables[which]
+            code = codes[value] = len(table)
+            table.append(sys.intern(value) if value else value)
+        return code
+
+    def append(self, p: Proxy) -> None:
+        i = len(self._ports)
+        ip = _ipv4(p.host)
+        if ip == _NO_IP:
+            self._names[i] = p.host
+        self._ips.append(ip)
+        self._ports.append(int(p.port))
+        self._schemes.append(self._code(0, p.scheme))
+        self._countries.append(self._code(1, p.country or None))
+        if p.username:
+            self._users[i] = p.username
+        if p.password:
+            self._passwords[i] = p.password
+
+    def extend(self, items: Iterable[Proxy]) -> None:
+        for p in items:
+            self.append(p)
+
+    def _get(self, i: int) -> Proxy:
+        ip = self._ips[i]
+        host = self._names[i] if ip == _NO_IP else socket.inet_ntoa(ip.to_bytes(4, "big"))
+        return Proxy(self._tables[0][self._schemes[i]], host, self._ports[i], self._users.get(i),
+                     self._passwords.get(i), self._tables[1][self._countries[i]])
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self._get(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("ProxyArray index out of range")
+        return self._get(i)
+
+    def __len__(self) -> int:
+        return len(self._ports)
+
+    def __iter__(self) -> Iterator[Proxy]:
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def nbytes(self) -> int:
+        """Оценка занимаемой памяти (массивы + словари редких полей), байт."""
+        size = sum(sys.getsizeof(a) for a in (self._ips, self._ports, self._schemes, self._countries))
+        for d in (self._names, self._users, self._passwords):
+            size += sys.getsizeof(d) + sum(sys.getsizeof(v) for v in d.values())
+        return size
+
+
+def _ipv4(host: str) -> int:
+    """Адрес как число; _NO_IP — не IPv4 в каноническом виде (имя, IPv6, "010.1.1.1")."""
+    if host.count(".") != 3:
+        return _NO_IP
+    try:
+        packed = socket.inet_aton(host)
+    except OSError:
+        return _NO_IP
+    if socket.inet_ntoa(packed) != host:
+        return _NO_IP
+    return int.from_bytes(packed, "big")
@@ -0,0 +1,287 @@
+from __future__ import annotations
+import atexit, json, os, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from tools.lock_manager import FileLock
+from tools.logging_setup import get_logger
+
+log = get_logger(__name__)
+
+# Кэш результатов проверки ProxyPool с отложенной записью: set() только
+# помечает запись грязной, на диск она уходит фоном — раз в FLUSH_INTERVAL
+# или сразу после FLUSH_THRESHOLD изменений. Пишутся только грязные записи:
+# строками в журнал <файл>.journal рядом с основным JSON. Когда журнал
+# дорастает до размера кэша, всё сводится в основной файл атомарно
+# (tmp + os.replace), а журнал удаляется.
+# Файл общий для GUI и API: запись идёт под межпроцессным замком <файл>.lock
+# и начинается с sync() — чужие записи сначала подтягиваются в память.
+# sync() дочитывает только новые строки журнала; основной файл целиком —
+# лишь когда его свёл другой процесс.
+FLUSH_INTERVAL = 2.0       # c
+FLUSH_THRESHOLD = 500      # изменений до внеочередной записи
+COMPACT_MIN = 1000         # строк журнала, раньше которых основной файл не переписываем
+STALE_AFTER = 24 * 3600    # живые записи старше суток выбрасываем
+NEG_STALE_AFTER = 3600     # "не работает" помним час
+MAX_ENTRIES = 20_000       # сверх этого — вытеснение самых давних (LRU)
+
+
+def journal_path(path: Path) -> Path:
+    return path.with_name(path.name + ".journal")
+
+
+def _read_journal(path: Path, pos: int = 0) -> Tuple[List[Tuple[str, dict]], int]:
+    """Строки журнала начиная с байта pos: ([(ключ, запись)], позиция после последней целой строки)."""
+    try:
+        with journal_path(path).open("rb") as f:
+            f.seek(pos)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    end = data.rfind(b"\n") + 1  # недописанную строку оставляем до следующего раза
+    out = []
+    for line in data[:end].splitlines():
+        try:
+            key, entry = json.loads(line)
+        except ValueError:
+            continue
+        out.append((key, entry))
+    return out, pos + end
+
+
+def _sig(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_entries(path: Path) -> Dict[str, dict]:
+    """Основной JSON плюс журнал поверх него; битая последняя строка журнала (сбой на записи) пропускается."""
+    data: Dict[str, dict] = {}
+    if path.exists():
+        data.update(json.loads(path.read_text(encoding="utf-8")))
+    data.update(_read_journal(path)[0])
+    return data
+
+
+class ValidationCache:
+    """key -> {"ok", "ts", ...}; path=None — только память (SQLite-бэкенд пишет сам)."""
+
+    def __init__(self, path: Optional[Path] = None, *, interval: float = FLUSH_INTERVAL,
+                 threshold: int = FLUSH_THRESHOLD, max_entries: int = MAX_ENTRIES,
+                 stale_after: float = STALE_AFTER, neg_stale_after: float = NEG_STALE_AFTER):
+        self.path = Path(path) if path else None
+        self.stale_after = stale_after
+        self.neg_stale_after = neg_stale_after
+        self.interval = interval
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # запись журнала и сведение файла не пересекаются
+        self._dirty: set = set()    # ключи, изменённые с последней записи
+        self._rewrite = False       # clear() — журнала мало, нужен весь файл
+        self._journal_lines = 0
+        self._base_sig: Optional[Tuple[int, int]] = None  # основной файл, каким мы его последний раз видели
+        self._journal_pos = 0                             # докуда журнал уже прочитан/записан
+        self._journal_sig: Optional[Tuple[int, int]] = None
+        self._file_lock = FileLock(self.path.with_name(self.path.name + ".lock")) if self.path else None
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0  # сколько раз файл реально записан
+        if self.path is not None:
+            self._load()
+            atexit.register(self.flush)
+
+    # ------------------------------------------------------------------
+    # dict-подобный интерфейс
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+            return entry
+
+    def __setitem__(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            self._dirty.add(key)
+            urgent = len(self._dirty) >= self.threshold
+        if self.path is not None:
+            self._ensure_flusher()
+            if urgent:
+                self._wake.set()
+
+    def __getitem__(self, key: str) -> dict:
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self) -> Iterator[Tuple[str, dict]]:
+        with self._lock:
+            return iter(list(self._data.items()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._dirty.clear()
+            self._rewrite = True
+
+    # ------------------------------------------------------------------
+    # Диск
+    def _load(self) -> None:
+        if not self.path.exists() and not journal_path(self.path).exists():
+            return  # файл-замок заводим только когда есть что читать или писать
+        try:
+            with self._file_lock:
+                self._base_sig = _sig(self.path)
+                data = json.loads(self.path.read_text(encoding="utf-8")) if self._base_sig else {}
+                lines, self._journal_pos = _read_journal(self.path)
+                self._journal_sig = _sig(journal_path(self.path))
+            self._journal_lines = len(lines)
+            data.update(lines)
+            # старые записи первыми: порядок OrderedDict = давность
+            for key, entry in sorted(data.items(), key=lambda kv: kv[1].get("ts", 0)):
+                self._data[key] = entry
+            self._evict(time.time())
+        except Exception as e:
+            log.warning(f"validation cache load error: {e}")
+
+    def sync(self) -> List[str]:
+        """Подтягивает записи, сделанные другими процессами; возвращает изменившиеся ключи."""
+        if self.path is None:
+            return []
+        # без изменений на диске — два stat() и без замка
+        if _sig(self.path) == self._base_sig and _sig(journal_path(self.path)) == self._journal_sig:
+            return []
+        with self._io_lock, self._file_lock:
+            try:
+                return self._sync()
+            except Exception as e:
+                log.warning(f"validation cache sync error: {e}")
+                return []
+
+    def _sync(self) -> List[str]:
+        # вызывается под _io_lock и _file_lock
+        base = _sig(self.path)
+        if base != self._base_sig:
+            # основной файл свёл другой процесс: перечитываем его и журнал с начала
+            data = json.loads(self.path.read_text(encoding="utf-8")) if base else {}
+            lines, self._journal_pos = _read_journal(self.path)
+            self._journal_lines = len(lines)
+            data.update(lines)
+            self._base_sig = base
+            changed = self._merge(data.items())
+        else:
+            lines, self._journal_pos = _read_journal(self.path, self._journal_pos)
+            self._journal_lines += len(lines)
+            changed = self._merge(lines)
+        self._journal_sig = _sig(journal_path(self.path))
+        return changed
+
+    def _merge(self, entries) -> List[str]:
+        """Чужие записи поверх своих, если они новее (по ts); грязными не помечаются."""
+        changed = []
+        with self._lock:
+            for key, entry in entries:
+                cur = self._data.get(key)
+                if cur is not None and cur.get("ts", 0) >= entry.get("ts", 0):
+                    continue
+                self._data[key] = entry
+                self._data.move_to_end(key)
+                changed.append(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return changed
+
+    def _evict(self, now: float) -> None:
+        stale = [k for k, e in self._data.items()
+                 if now - e.get("ts", 0) > (self.stale_after if e.get("ok") else self.neg_stale_after)]
+        for k in stale:
+            del self._data[k]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def flush(self) -> bool:
+        """Записывает изменения, если они есть. True — запись была."""
+        if self.path is None:
+            return False
+        with self._io_lock:
+            if not self._dirty and not self._rewrite:
+                return False
+            with self._file_lock:
+                if not self._rewrite:  # после clear() чужое не подтягиваем
+                    self._sync()
+                return self._write()
+
+    def _write(self) -> bool:
+        with self._lock:
+            if not self._dirty and not self._rewrite:
+                return False
+            self._evict(time.time())
+            dirty, self._dirty = self._dirty, set()
+            compact = (self._rewrite or not self.path.exists()
+                       or self._journal_lines + len(dirty) >= max(COMPACT_MIN, len(self._data)))
+            if compact:
+                payload = json.dumps(self._data, ensure_ascii=False)
+                self._rewrite = False
+            else:
+                # вытесненные после изменения ключи не пишем: при загрузке их всё равно выбросит _evict
+                payload = "".join(json.dumps([k, self._data[k]], ensure_ascii=False) + "\n"
+                                  for k in dirty if k in self._data)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if compact:
+                tmp = self.path.with_name(self.path.name + ".tmp")
+                tmp.write_text(payload, encoding="utf-8")
+                os.replace(tmp, self.path)
+                journal_path(self.path).unlink(missing_ok=True)
+                self._base_sig = _sig(self.path)
+                self._journal_lines = self._journal_pos = 0
+            else:
+                with journal_path(self.path).open("ab") as f:
+                    f.write(payload.encode("utf-8"))
+                    self._journal_pos = f.tell()
+                self._journal_lines += payload.count("\n")
+            self._journal_sig = _sig(journal_path(self.path))
+            self.writes += 1
+            return True
+        except Exception as e:
+            log.error(f"validation cache save error: {e}")
+            with self._lock:
+                self._dirty |= dirty
+                self._rewrite = self._rewrite or compact
+            return False
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._flush_loop, name="validation-cache-flush", daemon=True)
+        self._thread.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            with self._lock:
+                if not self._dirty and not self._rewrite:
+                    # нечего писать — поток завершается, следующий set() запустит новый
+                    self._thread = None
+                    return
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import os, threading, time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from proxy import timeouts, transport
+from proxy.cache import ValidationCache
+from proxy.countries import country_name
+from proxy.geoip import lookup_cc
+from tools.logging_setup import app_root, get_logger
+
+log = get_logger(__name__)
+
+BATCH_URL = os.environ.get("AICHROME_GEO_BATCH_URL", "http://ip-api.com/batch?fields=status,country,countryCode,query")
+BATCH_SIZE = 100            # лимит ip-api на один batch-запрос
+CACHE_TTL = 7 * 24 * 3600   # страна выходного IP меняется редко
+NEG_TTL = 3600              # "не удалось определить" помним час
+MAX_ENTRIES = 100_000
+BATCH_WINDOW = 0.05         # сколько ждём попутчиков перед отправкой batch
+# верхние границы таймаутов; фактический — по наблюдаемым задержкам (proxy.timeouts)
+RESOLVE_TIMEOUT = 3.0
+BATCH_TIMEOUT = 5.0
+
+Geo = Tuple[Optional[str], Optional[str]]  # (country, cc)
+
+
+class GeoResolver:
+    """
+    IP → (country, cc): офлайн-индекс → дисковый кэш с TTL → batch-запрос к ip-api.
+    Параллельные resolve() за BATCH_WINDOW склеиваются в один запрос до 100 IP.
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None, batch_url: str = BATCH_URL,
+                 ttl: float = CACHE_TTL, window: float = BATCH_WINDOW):
+        self.cache_path = Path(cache_path) if cache_path else app_root() / "cache" / "geo_cache.json"
+        self.batch_url = batch_url
+        self.ttl = ttl
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._leader = False
+        # ip -> {"ok" (страна определена), "country", "cc", "ts"}; на диск — фоном, только изменённые записи
+        self._cache = ValidationCache(self.cache_path, max_entries=MAX_ENTRIES, stale_after=ttl, neg_stale_after=NEG_TTL)
+        self.stats = {"offline": 0, "cache": 0, "network": 0, "batches": 0, "errors": 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        # resolve() зовут из многих потоков проверки
+        with self._lock:
+            self.stats[name] += n
+
+    def flush(self) -> bool:
+        return self._cache.flush()
+
+    def _ttl_for(self, entry: dict) -> float:
+        return self.ttl if entry.get("cc") else NEG_TTL
+
+    def _cached(self, ip: str) -> Optional[Geo]:
+        cc = lookup_cc(ip)
+        if cc:
+            self._count("offline")
+            return country_name(cc), cc
+        e = self._cache.get(ip)
+        if e and time.time() - e.get("ts", 0) < self._ttl_for(e):
+            self._count("cache")
+            return e.get("country"), e.get("cc")
+        return None
+
+    # ------------------------------------------------------------------
+    # Сеть
+    def _fetch(self, ips: list, timeout: float) -> Dict[str, Geo]:
+        out: Dict[str, Geo] = {}
+        sess = transport.endpoint_session("ip-api.com")
+        for i in range(0, len(ips), BATCH_SIZE):
+            chunk = ips[i:i + BATCH_SIZE]
+            self._count("batches")
+            t0 = time.perf_counter()
+            try:
+                r = sess.post(self.batch_url, json=chunk, timeout=timeout)
+                r.raise_for_status()
+                timeouts.observe("geo", "http", (time.perf_counter() - t0) * 1000, True)
+                for item in r.json():
+                    ip = item.get("query")
+                    if ip and item.get("status") == "success":
+                        out[ip] = (item.get("country"), item.get("countryCode"))
+            except Exception as e:
+                self._count("errors")
+                timeouts.observe("geo", "http", None, False, str(e))
+                log.warning(f"geo batch error ({len(chunk)} ip): {e}")
+                continue
+            now = time.time()
+            for ip in chunk:
+                country, cc = out.get(ip, (None, None))
+                self._cache[ip] = {"ok": bool(cc), "country": country, "cc": cc, "ts": now}
+        self._count("network", len(out))
+        return out
+
+    def resolve_many(self, ips: Iterable[str], timeout: Optional[float] = None) -> Dict[str, Geo]:
+        """Определяет страны сразу для списка IP; в сеть уходят только промахи кэша."""
+        timeout = timeout or timeouts.timeout_for("geo", "http", BATCH_TIMEOUT)
+        result: Dict[str, Geo] = {}
+        missing = []
+        for ip in dict.fromkeys(ip for ip in ips if ip):
+            hit = self._cached(ip)
+            if hit is not None:
+                result[ip] = hit
+            else:
+                missing.append(ip)
+        fetched = self._fetch(missing, timeout) if missing else {}
+        for ip in missing:
+            result[ip] = fetched.get(ip, (None, None))
+        return result
+
+    def resolve(self, ip: str, timeout: Optional[float] = None) -> Geo:
+        """Один IP; запрос копится в batch вместе с соседними вызовами из других потоков."""
+        if not ip:
+            return None, None
+        timeout = timeout or timeouts.timeout_for("geo", "http", RESOLVE_TIMEOUT)
+        hit = self._cached(ip)
+        if hit is not None:
+            return hit
+        with self._lock:
+            fut = self._pending.get(ip)
+            if fut is None:
+                fut = self._pending[ip] = Future()
+            lead = not self._leader
+            if lead:
+                self._leader = True
+        if lead:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending, self._leader = self._pending, {}, False
+            try:
+                fetched = self._fetch(list(batch), timeout)
+            except Exception:
+                fetched = {}
+            for bip, bfut in batch.items():
+                bfut.set_result(fetched.get(bip, (None, None)))
+        try:
+            return fut.result(timeout=timeout + self.window + 1)
+        except Exception:
+            return None, None
+
+
+_resolver: Optional[GeoResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> GeoResolver:
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = GeoResolver()
+    return _resolver
+
+
+def lookup_country(ip: str, timeout: Optional[float] = None) -> Geo:
+    """(country, cc) через общий GeoResolver: офлайн-индекс, кэш, затем batch-запрос."""
+    return get_resolver().resolve(ip, timeout=timeout)
+
+
+def lookup_countries(ips: Iterable[str], timeout: Optional[float] = None) -> Dict[str, Geo]:
+    return get_resolver().resolve_many(ips, timeout=timeout)
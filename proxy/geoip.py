@@ -0,0 +1,211 @@
+from __future__ import annotations
+import csv, gzip, io, os, socket, struct, threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from tools.logging_setup import app_root, get_logger
+
+log = get_logger(__name__)
+
+_MAGIC = b"AICGEO1\0"
+_inet_aton = socket.inet_aton
+_unpack_u32 = struct.Struct(">I").unpack
+
+
+def default_index_path() -> Path:
+    env = os.environ.get("AICHROME_GEOIP", "")
+    return Path(env) if env else app_root() / "data" / "geoip.idx"
+
+
+def _v4(ip: str) -> int:
+    return _unpack_u32(_inet_aton(ip))[0]
+
+
+def _v6_hi(ip: str) -> int:
+    # для страны достаточно старших 64 бит (префикс /64)
+    return int.from_bytes(socket.inet_pton(socket.AF_INET6, ip)[:8], "big")
+
+
+def _parse_bound(value: str, v6: bool) -> int:
+    value = value.strip()
+    if value.isdigit():
+        n = int(value)
+        return n >> 64 if v6 else n
+    return _v6_hi(value) if v6 else _v4(value)
+
+
+class GeoIPIndex:
+    """
+    Диапазоны IP → ISO-код страны в отсортированных array:
+    starts/ends (uint32 для IPv4, uint64 префиксы для IPv6) и индексы кодов (uint16).
+    ~10 байт на диапазон IPv4, поиск — bisect по C-массиву.
+    """
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self.v4_starts = array("I")
+        self.v4_ends = array("I")
+        self.v4_cc = array("H")
+        self.v6_starts = array("Q")
+        self.v6_ends = array("Q")
+        self.v6_cc = array("H")
+        # v4_jump[k] — первый индекс диапазона с началом >= k << 16; сужает bisect до блока /16
+        self.v4_jump = array("I")
+
+    def _build_jump(self) -> None:
+        starts = self.v4_starts
+        jump = array("I", bytes(4 * 65537))
+        i, n = 0, len(starts)
+        for k in range(65537):
+            bound = k << 16
+            while i < n and starts[i] < bound:
+                i += 1
+            jump[k] = i
+        self.v4_jump = jump
+
+    def __len__(self) -> int:
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.v4_starts, self.v4_ends, self.v4_cc, self.v4_jump,
+                                                   self.v6_starts, self.v6_ends, self.v6_cc))
+
+    # ------------------------------------------------------------------
+    # Поиск
+    def lookup(self, ip: str) -> Optional[str]:
+        # горячий путь IPv4 без лишних вызовов функций
+        try:
+            n = _unpack_u32(_inet_aton(ip))[0]
+        except (OSError, ValueError, TypeError):
+            return self._lookup_v6(ip) if ":" in ip else None
+        jump = self.v4_jump
+        k = n >> 16
+        i = bisect_right(self.v4_starts, n, jump[k], jump[k + 1]) - 1
+        if i < 0 or n > self.v4_ends[i]:
+            return None
+        return self.codes[self.v4_cc[i]]
+
+    def _lookup_v6(self, ip: str) -> Optional[str]:
+        try:
+            n = _v6_hi(ip)
+        except (OSError, ValueError):
+            return None
+        i = bisect_right(self.v6_starts, n) - 1
+        if i < 0 or n > self.v6_ends[i]:
+            return None
+        return self.codes[self.v6_cc[i]]
+
+    # ------------------------------------------------------------------
+    # Построение
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Tuple[str, str, str]]) -> "GeoIPIndex":
+        """ranges: (start_ip, end_ip, cc); IP в точечной записи или целым числом."""
+        v4: List[Tuple[int, int, str]] = []
+        v6: List[Tuple[int, int, str]] = []
+        for start, end, cc in ranges:
+            cc = (cc or "").strip().upper()
+            if len(cc) != 2 or cc == "ZZ" or cc == "--":
+                continue
+            is_v6 = ":" in start or (start.strip().isdigit() and int(start) > 0xFFFFFFFF)
+            try:
+                item = (_parse_bound(start, is_v6), _parse_bound(end, is_v6), cc)
+            except (OSError, ValueError):
+                continue
+            (v6 if is_v6 else v4).append(item)
+        idx = cls()
+        code_ids: dict[str, int] = {}
+        for rows, starts, ends, ccs in ((v4, idx.v4_starts, idx.v4_ends, idx.v4_cc),
+                                        (v6, idx.v6_starts, idx.v6_ends, idx.v6_cc)):
+            rows.sort()
+            for s, e, cc in rows:
+                cid = code_ids.setdefault(cc, len(code_ids))
+                # склеиваем соседние диапазоны одной страны
+                if starts and ccs[-1] == cid and s <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], e)
+                    continue
+                if starts and s <= ends[-1]:
+                    s = ends[-1] + 1  # перекрытие — первый выигрывает
+                    if s > e:
+                        continue
+                starts.append(s)
+                ends.append(e)
+                ccs.append(cid)
+        idx.codes = sorted(code_ids, key=code_ids.get)
+        idx._build_jump()
+        return idx
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "GeoIPIndex":
+        """CSV вида start,end,cc[,...] (db-ip / ip2location lite); .gz поддерживается."""
+        path = Path(path)
+        raw = gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+        with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+            rows = (r for r in csv.reader(f) if len(r) >= 3 and not r[0].startswith("#"))
+            return cls.from_ranges((r[0], r[1], r[2]) for r in rows)
+
+    # ------------------------------------------------------------------
+    # Бинарный файл индекса
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        codes = "".join(self.codes).encode("ascii")
+        with tmp.open("wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<III", len(self.codes), len(self.v4_starts), len(self.v6_starts)))
+            f.write(codes)
+            for a in (self.v4_starts, self.v4_ends, self.v4_cc, self.v6_starts, self.v6_ends, self.v6_cc):
+                a.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "GeoIPIndex":
+        idx = cls()
+        with Path(path).open("rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"not a geoip index: {path}")
+            n_codes, n4, n6 = struct.unpack("<III", f.read(12))
+            codes = f.read(2 * n_codes).decode("ascii")
+            idx.codes = [codes[i:i + 2] for i in range(0, len(codes), 2)]
+            for a, n in ((idx.v4_starts, n4), (idx.v4_ends, n4), (idx.v4_cc, n4),
+                         (idx.v6_starts, n6), (idx.v6_ends, n6), (idx.v6_cc, n6)):
+                a.fromfile(f, n)
+        idx._build_jump()
+        return idx
+
+
+_index: Optional[GeoIPIndex] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[GeoIPIndex]:
+    """Лениво загружает индекс из default_index_path(); None, если файла нет."""
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if not _index_loaded:
+            path = default_index_path()
+            try:
+                if path.exists():
+                    _index = GeoIPIndex.load(path)
+                    log.info(f"geoip index loaded: {len(_index)} ranges, {_index.nbytes // 1024} KB")
+            except Exception as e:
+                log.warning(f"geoip index load error: {e}")
+            _index_loaded = True
+    return _index
+
+
+def set_index(idx: Optional[GeoIPIndex]) -> None:
+    global _index, _index_loaded
+    with _index_lock:
+        _index, _index_loaded = idx, True
+
+
+def lookup_cc(ip: str) -> Optional[str]:
+    """Только офлайн-индекс, без сети (сетевой fallback — proxy.geo)."""
+    idx = get_index()
+    return idx.lookup(ip) if idx is not None and ip else None
@@ -0,0 +1,107 @@
+from __future__ import annotations
+import json, math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import urlencode
+from proxy.models import Proxy
+from proxy.source_cache import fetch_text
+from proxy.sources import SOURCE_TIMEOUT
+from tools.logging_setup import get_logger
+
+log = get_logger(__name__)
+
+# Клиент proxylist.geonode.com: страницы запрашиваются параллельно, пока не
+# набрано target; фильтры (страна, протоколы, аптайм, скорость) уходят в
+# запрос, а не применяются после. Прокси отдаются по мере прихода страниц.
+API_URL = "https://proxylist.geonode.com/api/proxy-list"
+PAGE_SIZE = 100    # на страницу (API разрешает до 500, но крупные страницы отвечают заметно дольше)
+MAX_PAGES = 10     # страниц на один запрос клиента
+PAGE_WORKERS = 4   # страниц одновременно
+SCHEMES = {"http": "http", "https": "http", "socks4": "socks4", "socks5": "socks5"}
+
+
+class GeonodeClient:
+    def __init__(self, base_url: str = API_URL, page_size: int = PAGE_SIZE, workers: int = PAGE_WORKERS,
+                 timeout: float = SOURCE_TIMEOUT, min_interval: Optional[float] = None):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.workers = workers
+        self.timeout = timeout
+        self.min_interval = min_interval  # None — интервал кэша источников по умолчанию
+
+    def page_url(self, page: int, country: str = "", protocols: Iterable[str] = (),
+                 min_uptime: Optional[float] = None, speed: Optional[str] = None) -> str:
+        params = {"limit": self.page_size, "page": page, "sort_by": "lastChecked", "sort_type": "desc"}
+        if country:
+            params["country"] = country.upper()
+        protocols = [p.lower() for p in protocols]
+        if protocols:
+            params["protocols"] = ",".join(dict.fromkeys(protocols))
+        if min_uptime is not None:
+            params["filterUpTime"] = int(min_uptime)
+        if speed:
+            params["speed"] = speed  # fast | medium | slow
+        return f"{self.base_url}?{urlencode(params)}"
+
+    def fetch_page(self, url: str) -> List[dict]:
+        # через дисковый кэш источников (proxy.source_cache): страница не чаще min_interval
+        return json.loads(fetch_text(url, timeout=self.timeout, min_interval=self.min_interval)).get("data", [])
+
+    def stream(self, country: str = "", protocols: Iterable[str] = ("http",), target: int = PAGE_SIZE,
+               min_uptime: Optional[float] = None, speed: Optional[str] = None) -> Iterator[Proxy]:
+        """
+        Прокси по мере прихода страниц, не больше target, без повторов. Запись
+        с несколькими протоколами даёт по прокси на каждый запрошенный. Упавшая
+        страница пропускается; упали все — исключение наружу.
+        """
+        protocols = [p.lower() for p in protocols]
+        pages = min(MAX_PAGES, max(1, math.ceil(target / self.page_size)))
+        urls = [self.page_url(n, country, protocols, min_uptime, speed) for n in range(1, pages + 1)]
+        seen = set()
+        emitted = 0
+        errors: List[Exception] = []
+        ex = ThreadPoolExecutor(max_workers=min(self.workers, pages), thread_name_prefix="geonode")
+        try:
+            futures = [ex.submit(self.fetch_page, url) for url in urls]
+            for fut in as_completed(futures):
+                try:
+                    rows = fut.result()
+                except Exception as e:
+                    log.warning(f"geonode page: {e}")
+                    errors.append(e)
+                    continue
+                for row in rows:
+                    for p in _proxies_from(row, protocols):
+                        if p.key in seen:
+                            continue
+                        seen.add(p.key)
+                        yield p
+                        emitted += 1
+                        if emitted >= target:
+                            return
+        finally:
+            # набрали target или потребитель остановился — оставшиеся страницы не ждём
+            ex.shutdown(wait=False, cancel_futures=True)
+        if errors and not emitted and len(errors) == len(urls):
+            raise errors[0]
+
+
+def _proxies_from(row: dict, protocols: List[str]) -> Iterator[Proxy]:
+    ip, port = row.get("ip"), row.get("port")
+    if not ip or not port:
+        return
+    try:
+        port = int(port)
+    except (TypeError, ValueError):
+        return
+    country = (row.get("country") or "").upper() or None
+    schemes = []
+    for proto in row.get("protocols") or ["http"]:
+        proto = proto.lower()
+        if protocols and proto not in protocols:
+            continue
+        scheme = SCHEMES.get(proto)
+        if scheme and scheme not in schemes:
+            schemes.append(scheme)
+    for scheme in schemes:
+        yield Proxy(scheme, ip, port, country=country)
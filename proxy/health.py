@@ -0,0 +1,145 @@
+from __future__ import annotations
+import random, threading, time
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+from proxy.cache import STALE_AFTER, ValidationCache
+from tools.logging_setup import app_root
+
+# Здоровье прокси за много проверок, а не только последний ok/ping:
+# EWMA задержки, доля успехов в окне последних WINDOW проверок (битовая маска),
+# время последнего сбоя и серия сбоев подряд. В файле — короткий список.
+WINDOW = 20
+ALPHA = 0.3                 # вес новой задержки в EWMA
+RECENT_FAIL = 300           # c: недавний сбой — штраф к весу
+# Backoff: после N сбоев подряд прокси не проверяем BACKOFF_BASE * 2^(N-1) c
+# (не больше BACKOFF_MAX); успешная проверка обнуляет серию.
+BACKOFF_BASE = 60
+BACKOFF_MAX = 6 * 3600
+_MASK = (1 << WINDOW) - 1
+
+
+class Health:
+    __slots__ = ("ewma_ms", "bits", "n", "last_fail", "streak")
+
+    def __init__(self, ewma_ms: float = 0.0, bits: int = 0, n: int = 0, last_fail: float = 0.0, streak: int = 0):
+        self.ewma_ms = ewma_ms
+        self.bits = bits
+        self.n = n
+        self.last_fail = last_fail
+        self.streak = streak
+
+    def update(self, ok: bool, ping_ms: Optional[float] = None, ts: Optional[float] = None) -> None:
+        self.bits = ((self.bits << 1) | int(ok)) & _MASK
+        self.n = min(self.n + 1, WINDOW)
+        if ok:
+            self.streak = 0
+            if ping_ms is not None:
+                self.ewma_ms = ping_ms if not self.ewma_ms else ALPHA * ping_ms + (1 - ALPHA) * self.ewma_ms
+        else:
+            self.streak += 1
+            self.last_fail = ts or time.time()
+
+    @property
+    def success_ratio(self) -> float:
+        return self.bits.bit_count() / self.n if self.n else 0.0
+
+    def score(self, now: Optional[float] = None) -> float:
+        """Вес для выбора: выше — быстрее и надёжнее. Без истории — нейтральный."""
+        ratio = (self.bits.bit_count() + 1) / (self.n + 2)
+        latency = (self.ewma_ms or 1000.0) / 1000
+        s = ratio * ratio / (0.25 + latency)
+        if self.streak:
+            s *= 0.5 ** min(self.streak, 10)
+        if self.last_fail and (now or time.time()) - self.last_fail < RECENT_FAIL:
+            s *= 0.5
+        return s
+
+    def backoff_until(self) -> float:
+        if not self.streak:
+            return 0.0
+        return self.last_fail + min(BACKOFF_BASE * 2 ** min(self.streak - 1, 30), BACKOFF_MAX)
+
+    def to_list(self) -> list:
+        return [round(self.ewma_ms, 1), self.bits, self.n, round(self.last_fail, 1), self.streak]
+
+    @classmethod
+    def from_list(cls, data: Sequence) -> "Health":
+        return cls(*data)
+
+
+UNKNOWN_SCORE = Health().score()
+
+
+def default_book_path() -> Path:
+    return app_root() / "cache" / "proxy_health.json"
+
+
+class HealthBook:
+    """
+    key -> Health; хранится в cache/proxy_health.json через ValidationCache (отложенная запись, LRU).
+    Заодно — журнал backoff: упавшие подряд помним сутки, а не час, как обычный кэш.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else default_book_path()
+        self._cache = ValidationCache(self.path, neg_stale_after=max(STALE_AFTER, BACKOFF_MAX))
+        self._lock = threading.Lock()
+        self.skipped = 0  # сколько кандидатов отсеяно backoff-ом
+
+    def get(self, key: str) -> Optional[Health]:
+        entry = self._cache.get(key)
+        return Health.from_list(entry["h"]) if entry and "h" in entry else None
+
+    def record(self, key: str, ok: bool, ping_ms: Optional[float] = None) -> Health:
+        now = time.time()
+        with self._lock:
+            h = self.get(key) or Health()
+            h.update(ok, ping_ms, now)
+            self._cache[key] = {"ok": ok, "ts": now, "h": h.to_list()}
+        return h
+
+    def score(self, key: str, now: Optional[float] = None) -> float:
+        h = self.get(key)
+        return h.score(now) if h else UNKNOWN_SCORE
+
+    def rank(self, keys: Iterable[str]) -> List[Tuple[float, str]]:
+        """[(score, key)] по убыванию score."""
+        now = time.time()
+        return sorted(((self.score(k, now), k) for k in keys), reverse=True)
+
+    def weighted_choice(self, keys: Sequence[str], rng=random) -> str:
+        now = time.time()
+        return rng.choices(keys, weights=[self.score(k, now) for k in keys])[0]
+
+    def backed_off(self, key: str, now: Optional[float] = None) -> bool:
+        h = self.get(key)
+        return bool(h) and h.backoff_until() > (now or time.time())
+
+    def allowed(self, items: Iterable, key_of=lambda x: x) -> list:
+        """Предфильтр до любой сети: убирает кандидатов, у которых ещё идёт backoff."""
+        now = time.time()
+        items = list(items)
+        out = [it for it in items if not self.backed_off(key_of(it), now)]
+        self.skipped += len(items) - len(out)
+        return out
+
+    def flush(self) -> bool:
+        return self._cache.flush()
+
+
+_book: Optional[HealthBook] = None
+_book_lock = threading.Lock()
+
+
+def get_book() -> HealthBook:
+    global _book
+    if _book is None:
+        with _book_lock:
+            if _book is None:
+                _book = HealthBook()
+    return _book
+
+
+def set_book(book: Optional[HealthBook]) -> None:
+    global _book
+    _book = book
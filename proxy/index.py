@@ -0,0 +1,153 @@
+from __future__ import annotations
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+from proxy.models import Proxy
+
+# Индексы пула в памяти: выбор по (страна, схема, здоровье) без перечитывания
+# и фильтрации всего proxies.csv. Пустая строка в комбинации — "любая".
+Combo = Tuple[str, str]
+
+
+class KeySet:
+    """Множество ключей с O(1) add/discard/choice (список + позиции)."""
+    __slots__ = ("_keys", "_pos")
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._pos: Dict[str, int] = {}
+
+    def add(self, key: str) -> None:
+        if key not in self._pos:
+            self._pos[key] = len(self._keys)
+            self._keys.append(key)
+
+    def discard(self, key: str) -> None:
+        i = self._pos.pop(key, None)
+        if i is None:
+            return
+        last = self._keys.pop()
+        if i < len(self._keys):
+            self._keys[i] = last
+            self._pos[last] = i
+
+    def choice(self, rng=random) -> str:
+        return self._keys[rng.randrange(len(self._keys))]
+
+    def rotated(self, rng=random) -> List[str]:
+        """Снимок ключей, начиная со случайной позиции (вместо shuffle всего списка)."""
+        if not self._keys:
+            return []
+        i = rng.randrange(len(self._keys))
+        return self._keys[i:] + self._keys[:i]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pos
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+
+def proxy_key(p: Proxy) -> str:
+    return p.key
+
+
+def combos(p: Proxy) -> List[Combo]:
+    cc, scheme = (p.country or "").upper(), p.scheme.lower()
+    out = [("", ""), ("", scheme)]
+    if cc:
+        out += [(cc, ""), (cc, scheme)]
+    return out
+
+
+def combo_for(country: Optional[str], scheme: Optional[str]) -> Combo:
+    return (country or "").upper(), (scheme or "").lower()
+
+
+class ProxyIndex:
+    """
+    items: key -> Proxy; by: комбинация -> ключи; ok/bad: здоровые и недавно
+    упавшие ключи по той же комбинации. Всё остальное — ещё не проверено.
+    """
+
+    def __init__(self):
+        self.items: Dict[str, Proxy] = {}
+        self.by: Dict[Combo, KeySet] = {}
+        self.ok: Dict[Combo, KeySet] = {}
+        self.bad: Dict[Combo, KeySet] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.by.clear()
+        self.ok.clear()
+        self.bad.clear()
+
+    def add(self, p: Proxy) -> str:
+        key = proxy_key(p)
+        old = self.items.get(key)
+        if old is not None:
+            if old == p:
+                return key
+            self.remove(key)
+        self.items[key] = p
+        for c in combos(p):
+            ks = self.by.get(c)
+            if ks is None:
+                ks = self.by[c] = KeySet()
+            ks.add(key)
+        return key
+
+    def remove(self, key: str) -> None:
+        p = self.items.pop(key, None)
+        if p is None:
+            return
+        for c in combos(p):
+            for table in (self.by, self.ok, self.bad):
+                ks = table.get(c)
+                if ks is not None:
+                    ks.discard(key)
+
+    def set_health(self, key: str, ok: Optional[bool]) -> None:
+        """ok=True/False — результат проверки, None — сведения устарели."""
+        p = self.items.get(key)
+        if p is None:
+            return
+        for c in combos(p):
+            for table, flag in ((self.ok, True), (self.bad, False)):
+                ks = table.get(c)
+                if ok is flag:
+                    if ks is None:
+                        ks = table[c] = KeySet()
+                    ks.add(key)
+                elif ks is not None:
+                    ks.discard(key)
+
+    def healthy(self, combo: Combo) -> KeySet:
+        return self.ok.get(combo) or KeySet()
+
+    def count(self, combo: Combo) -> int:
+        ks = self.by.get(combo)
+        return len(ks) if ks else 0
+
+    def candidates(self, combo: Combo, rng=random) -> Iterator[Proxy]:
+        """Для проверки: сначала непроверенные, затем недавно упавшие; порядок случайный."""
+        ks = self.by.get(combo)
+        if not ks:
+            return
+        keys = ks.rotated(rng)
+        ok, bad = self.ok.get(combo), self.bad.get(combo)
+        for key in keys:
+            if (ok is None or key not in ok) and (bad is None or key not in bad):
+                p = self.items.get(key)
+                if p is not None:
+                    yield p
+        for key in keys:
+            if bad is not None and key in bad:
+                p = self.items.get(key)
+                if p is not None:
+                    yield p
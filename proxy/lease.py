@@ -0,0 +1,180 @@
+from __future__ import annotations
+import json, os, threading, time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from proxy.index import proxy_key
+from proxy.models import Proxy
+from proxy.pool import INVENTORY_TARGET
+from proxy.validate import ValidationResult
+from tools.lock_manager import FileLock, ProfileLock
+from tools.logging_setup import app_root, get_logger
+
+log = get_logger(__name__)
+
+# Аренда прокси профилями: один прокси одновременно держат не больше
+# MAX_LEASES профилей, нагрузка расходится по пулу (берём наименее занятый).
+# Аренда живёт, пока жив Chrome профиля (ProfileLock), а до запуска
+# Chrome и после его выхода — не дольше LEASE_TTL.
+MAX_LEASES = 2
+LEASE_TTL = 600  # c
+
+
+class LeaseManager:
+    """
+    profile_id -> {"key", "proxy", "since", "until"}; хранится в proxy_leases.json
+    рядом с кэшем пула, чтобы GUI и API видели аренды друг друга.
+    """
+
+    def __init__(self, pool, max_leases: int = MAX_LEASES, ttl: float = LEASE_TTL,
+                 path: Optional[Path] = None, profiles_dir: Optional[Path] = None):
+        self.pool = pool
+        self.max_leases = max_leases
+        self.ttl = ttl
+        self.path = Path(path) if path else pool.cache_path.with_name("proxy_leases.json")
+        self.profiles_dir = Path(profiles_dir) if profiles_dir else app_root() / "profiles"
+        self._lock = threading.RLock()
+        # проверка предела и выдача аренды — под замком и между процессами (GUI и API)
+        self._file_lock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._leases: Dict[str, dict] = {}
+        self._sig: Optional[Tuple[int, int]] = None
+
+    # ------------------------------------------------------------------
+    # Файл
+    def _load(self) -> None:
+        try:
+            st = self.path.stat()
+        except OSError:
+            self._leases, self._sig = {}, None
+            return
+        sig = (st.st_mtime_ns, st.st_size)
+        if sig == self._sig:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self._leases = data if isinstance(data, dict) else {}
+            self._sig = sig
+        except Exception as e:
+            log.warning(f"lease file load error: {e}")
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self._leases, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+            st = self.path.stat()
+            self._sig = (st.st_mtime_ns, st.st_size)
+        except Exception as e:
+            log.error(f"lease file save error: {e}")
+
+    def _reap(self, now: float) -> bool:
+        """Продлевает аренды работающих Chrome, снимает завершившиеся и просроченные."""
+        changed = False
+        for profile_id, lease in list(self._leases.items()):
+            alive = ProfileLock(self.profiles_dir / profile_id).chrome_alive(since=lease.get("since", 0))
+            if alive:
+                if lease["until"] - now < self.ttl / 2:
+                    lease["until"] = now + self.ttl
+                    changed = True
+            elif alive is False or lease["until"] < now:
+                del self._leases[profile_id]
+                changed = True
+        return changed
+
+    def _sync(self) -> float:
+        now = time.time()
+        self._load()
+        if self._reap(now):
+            self._save()
+        return now
+
+    # ------------------------------------------------------------------
+    # API
+    def acquire(self, profile_id: str, country: Optional[str], scheme: Optional[str],
+                prefer: Optional[Proxy] = None) -> Tuple[Optional[Proxy], Optional[ValidationResult]]:
+        """
+        Прокси для профиля: его текущая аренда, иначе prefer (например, sticky), если
+        он не занят до предела, иначе наименее занятый живой из пула. (None, None) — нет живых.
+        """
+        for _attempt in range(3):
+            with self._lock, self._file_lock:
+                now = self._sync()
+                held = self._leases.get(profile_id)
+                if held and not _matches(held["proxy"], country, scheme):
+                    # у профиля сменили страну/схему — старая аренда больше не нужна
+                    del self._leases[profile_id]
+                    held = None
+                if held:
+                    held["until"] = max(held["until"], now + self.ttl)
+                    self._save()
+                    return _proxy_from(held["proxy"]), None
+                counts = Counter(lease["key"] for lease in self._leases.values())
+                full = {key for key, n in counts.items() if n >= self.max_leases}
+                if prefer is not None and proxy_key(prefer) not in full:
+                    return self._grant(profile_id, prefer, now), None
+                live = [(p, vr) for p, vr in self.pool.live(country, scheme) if proxy_key(p) not in full]
+            # занятые до предела прокси не в счёт тёплого запаса
+            self.pool.want(country, scheme, target=INVENTORY_TARGET + len(full))
+            if live:
+                least = min(counts[proxy_key(p)] for p, _vr in live)
+                live = [(p, vr) for p, vr in live if counts[proxy_key(p)] == least]
+                key = self.pool.health().weighted_choice([proxy_key(p) for p, _vr in live])
+                p, vr = next((p, vr) for p, vr in live if proxy_key(p) == key)
+            else:
+                # тёплый запас кончился — гонка проверок мимо занятых (сеть, без блокировки)
+                p, vr = self.pool.select_live(country, scheme, skip=full)
+                if p is None:
+                    return None, None
+            with self._lock, self._file_lock:
+                now = self._sync()
+                if sum(1 for lease in self._leases.values() if lease["key"] == proxy_key(p)) < self.max_leases:
+                    return self._grant(profile_id, p, now), vr
+            # пока проверяли, прокси заняли из другого процесса — выбираем заново
+        return None, None
+
+    def _grant(self, profile_id: str, p: Proxy, now: float) -> Proxy:
+        self._leases[profile_id] = {"key": proxy_key(p), "proxy": _proxy_dict(p), "since": now, "until": now + self.ttl}
+        self._save()
+        return p
+
+    def release(self, profile_id: str) -> bool:
+        with self._lock, self._file_lock:
+            self._sync()
+            if self._leases.pop(profile_id, None) is None:
+                return False
+            self._save()
+            return True
+
+    def holder(self, profile_id: str) -> Optional[Proxy]:
+        with self._lock, self._file_lock:
+            self._sync()
+            lease = self._leases.get(profile_id)
+            return _proxy_from(lease["proxy"]) if lease else None
+
+    def occupancy(self) -> dict:
+        """Для мониторинга: сколько аренд, сколько прокси занято, сколько из них до предела."""
+        with self._lock, self._file_lock:
+            self._sync()
+            counts = Counter(lease["key"] for lease in self._leases.values())
+        return {
+            "leases": sum(counts.values()),
+            "proxies": len(counts),
+            "full": sum(1 for n in counts.values() if n >= self.max_leases),
+            "max_leases": self.max_leases,
+            "by_proxy": dict(counts),
+        }
+
+
+def _proxy_dict(p: Proxy) -> dict:
+    return {"scheme": p.scheme, "host": p.host, "port": p.port, "username": p.username,
+            "password": p.password, "country": p.country}
+
+
+def _proxy_from(x: dict) -> Proxy:
+    return Proxy(x["scheme"], x["host"], int(x["port"]), x.get("username"), x.get("password"), x.get("country"))
+
+
+def _matches(x: dict, country: Optional[str], scheme: Optional[str]) -> bool:
+    return (not scheme or x["scheme"] == scheme.lower()) and \
+        (not country or (x.get("country") or "").upper() == country.upper())
@@ -0,0 +1,125 @@
+from __future__ import annotations
+import threading, time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from proxy.cache import NEG_STALE_AFTER, ValidationCache
+from proxy.validate import ValidationResult
+from tools.logging_setup import app_root
+
+# Журнал кандидатов: по каждому источнику — когда адрес впервые и в последний
+# раз попался в его списке; по каждому адресу — последний вердикт проверки.
+# Вердикт общий для всех источников: жив прокси или нет, не зависит от того,
+# кто его перечислил. Обновление списка сверяется с журналом, и проверять
+# идут только новые адреса и адреса с истёкшим вердиктом.
+CHECK_TTL = 600               # c: вердикт "жив" годен столько же, сколько кэш пула
+DEAD_TTL = NEG_STALE_AFTER    # c: "не работает" — дольше, таких в бесплатных списках большинство
+FORGET_AFTER = 7 * 24 * 3600  # c: адрес, не попадавшийся неделю, забываем
+MAX_SEEN = 100_000
+
+T = TypeVar("T")
+
+
+class CandidateLedger:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else app_root() / "cache" / "candidate_ledger.json"
+        # "<источник>|<ключ>" -> {"first", "ts" (последний раз в списке)}
+        self._seen = ValidationCache(self.path, max_entries=MAX_SEEN,
+                                     stale_after=FORGET_AFTER, neg_stale_after=FORGET_AFTER)
+        # ключ прокси -> вердикт в формате кэша пула ({"ok", "ts", "ip", "cc", "ping", ...})
+        self._checks = ValidationCache(self.path.with_name("candidate_checks.json"), max_entries=MAX_SEEN,
+                                       stale_after=CHECK_TTL, neg_stale_after=DEAD_TTL)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Counter] = {}
+
+    # ------------------------------------------------------------------
+    def verdict(self, key: str, now: Optional[float] = None) -> Optional[dict]:
+        """Непросроченный вердикт по ключу или None."""
+        c = self._checks.get(key)
+        if c is None:
+            return None
+        ttl = CHECK_TTL if c.get("ok") else DEAD_TTL
+        return c if (now or time.time()) - c.get("ts", 0) < ttl else None
+
+    def observe(self, source: str, keys: Iterable[str], now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Сверяет свежий список источника с журналом: new — раньше не встречался,
+        expired — встречался, но вердикта нет или он истёк, reused — вердикт годен.
+        """
+        now = now or time.time()
+        diff = Counter(new=0, expired=0, reused=0)
+        for key in keys:
+            seen_key = f"{source}|{key}"
+            entry = self._seen.get(seen_key)
+            if entry is None:
+                self._seen[seen_key] = {"first": now, "ts": now}
+                diff["new"] += 1
+                continue
+            self._seen[seen_key] = {**entry, "ts": now}
+            diff["reused" if self.verdict(key, now) is not None else "expired"] += 1
+        with self._lock:
+            self._counts.setdefault(source, Counter()).update(diff)
+        return dict(diff)
+
+    def split(self, items: Iterable[T], key_of: Callable[[T], str]) -> Tuple[List[T], List[Tuple[T, dict]]]:
+        """(проверить, [(элемент, годный вердикт)]); ключ "" — всегда проверять."""
+        now = time.time()
+        todo: List[T] = []
+        reused: List[Tuple[T, dict]] = []
+        for item in items:
+            key = key_of(item)
+            c = self.verdict(key, now) if key else None
+            if c is None:
+                todo.append(item)
+            else:
+                reused.append((item, c))
+        return todo, reused
+
+    def record(self, key: str, vr: ValidationResult) -> None:
+        if vr.ok:
+            self._checks[key] = {"ok": True, "ip": vr.ip, "country": vr.country, "cc": vr.cc,
+                                 "ping": vr.ping_ms, "ts": time.time()}
+        else:
+            self._checks[key] = {"ok": False, "ts": time.time()}
+
+    @staticmethod
+    def result(entry: dict) -> ValidationResult:
+        if not entry.get("ok"):
+            return ValidationResult(False, error="cached")
+        return ValidationResult(True, ip=entry.get("ip"), country=entry.get("country"),
+                                cc=entry.get("cc"), ping_ms=entry.get("ping"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_source = {name: dict(c) for name, c in self._counts.items()}
+        total = Counter()
+        for name, c in per_source.items():
+            total.update(c)
+            seen = sum(c.values())
+            c["hit_rate"] = round(c["reused"] / seen, 3) if seen else None
+        seen = sum(total.values())
+        return {"sources": per_source, "new": total["new"], "expired": total["expired"], "reused": total["reused"],
+                "hit_rate": round(total["reused"] / seen, 3) if seen else None,
+                "known": len(self._seen), "verdicts": len(self._checks)}
+
+    def flush(self) -> None:
+        self._seen.flush()
+        self._checks.flush()
+
+
+_ledger: Optional[CandidateLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> CandidateLedger:
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = CandidateLedger()
+    return _ledger
+
+
+def set_ledger(ledger: Optional[CandidateLedger]) -> None:
+    global _ledger
+    _ledger = ledger
@@ -1,15 +1,33 @@
 from __future__ import annotations
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from typing import Optional
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Proxy:
+    # Неизменяемый и без __dict__: пулы на сотни тысяч записей. scheme и country
+    # интернируются (значений единицы), ключ строится один раз; хэш — хэш ключа,
+    # str кэширует его сам.
     scheme: str            # "http" | "socks4" | "socks5"
     host: str
     port: int
     username: Optional[str] = None
     password: Optional[str] = None
     country: Optional[str] = None
+    key: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        scheme = sys.intern(self.scheme)
+        object.__setattr__(self, "scheme", scheme)
+        object.__setattr__(self, "port", int(self.port))
+        if self.country:
+            object.__setattr__(self, "country", sys.intern(self.country))
+        # ключ идентичности прокси: пул, кэш проверок, здоровье, аренды, Proxy Lab
+        key = f"{scheme}:{self.host}:{self.port}:{self.username or ''}"
+        object.__setattr__(self, "key", key)
+
+    def __hash__(self) -> int:
+        return hash(self.key)
 
     def url(self, with_auth: bool = False, remote_dns: bool = True) -> str:
         scheme = self.scheme.lower()
@@ -21,4 +39,4 @@ class Proxy:
         auth = ""
         if with_auth and self.username:
             auth = f"{self.username}:{self.password or ''}@"
-        return f"{scheme}://{auth}{self.host}:{self.port}"
\ No newline at end of file
+        return f"{scheme}://{auth}{self.host}:{self.port}"
@@ -40,7 +40,6 @@ def parse_lines_to_candidates(lines: Iterable[str], default_scheme: str = "http"
     seen = set()
     uniq: List[Proxy] = []
     for p in out:
-        key = (p.scheme, p.host, p.port, p.username or "")
-        if key not in seen:
-            uniq.append(p); seen.add(key)
+        if p.key not in seen:
+            uniq.append(p); seen.add(p.key)
     return uniq
\ No newline at end of file
@@ -1,54 +1,223 @@
 from __future__ import annotations
-import csv, json, random, threading, time
+import csv, heapq, io, itertools, json, math, os, queue, random, threading, time
+import psutil
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
+from typing import Container, Dict, Iterable, List, Optional, Tuple
 from proxy.models import Proxy
-from proxy.validate import validate_proxy, ValidationResult
+from proxy.async_validate import validate_many
+from proxy.cache import ValidationCache
+from proxy.health import HealthBook, get_book
+from proxy.index import Combo, ProxyIndex, combo_for, proxy_key
+from proxy.store import ProxyStore
+from proxy.validate import ValidationResult
+from tools.lock_manager import FileLock
 from tools.logging_setup import app_root, get_logger
 
 log = get_logger()
 
 CSV_HEADER = ["scheme","host","port","username","password","country"]
 TTL_SECONDS = 600  # 10 минут sticky и кэш
+SELECT_CONCURRENCY = 8  # ширина гонки в select_live, пока нет данных о здоровье
+RACE_MIN, RACE_MAX = 4, 32  # пределы ширины гонки
+WEIGHTED_SAMPLE = 16  # сколько здоровых кандидатов сравниваем по весу при выборе из кэша
+RACE_MISS = 0.05  # ширина K такая, чтобы все K проверок упали с вероятностью не выше этой
+INVENTORY_TARGET = 5  # сколько свежепроверенных держать наготове на каждую востребованную (страна, схема)
+REVALIDATE_HORIZON = TTL_SECONDS / 3  # фоновая перепроверка берёт живых, кому до истечения меньше этого
+_TAIL = 64  # байт перед концом прочитанного — проверка, что файл только дописали
 
 class ProxyPool:
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, db_path: Optional[Path] = None):
+        """
+        backend: "files" (proxies.csv + JSON, по умолчанию) или "sqlite" (cache/pool.db, WAL);
+        по умолчанию берётся из AICHROME_POOL_BACKEND. При первом обращении к пустой
+        БД в неё переносятся существующие файлы.
+        """
         self.root = app_root()
         self.csv_path = self.root / "proxies.csv"
         self.cache_path = self.root / "cache" / "proxies_cache.json"
         self.sticky_path = self.root / "cache" / "sticky.json"
         self._lock = threading.RLock()
-        self._mem_cache: dict[str, dict] = self._load_cache()
+        self.backend = (backend or os.environ.get("AICHROME_POOL_BACKEND") or "files").lower()
+        self.store: Optional[ProxyStore] = ProxyStore(db_path) if self.backend == "sqlite" else None
+        self._mem_cache = self._load_cache()
+        # пул держим в памяти с индексами; перечитываем только изменения
+        self._index = ProxyIndex()
+        self._csv_sig: Optional[Tuple[int, int]] = None   # (mtime_ns, size)
+        self._csv_offset = 0
+        self._csv_tail = b""
+        self._csv_fields: Optional[List[str]] = None
+        self._db_version: Optional[int] = None
+        self._db_rowid = 0
+        self._db_dirty = True
+        self._db_migrated = False
+        self._own_book: Optional[HealthBook] = None
+        # тёплый запас: combo -> сколько свежепроверенных держать; пополняет proxy.revalidate
+        self._wanted: Dict[Combo, int] = {}
+        # запас, заказанный другими процессами (GUI/API): перепроверяет пул один из них (proxy.revalidate)
+        self._shared_wanted: Dict[Combo, int] = {}
+        self._shared_sig: Optional[Tuple[int, int]] = None
+        self.demand = threading.Event()  # новая комбинация — разбудить фоновую перепроверку
 
-    def _load_cache(self) -> dict:
-        try:
-            if self.cache_path.exists():
-                return json.loads(self.cache_path.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-        return {}
+    def _load_cache(self) -> ValidationCache:
+        if self.store is not None:
+            cache = ValidationCache()
+            self._checks_since = time.time() - TTL_SECONDS
+            self._pull_checks(cache)
+            return cache
+        # запись на диск — фоном и пачками, а не на каждую проверку
+        return ValidationCache(self.cache_path)
+
+    def _pull_checks(self, cache: ValidationCache) -> List[str]:
+        """SQLite: проверки, записанные с прошлого раза (в том числе другими процессами), — в кэш."""
+        changed = []
+        for key, entry in self.store.latest_checks(since=self._checks_since).items():
+            cur = cache.get(key)
+            if cur is None or cur.get("ts", 0) < entry["ts"]:
+                cache[key] = entry
+                changed.append(key)
+            self._checks_since = max(self._checks_since, entry["ts"])
+        return changed
 
     def _save_cache(self):
-        try:
-            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
-            self.cache_path.write_text(json.dumps(self._mem_cache, ensure_ascii=False), encoding="utf-8")
-        except Exception as e:
-            log.error(f"cache save error: {e}")
+        """Немедленно сбросить кэш на диск (обычно это делает фоновый поток)."""
+        self._mem_cache.flush()
 
-    def read_csv(self) -> List[Proxy]:
-        items: List[Proxy] = []
-        if not self.csv_path.exists():
-            return items
-        with self.csv_path.open("r", encoding="utf-8", newline="") as f:
-            reader = csv.DictReader(f)
-            for r in reader:
+    @staticmethod
+    def _row_to_proxy(r: dict) -> Proxy:
+        # tools/proxy_pool пишет тот же формат с колонкой "type" вместо "scheme"
+        scheme = (r.get("scheme") or r["type"]).strip().lower()
+        return Proxy(scheme, r["host"].strip(), int(r["port"]), r.get("username") or None, r.get("password") or None, r.get("country") or None)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Синхронизирует индекс с proxies.csv: один stat(), если файл не менялся;
+        если его только дописали — разбираются лишь новые строки. True, если были изменения.
+        """
+        if self.store is not None:
+            return self._refresh_store(force)
+        with self._lock:
+            if self._mem_cache.path != self.cache_path:
+                # cache_path поменяли после создания пула
+                self._mem_cache.flush()
+                self._mem_cache = self._load_cache()
+            # проверки, которые записал другой процесс (фоновая перепроверка идёт в одном из них)
+            synced = self._mem_cache.sync()
+            if synced:
+                self._apply_cached_health(synced)
+            try:
+                st = self.csv_path.stat()
+            except OSError:
+                changed = self._csv_sig is not None
+                self._index.clear()
+                self._csv_sig, self._csv_offset, self._csv_tail, self._csv_fields = None, 0, b"", None
+                return changed
+            sig = (st.st_mtime_ns, st.st_size)
+            if sig == self._csv_sig and not force:
+                return False
+            with self.csv_path.open("rb") as f:
+                start = 0
+                if not force and self._csv_fields and st.st_size > self._csv_offset > 0:
+                    f.seek(self._csv_offset - len(self._csv_tail))
+                    if f.read(len(self._csv_tail)) == self._csv_tail:
+                        start = self._csv_offset
+                if start == 0:
+                    f.seek(0)
+                    self._index.clear()
+                    self._csv_fields = None
+                data = f.read()
+            # только целые строки: хвост без \n могут ещё дописывать
+            end = data.rfind(b"\n") + 1
+            self._parse_rows(data[:end].decode("utf-8-sig" if start == 0 else "utf-8", errors="replace"))
+            self._csv_offset = start + end
+            with self.csv_path.open("rb") as f:
+                f.seek(max(0, self._csv_offset - _TAIL))
+                self._csv_tail = f.read(min(_TAIL, self._csv_offset))
+            self._csv_sig = sig
+            self._apply_cached_health()
+            return True
+
+    def _refresh_store(self, force: bool) -> bool:
+        # data_version меняют только чужие коммиты; свои записи отмечаем _db_dirty
+        with self._lock:
+            if not self._db_migrated:
+                # первое обращение к пустой БД — переносим proxies.csv и JSON-кэши
+                self._db_migrated = True
+                if self.store.stamp()[0] == 0 and self.csv_path.exists():
+                    self.store.migrate_from_files(self.csv_path, self.cache_path, self.sticky_path)
+                    self._mem_cache = self._load_cache()
+            version = self.store.data_version()
+            if not force and not self._db_dirty and version == self._db_version:
+                return False
+            # проверки других процессов (фоновая перепроверка идёт в одном из них); здоровье — ниже
+            self._pull_checks(self._mem_cache)
+            count, _top = self.store.stamp()
+            if force:
+                self._index.clear()
+                self._db_rowid = 0
+            for rowid, p in self.store.iter_proxies(self._db_rowid):
+                self._index.add(p)
+                self._db_rowid = rowid
+            if len(self._index) != count:
+                # были удаления/замены — полная перезагрузка
+                self._index.clear()
+                self._db_rowid = 0
+                for rowid, p in self.store.iter_proxies():
+                    self._index.add(p)
+                    self._db_rowid = rowid
+            self._db_version, self._db_dirty = version, False
+            self._apply_cached_health()
+            return True
+
+    def _parse_rows(self, text: str) -> None:
+        reader = csv.reader(io.StringIO(text))
+        if self._csv_fields is None:
+            header = next(reader, None)
+            if header is None:
+                return
+            self._csv_fields = [h.strip() for h in header]
+        for row in reader:
+            try:
+                self._index.add(self._row_to_proxy(dict(zip(self._csv_fields, row))))
+            except Exception:
+                continue
+
+    def _apply_cached_health(self, keys: Optional[Iterable[str]] = None) -> None:
+        now = time.time()
+        entries = self._mem_cache.items() if keys is None else ((k, self._mem_cache.get(k)) for k in keys)
+        for key, c in entries:
+            if c is not None and key in self._index.items:
+                fresh = now - c.get("ts", 0) < TTL_SECONDS
+                self._index.set_health(key, bool(c.get("ok")) if fresh else None)
+
+    def watch(self, interval: float = 2.0) -> threading.Event:
+        """Фоновая синхронизация с proxies.csv / БД; set() у возвращённого Event — остановить."""
+        stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(interval):
                 try:
-                    items.append(Proxy(r["scheme"], r["host"], int(r["port"]), r.get("username") or None, r.get("password") or None, r.get("country") or None))
-                except Exception:
-                    continue
-        return items
+                    self.refresh()
+                except Exception as e:
+                    log.warning(f"pool refresh error: {e}")
+
+        threading.Thread(target=_loop, name="proxy-pool-watch", daemon=True).start()
+        return stop
+
+    def read_csv(self) -> List[Proxy]:
+        self.refresh()
+        with self._lock:
+            return list(self._index.items.values())
+
+    def count(self, country: Optional[str] = None, scheme: Optional[str] = None) -> int:
+        self.refresh()
+        return self._index.count(combo_for(country, scheme))
 
     def append_to_csv(self, proxies: Iterable[Proxy]):
+        """Добавляет прокси в пул: в proxies.csv или, с SQLite, в таблицу proxies."""
+        if self.store is not None:
+            self.store.add_proxies(proxies)
+            self._db_dirty = True
+            return
         write_header = not self.csv_path.exists()
         with self.csv_path.open("a", encoding="utf-8", newline="") as f:
             w = csv.writer(f)
@@ -57,33 +226,323 @@ class ProxyPool:
             for p in proxies:
                 w.writerow([p.scheme, p.host, p.port, p.username or "", p.password or "", p.country or ""])
 
-    def select_live(self, country: Optional[str], scheme: Optional[str]) -> Tuple[Optional[Proxy], Optional[ValidationResult]]:
+    def select_live(self, country: Optional[str], scheme: Optional[str],
+                    skip: Optional[Container[str]] = None) -> Tuple[Optional[Proxy], Optional[ValidationResult]]:
         """
-        Возвращает первый живой прокси из пула с учётом страны/типа.
-        Кэширует успешную проверку на TTL.
+        Возвращает живой прокси из пула с учётом страны/типа: сначала из кэша
+        проверок (TTL), иначе — гонка параллельных проверок (_race).
+        skip — ключи, которые выдавать нельзя (например, занятые арендой, proxy.lease).
         """
-        cand = [p for p in self.read_csv()
-                if (not country or (p.country or "").upper() == country.upper())
-                and (not scheme or p.scheme.lower() == scheme.lower())]
-        random.shuffle(cand)
+        self.refresh()
+        combo = combo_for(country, scheme)
+        self.want(country, scheme)
+        if skip:
+            live = [(p, vr) for p, vr in self.live(country, scheme) if self._key(p) not in skip]
+            if live:
+                key = self.health().weighted_choice([self._key(p) for p, _vr in live])
+                return next((p, vr) for p, vr in live if self._key(p) == key)
+            return self._race(combo, skip)
         now = time.time()
-        for p in cand:
-            key = f"{p.scheme}:{p.host}:{p.port}:{p.username or ''}"
+        with self._lock:
+            healthy = self._index.healthy(combo)
+            while len(healthy):
+                # случайная выборка здоровых, из неё — взвешенно по здоровью (быстрые и стабильные чаще)
+                fresh = []
+                sample = list(healthy) if len(healthy) <= WEIGHTED_SAMPLE else \
+                    {healthy.choice() for _ in range(WEIGHTED_SAMPLE)}
+                for key in sample:
+                    c = self._mem_cache.get(key)
+                    if c and now - c.get("ts", 0) < TTL_SECONDS and c.get("ok"):
+                        fresh.append(key)
+                    else:
+                        self._index.set_health(key, None)
+                if fresh:
+                    key = self.health().weighted_choice(fresh)
+                    return self._index.items[key], self._cached_result(key)
+        return self._race(combo)
+
+    def live(self, country: Optional[str], scheme: Optional[str]) -> List[Tuple[Proxy, ValidationResult]]:
+        """Все живые по свежему кэшу (тёплый запас) — без сети; устаревшие снимаются с индекса здоровых."""
+        self.refresh()
+        combo = combo_for(country, scheme)
+        now = time.time()
+        out = []
+        with self._lock:
+            for key in list(self._index.healthy(combo)):
+                c = self._mem_cache.get(key)
+                if c and now - c.get("ts", 0) < TTL_SECONDS and c.get("ok"):
+                    out.append((self._index.items[key], self._cached_result(key)))
+                else:
+                    self._index.set_health(key, None)
+        return out
+
+    def fresh_result(self, p: Proxy, max_age: float = TTL_SECONDS - REVALIDATE_HORIZON) -> Optional[ValidationResult]:
+        """Результат недавней успешной проверки (не старше max_age) или None — тогда проверять."""
+        key = self._key(p)
+        with self._lock:
             c = self._mem_cache.get(key)
-            if c and now - c.get("ts", 0) < TTL_SECONDS and c.get("ok"):
-                return p, ValidationResult(True, ip=c.get("ip"), country=c.get("country"), cc=c.get("cc"), ping_ms=c.get("ping"))
-            vr = validate_proxy(p)
-            if vr.ok:
-                self._mem_cache[key] = {"ok": True, "ip": vr.ip, "country": vr.country, "cc": vr.cc, "ping": vr.ping_ms, "ts": now}
-                self._save_cache()
-                return p, vr
+            if c and c.get("ok") and time.time() - c.get("ts", 0) < max_age:
+                return self._cached_result(key)
+        return None
+
+    def _cached_result(self, key: str) -> ValidationResult:
+        c = self._mem_cache.get(key)
+        return ValidationResult(True, ip=c.get("ip"), country=c.get("country"), cc=c.get("cc"), ping_ms=c.get("ping"))
+
+    def _race_plan(self, combo: Combo) -> Tuple[int, List[str]]:
+        """
+        По кэшу проверок: ширина гонки K из доли живых в этой комбинации
+        и ключи, живые при прошлой проверке (TTL истёк) — по здоровью, они идут первыми.
+        """
+        members = self._index.by.get(combo)
+        if not members:
+            return SELECT_CONCURRENCY, []
+        ok = bad = 0
+        book = self.health()
+        prior: List[Tuple[float, str]] = []
+        for key in members:  # только эта комбинация, а не весь кэш
+            c = self._mem_cache.get(key)
+            if c is None:
+                continue
+            if c.get("ok"):
+                ok += 1
+                prior.append((-book.score(key), key))
             else:
-                self._mem_cache[key] = {"ok": False, "ts": now}
-                self._save_cache()
-        return None, None
+                bad += 1
+        if ok + bad == 0:
+            return SELECT_CONCURRENCY, []
+        rate = (ok + 1) / (ok + bad + 2)
+        k = math.ceil(math.log(RACE_MISS) / math.log(1 - rate)) if rate < 1 else 1
+        prior.sort()
+        return max(RACE_MIN, min(RACE_MAX, k)), [key for _score, key in prior]
+
+    def _race(self, combo: Combo, skip: Container[str] = ()) -> Tuple[Optional[Proxy], Optional[ValidationResult]]:
+        """
+        K проверок одновременно, первый успех возвращается сразу. Новые проверки
+        после этого не начинаются, а уже идущие доигрывают в фоне и пишут
+        результат в кэш — следующий вызов обойдётся без сети.
+        """
+        with self._lock:
+            k, first_keys = self._race_plan(combo)
+            first = [self._index.items[key] for key in first_keys if key in self._index.items and key not in skip]
+            # снимок под замком: _feed идёт в потоке validate_many, а refresh()/watch() меняют индекс
+            rest = list(self._index.candidates(combo))
+        won = threading.Event()
+        winner: queue.Queue = queue.Queue()
+        book = self.health()
+
+        def _feed():
+            # упавшие подряд пропускаем до конца их backoff — без единого соединения
+            seen = set(skip)
+            now = time.time()
+            for p in first:
+                if won.is_set():
+                    return
+                key = self._key(p)
+                seen.add(key)
+                if not book.backed_off(key, now):
+                    yield p
+            for p in rest:
+                if won.is_set():
+                    return
+                key = self._key(p)
+                if key in seen:
+                    continue
+                if book.backed_off(key, now):
+                    book.skipped += 1
+                    continue
+                yield p
+
+        def _run():
+            try:
+                for p, vr in validate_many(_feed(), concurrency=k, source="pool"):
+                    self._record(p, vr)
+                    if vr.ok and not won.is_set():
+                        won.set()
+                        winner.put((p, vr))
+            except Exception as e:
+                log.error(f"select_live race error: {e}")
+            finally:
+                winner.put((None, None))
+
+        threading.Thread(target=_run, name="proxy-pool-race", daemon=True).start()
+        return winner.get()
+
+    def want(self, country: Optional[str], scheme: Optional[str], target: int = INVENTORY_TARGET) -> None:
+        """Держать наготове target свежепроверенных прокси для (страна, схема)."""
+        combo = combo_for(country, scheme)
+        with self._lock:
+            if self._wanted.get(combo, 0) >= target:
+                return
+            self._wanted[combo] = target
+            mine = [[cc, sch, t] for (cc, sch), t in self._wanted.items()]
+        self._share_wanted(mine)
+        self.demand.set()
+
+    @property
+    def wanted_path(self) -> Path:
+        return self.cache_path.with_name("pool_wanted.json")
+
+    def _share_wanted(self, mine: list) -> None:
+        """Заказ этого процесса — в pool_wanted.json ({pid: [[страна, схема, цель], ...]}), заказы умерших — вон."""
+        path = self.wanted_path
+        try:
+            with FileLock(path.with_name(path.name + ".lock")):
+                data = _read_json(path)
+                data = {pid: combos for pid, combos in data.items() if pid.isdigit() and psutil.pid_exists(int(pid))}
+                data[str(os.getpid())] = mine
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_text(json.dumps(data), encoding="utf-8")
+                os.replace(tmp, path)
+        except Exception as e:
+            log.warning(f"pool wanted save error: {e}")
+
+    def wanted(self) -> Dict[Combo, int]:
+        """Заказанный тёплый запас: свой и живых соседних процессов (перечитывается при изменении файла)."""
+        path = self.wanted_path
+        try:
+            st = path.stat()
+            sig = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            sig = None
+        if sig != self._shared_sig:
+            shared: Dict[Combo, int] = {}
+            me = str(os.getpid())
+            for pid, combos in _read_json(path).items():
+                if pid == me or not pid.isdigit() or not psutil.pid_exists(int(pid)):
+                    continue
+                for cc, sch, t in combos:
+                    combo = combo_for(cc, sch)
+                    shared[combo] = max(shared.get(combo, 0), int(t))
+            self._shared_wanted, self._shared_sig = shared, sig
+        with self._lock:
+            out = dict(self._shared_wanted)
+            for combo, t in self._wanted.items():
+                out[combo] = max(out.get(combo, 0), t)
+        return out
+
+    def _fresh_count(self, combo: Combo, upto: int, now: float) -> int:
+        n = 0
+        for key in self._index.healthy(combo):
+            c = self._mem_cache.get(key)
+            if c and c.get("ok") and now - c.get("ts", 0) < TTL_SECONDS - REVALIDATE_HORIZON:
+                n += 1
+                if n >= upto:
+                    break
+        return n
+
+    def inventory(self) -> Dict[str, Tuple[int, int]]:
+        """{"US/http": (свежих, цель)} по востребованным комбинациям."""
+        now = time.time()
+        wanted = self.wanted()
+        with self._lock:
+            return {f"{cc or '*'}/{scheme or '*'}": (self._fresh_count((cc, scheme), target, now), target)
+                    for (cc, scheme), target in wanted.items()}
+
+    def top_up(self, limit: int) -> List[Proxy]:
+        """
+        Кого проверить, чтобы добрать тёплый запас: для каждой комбинации с недобором
+        столько кандидатов, сколько по доле живых нужно на недостающие (как ширина гонки).
+        """
+        self.refresh()
+        now = time.time()
+        book = self.health()
+        out: List[Proxy] = []
+        taken = set()
+        wanted = self.wanted()
+        with self._lock:
+            for combo, target in wanted.items():
+                missing = target - self._fresh_count(combo, target, now)
+                if missing <= 0 or len(out) >= limit:
+                    continue
+                k, prior = self._race_plan(combo)
+                budget = min(limit - len(out), k * missing)
+                rest = (self._key(p) for p in self._index.candidates(combo))
+                for key in itertools.chain(prior, rest):
+                    if budget <= 0:
+                        break
+                    if key in taken or book.backed_off(key, now):
+                        continue
+                    c = self._mem_cache.get(key)
+                    if c and now - c.get("ts", 0) < (TTL_SECONDS - REVALIDATE_HORIZON if c.get("ok") else TTL_SECONDS):
+                        continue  # живой уже в запасе, мёртвый проверен недавно
+                    taken.add(key)
+                    out.append(self._index.items[key])
+                    budget -= 1
+        return out
+
+    def due_for_check(self, limit: int, horizon: float = REVALIDATE_HORIZON) -> List[Proxy]:
+        """
+        Очередь фоновой перепроверки (proxy.revalidate), до limit прокси:
+        сначала живые, у которых запись кэша истекает в ближайшие horizon секунд
+        (или уже истекла), — раньше те, что ценнее по здоровью; затем непроверенные.
+        Свежие и ждущие backoff не попадают.
+        """
+        self.refresh()
+        now = time.time()
+        book = self.health()
+        due: List[Tuple[float, str]] = []
+        untested: List[str] = []
+        with self._lock:
+            for key in self._index.items:
+                c = self._mem_cache.get(key)
+                if c is None:
+                    untested.append(key)
+                    continue
+                if not c.get("ok"):
+                    continue
+                left = c.get("ts", 0) + TTL_SECONDS - now
+                if left < horizon and not book.backed_off(key, now):
+                    # чем меньше осталось и чем здоровее прокси, тем раньше
+                    due.append((left / (0.5 + book.score(key, now)), key))
+            keys = [key for _prio, key in heapq.nsmallest(limit, due)]
+            if len(keys) < limit:
+                random.shuffle(untested)
+                keys.extend(k for k in untested if not book.backed_off(k, now))
+            return [self._index.items[key] for key in keys[:limit]]
+
+    def check(self, proxies: Iterable[Proxy], concurrency: int = SELECT_CONCURRENCY,
+              source: str = "revalidate") -> int:
+        """Проверяет прокси и записывает результаты в кэш/здоровье. Возвращает число живых."""
+        alive = 0
+        for p, vr in validate_many(proxies, concurrency=concurrency, source=source):
+            self._record(p, vr)
+            alive += vr.ok
+        return alive
+
+    def _record(self, p: Proxy, vr: ValidationResult) -> None:
+        if vr.ok:
+            self._remember(self._key(p), {"ok": True, "ip": vr.ip, "country": vr.country, "cc": vr.cc, "ping": vr.ping_ms, "ts": time.time()})
+        else:
+            self._remember(self._key(p), {"ok": False, "ts": time.time()})
+
+    def health(self) -> HealthBook:
+        """Книга здоровья рядом с кэшем проверок; для стандартного пути — общая с tools/proxy_pool."""
+        path = self.cache_path.with_name("proxy_health.json")
+        book = get_book()
+        if book.path == path:
+            return book
+        if self._own_book is None or self._own_book.path != path:
+            self._own_book = HealthBook(path)
+        return self._own_book
+
+    def _remember(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._mem_cache[key] = entry
+            self._index.set_health(key, entry["ok"])
+        self.health().record(key, entry["ok"], entry.get("ping"))
+        if self.store is not None:
+            self.store.record_check(key, entry)
+
+    @staticmethod
+    def _key(p: Proxy) -> str:
+        return proxy_key(p)
 
     # Sticky
     def set_sticky(self, profile_id: str, proxy: Proxy):
+        if self.store is not None:
+            self.store.set_sticky(profile_id, proxy, time.time() + TTL_SECONDS)
+            return
         self.sticky_path.parent.mkdir(parents=True, exist_ok=True)
         data = {}
         try:
@@ -97,6 +556,9 @@ class ProxyPool:
         self.sticky_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
 
     def get_sticky(self, profile_id: str) -> Optional[Proxy]:
+        if self.store is not None:
+            self.refresh()  # миграция sticky.json, если БД ещё пустая
+            return self.store.get_sticky(profile_id)
         try:
             if self.sticky_path.exists():
                 data = json.loads(self.sticky_path.read_text(encoding="utf-8"))
@@ -105,4 +567,14 @@ class ProxyPool:
                     return Proxy(x["scheme"], x["host"], int(x["port"]), x.get("username"), x.get("password"), x.get("country"))
         except Exception:
             pass
-        return None
\ No newline at end of file
+        return None
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+    except Exception as e:
+        log.warning(f"{path.name}: {e}")
+    return {}
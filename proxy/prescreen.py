@@ -0,0 +1,86 @@
+from __future__ import annotations
+import asyncio, time
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Первая стадия проверки: только TCP connect, без HTTP.
+# Мёртвые адреса из бесплатных списков отсеиваются за доли секунды,
+# а не за полный 5–8 c таймаут requests.
+CONNECT_TIMEOUT = 2.0   # на одно соединение
+DEADLINE = 4.0          # на весь проход
+CONCURRENCY = 500       # одновременных connect()
+
+Addr = Tuple[str, int]
+
+
+async def async_tcp_prescreen(addrs: Iterable[Addr], *, connect_timeout: float = CONNECT_TIMEOUT,
+                              deadline: float = DEADLINE, concurrency: int = CONCURRENCY,
+                              failed: Optional[Set[Addr]] = None) -> Dict[Addr, float]:
+    """
+    Возвращает {(host, port): connect_ms} для адресов, принявших соединение до дедлайна.
+    failed — сюда попадают адреса, чей connect действительно не удался (отказ или
+    полный connect_timeout); не дождавшиеся слота до дедлайна не попадают никуда.
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    stop_at = loop.time() + deadline
+    alive: Dict[Addr, float] = {}
+
+    async def _one(addr: Addr) -> None:
+        async with sem:
+            left = stop_at - loop.time()
+            if left <= 0:
+                return
+            t0 = time.perf_counter()
+            try:
+                transport, _ = await asyncio.wait_for(
+                    loop.create_connection(asyncio.Protocol, addr[0], int(addr[1])), min(connect_timeout, left))
+            except asyncio.TimeoutError:
+                if failed is not None and left >= connect_timeout:
+                    failed.add(addr)  # срезанный дедлайном connect — не приговор
+                return
+            except (OSError, ValueError):
+                if failed is not None:
+                    failed.add(addr)
+                return
+            alive[addr] = (time.perf_counter() - t0) * 1000
+            transport.abort()
+
+    tasks = [asyncio.ensure_future(_one(a)) for a in dict.fromkeys(addrs)]
+    if tasks:
+        _done, pending = await asyncio.wait(tasks, timeout=deadline + 0.1)
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return alive
+
+
+def tcp_prescreen(addrs: Iterable[Addr], **kwargs) -> Dict[Addr, float]:
+    """Синхронная обёртка для потоков (Tk, ThreadPool, CLI)."""
+    addrs = list(addrs)
+    if not addrs:
+        return {}
+    return asyncio.run(async_tcp_prescreen(addrs, **kwargs))
+
+
+def prescreen_items(items: List, addr_of, **kwargs) -> Tuple[List, List, List]:
+    """
+    Делит items на (reachable, unreachable, untried) по TCP connect; addr_of(item) -> (host, port).
+    Порядок reachable — по времени connect (быстрые первыми). untried — не успели
+    получить попытку до дедлайна: о них ничего не известно, их проверяют полностью.
+    """
+    keyed: Dict[Hashable, Optional[Addr]] = {}
+    for it in items:
+        try:
+            host, port = addr_of(it)
+            keyed[id(it)] = (host, int(port))
+        except (TypeError, ValueError):
+            keyed[id(it)] = None
+    failed: Set[Addr] = set()
+    alive = tcp_prescreen([a for a in keyed.values() if a], failed=failed, **kwargs)
+    ok = [it for it in items if keyed[id(it)] in alive]
+    ok.sort(key=lambda it: alive[keyed[id(it)]])
+    dead = [it for it in items if keyed[id(it)] is None or keyed[id(it)] in failed]
+    untried = [it for it in items if keyed[id(it)] is not None
+               and keyed[id(it)] not in alive and keyed[id(it)] not in failed]
+    return ok, dead, untried
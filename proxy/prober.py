@@ -0,0 +1,280 @@
+from __future__ import annotations
+import base64, ipaddress, json, os, socket, ssl, struct, time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+from proxy.models import Proxy
+
+# Эхо-цель: любой HTTP(S) endpoint, который отвечает IP клиента
+# ({"ip": ...}, {"origin": ...} или просто текстом). AICHROME_ECHO_URL
+# позволяет указать свой/локальный эхо-сервер вместо публичных сервисов.
+ECHO_URL = "https://api.ipify.org/?format=json"
+_MAX_BODY = 64 * 1024
+
+
+def default_echo_url() -> str:
+    return os.environ.get("AICHROME_ECHO_URL") or ECHO_URL
+
+
+class ProxyHandshakeError(Exception):
+    pass
+
+
+# ------------------------------------------------------------------
+# Байты протоколов — общие для синхронного и asyncio-клиента
+def norm_scheme(scheme: str) -> str:
+    s = (scheme or "http").lower()
+    if s in ("http", "https"):
+        return "http"
+    if s in ("socks", "socks5", "socks5h"):
+        return "socks5"
+    if s in ("socks4", "socks4a"):
+        return "socks4"
+    return s
+
+
+def http_connect_request(host: str, port: int, username: Optional[str], password: Optional[str]) -> bytes:
+    lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+    if username:
+        token = base64.b64encode(f"{username}:{password or ''}".encode()).decode()
+        lines.append(f"Proxy-Authorization: Basic {token}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+def check_http_connect_reply(head: bytes) -> None:
+    status_line = head.split(b"\r\n", 1)[0]
+    parts = status_line.split()
+    if len(parts) < 2 or parts[1] != b"200":
+        raise ProxyHandshakeError("CONNECT " + status_line.decode(errors="replace"))
+
+
+def socks4_request(host: str, port: int, username: Optional[str]) -> bytes:
+    user = (username or "").encode()
+    try:
+        addr = ipaddress.IPv4Address(host).packed
+        tail = b""
+    except ValueError:
+        # SOCKS4a: 0.0.0.x + имя хоста, DNS на стороне прокси
+        addr = b"\x00\x00\x00\x01"
+        tail = host.encode("idna") + b"\x00"
+    return struct.pack(">BBH", 4, 1, port) + addr + user + b"\x00" + tail
+
+
+def check_socks4_reply(resp: bytes) -> None:
+    if len(resp) < 2 or resp[1] != 0x5A:
+        raise ProxyHandshakeError(f"SOCKS4 rejected (0x{resp[1]:02x})" if len(resp) > 1 else "SOCKS4 short reply")
+
+
+def socks5_greeting(with_auth: bool) -> bytes:
+    methods = b"\x00\x02" if with_auth else b"\x00"
+    return bytes([5, len(methods)]) + methods
+
+
+def check_socks5_method(resp: bytes) -> int:
+    ver, method = resp[0], resp[1]
+    if ver != 5 or method == 0xFF:
+        raise ProxyHandshakeError("SOCKS5 no acceptable auth method")
+    return method
+
+
+def socks5_auth(username: Optional[str], password: Optional[str]) -> bytes:
+    user = (username or "").encode()
+    pwd = (password or "").encode()
+    return bytes([1, len(user)]) + user + bytes([len(pwd)]) + pwd
+
+
+def check_socks5_auth(resp: bytes) -> None:
+    if resp[1] != 0:
+        raise ProxyHandshakeError("SOCKS5 auth failed")
+
+
+def socks5_connect(host: str, port: int) -> bytes:
+    name = host.encode("idna")
+    return bytes([5, 1, 0, 3, len(name)]) + name + struct.pack(">H", port)
+
+
+def socks5_reply_tail(head: bytes) -> int:
+    """По первым 5 байтам ответа CONNECT — сколько байт осталось дочитать."""
+    if head[1] != 0:
+        raise ProxyHandshakeError(f"SOCKS5 connect failed (0x{head[1]:02x})")
+    atyp = head[3]
+    if atyp == 1:
+        return 4 + 2 - 1
+    if atyp == 4:
+        return 16 + 2 - 1
+    return head[4] + 2
+
+
+def http_get_request(host: str, path: str) -> bytes:
+    return (f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+            f"Accept: */*\r\nConnection: close\r\n\r\n").encode()
+
+
+def parse_http_head(head: bytes) -> Tuple[int, dict]:
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for ln in lines[1:]:
+        if ":" in ln:
+            k, v = ln.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    return status, headers
+
+
+def split_url(url: str) -> Tuple[str, str, int, str]:
+    u = urlsplit(url)
+    port = u.port or (443 if u.scheme == "https" else 80)
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    return u.scheme, u.hostname or "", port, path
+
+
+def extract_ip(body: bytes) -> Optional[str]:
+    text = body.decode("utf-8", errors="replace").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        text = str(data.get("ip") or data.get("origin") or "")
+    ip = text.split(",")[0].strip()
+    # страница блокировки или captive-портал с кодом 200 — не адрес
+    try:
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
+
+
+# ------------------------------------------------------------------
+# Синхронный пробник на сокетах
+@dataclass
+class ProbeTiming:
+    ok: bool
+    ip: Optional[str] = None
+    connect_ms: Optional[int] = None     # TCP до прокси
+    handshake_ms: Optional[int] = None   # CONNECT / SOCKS (+TLS до эхо-цели)
+    first_byte_ms: Optional[int] = None  # от запроса до первого байта ответа
+    total_ms: Optional[int] = None
+    error: Optional[str] = None
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ProxyHandshakeError("connection closed by proxy")
+        buf += chunk
+    return buf
+
+
+def _recv_until(sock, marker: bytes, limit: int = 16384) -> Tuple[bytes, bytes]:
+    buf = b""
+    while marker not in buf:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ProxyHandshakeError("connection closed by proxy")
+        buf += chunk
+        if len(buf) > limit:
+            raise ProxyHandshakeError("header too long")
+    head, rest = buf.split(marker, 1)
+    return head + marker, rest
+
+
+def handshake(sock, p: Proxy, host: str, port: int) -> None:
+    scheme = norm_scheme(p.scheme)
+    if scheme == "http":
+        sock.sendall(http_connect_request(host, port, p.username, p.password))
+        head, _rest = _recv_until(sock, b"\r\n\r\n")
+        check_http_connect_reply(head)
+    elif scheme == "socks4":
+        sock.sendall(socks4_request(host, port, p.username))
+        check_socks4_reply(_recv_exact(sock, 8))
+    elif scheme == "socks5":
+        sock.sendall(socks5_greeting(bool(p.username)))
+        if check_socks5_method(_recv_exact(sock, 2)) == 2:
+            sock.sendall(socks5_auth(p.username, p.password))
+            check_socks5_auth(_recv_exact(sock, 2))
+        sock.sendall(socks5_connect(host, port))
+        _recv_exact(sock, socks5_reply_tail(_recv_exact(sock, 5)))
+    else:
+        raise ProxyHandshakeError(f"unsupported scheme {p.scheme}")
+
+
+def _read_body(sock, headers: dict, rest: bytes) -> bytes:
+    buf = rest
+    if "content-length" in headers:
+        n = min(int(headers["content-length"]), _MAX_BODY)
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                break
+            buf += chunk
+        return buf[:n]
+    while len(buf) < _MAX_BODY:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        buf += chunk
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        out, data = b"", buf
+        while data:
+            size_line, _, data = data.partition(b"\r\n")
+            size = int(size_line.split(b";")[0] or b"0", 16)
+            if size == 0:
+                break
+            out += data[:size]
+            data = data[size + 2:]
+        return out
+    return buf
+
+
+def probe(p: Proxy, echo_url: Optional[str] = None, timeout: float = 5.0) -> ProbeTiming:
+    """
+    Проверка прокси напрямую по сокету: TCP → CONNECT/SOCKS → (TLS) → GET эхо-цели.
+    Возвращает IP выхода и тайминги по фазам.
+    """
+    t_scheme, t_host, t_port, t_path = split_url(echo_url or default_echo_url())
+    t0 = time.perf_counter()
+    ms = lambda a, b: int((b - a) * 1000)
+    res = ProbeTiming(False)
+    sock = None
+    try:
+        sock = socket.create_connection((p.host, int(p.port)), timeout=timeout)
+        t1 = time.perf_counter()
+        res.connect_ms = ms(t0, t1)
+        handshake(sock, p, t_host, t_port)
+        if t_scheme == "https":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=t_host)
+        t2 = time.perf_counter()
+        res.handshake_ms = ms(t1, t2)
+        sock.sendall(http_get_request(t_host, t_path))
+        first = sock.recv(4096)
+        if not first:
+            raise ProxyHandshakeError("empty reply from echo target")
+        res.first_byte_ms = ms(t2, time.perf_counter())
+        buf = first
+        while b"\r\n\r\n" not in buf:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ProxyHandshakeError("truncated reply")
+            buf += chunk
+        head, rest = buf.split(b"\r\n\r\n", 1)
+        status, headers = parse_http_head(head)
+        if status != 200:
+            raise ProxyHandshakeError(f"echo HTTP {status}")
+        res.ip = extract_ip(_read_body(sock, headers, rest))
+        if not res.ip:
+            raise ProxyHandshakeError("echo: empty ip")
+        res.ok = True
+    except socket.timeout:
+        res.error = f"timeout {timeout}s"
+    except Exception as e:
+        res.error = (str(e) or type(e).__name__)[:200]
+    finally:
+        res.total_ms = ms(t0, time.perf_counter())
+        if sock is not None:
+            try:
+                sock.close()
+            except Exception:
+                pass
+    return res
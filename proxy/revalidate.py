@@ -0,0 +1,160 @@
+from __future__ import annotations
+import os, threading, time
+from typing import Optional
+import psutil
+from tools.logging_setup import get_logger
+
+log = get_logger(__name__)
+
+# Фоновая перепроверка пула: кэш проверок живёт TTL_SECONDS, и без неё первый
+# выбор после простоя платит за полную проверку. Планировщик сначала добирает
+# тёплый запас востребованных (страна, схема) (ProxyPool.top_up), затем заранее
+# перепроверяет истекающие записи (ProxyPool.due_for_check) — в пределах бюджета
+# проверок в секунду и лимита одновременных соединений.
+RATE = 2.0           # проверок в секунду в среднем
+CONCURRENCY = 8      # одновременных проверок
+INTERVAL = 5.0       # c: длина цикла; за цикл — не больше RATE * INTERVAL проверок
+IDLE = 15.0          # c: пауза, когда перепроверять нечего
+# GUI и API работают с одними файлами пула: перепроверяет только процесс, чей PID
+# записан в revalidate.lock рядом с кэшем; остальные ждут, пока владелец не умрёт.
+CLAIM_GRACE = 5.0    # c: пустой lock-файл моложе этого — владелец его ещё пишет
+
+
+def rate_from_env(default: float = RATE) -> float:
+    """AICHROME_REVALIDATE_RATE — проверок в секунду; 0 выключает фоновую перепроверку."""
+    try:
+        return float(os.environ.get("AICHROME_REVALIDATE_RATE", default))
+    except ValueError:
+        return default
+
+
+class Revalidator:
+    """Поток, который держит кэш ProxyPool тёплым. Работает один на файлы пула: GUI или API."""
+
+    def __init__(self, pool, rate: Optional[float] = None, concurrency: int = CONCURRENCY,
+                 interval: float = INTERVAL):
+        self.pool = pool
+        self.rate = rate_from_env() if rate is None else rate
+        self.concurrency = concurrency
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cycles = 0
+        self.probes = 0
+        self.alive = 0
+        self.last_batch = 0
+        self.lock_path = pool.cache_path.with_name("revalidate.lock")
+
+    def _claim(self, retry: bool = True) -> bool:
+        """True — этот процесс владеет перепроверкой пула (захватывает, если владельца нет)."""
+        pid = os.getpid()
+        try:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                owner = int(self.lock_path.read_text(encoding="utf-8") or 0)
+                age = time.time() - self.lock_path.stat().st_mtime
+            except (OSError, ValueError):
+                owner, age = 0, 0.0
+            if owner == pid:
+                return True
+            if (owner and psutil.pid_exists(owner)) or (not owner and age < CLAIM_GRACE):
+                return False
+            try:
+                self.lock_path.unlink()  # владелец умер
+            except OSError:
+                pass
+            return retry and self._claim(retry=False)
+        except OSError as e:
+            log.warning(f"revalidate lock: {e}")
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(str(pid))
+        return True
+
+    def _release_claim(self) -> None:
+        try:
+            if int(self.lock_path.read_text(encoding="utf-8") or 0) == os.getpid():
+                self.lock_path.unlink()
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def owner(self) -> bool:
+        try:
+            return int(self.lock_path.read_text(encoding="utf-8") or 0) == os.getpid()
+        except (OSError, ValueError):
+            return False
+
+    def start(self) -> "Revalidator":
+        if self.rate <= 0:
+            log.info("pool revalidation disabled")
+            return self
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="proxy-pool-revalidate", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self.pool.demand.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._release_claim()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def run_once(self) -> int:
+        """Один цикл: берёт очередь и проверяет её. Возвращает размер пачки."""
+        limit = max(1, int(self.rate * self.interval))
+        batch = self.pool.top_up(limit)
+        if len(batch) < limit:
+            seen = {id(p) for p in batch}
+            batch += [p for p in self.pool.due_for_check(limit) if id(p) not in seen][:limit - len(batch)]
+        if batch:
+            self.alive += self.pool.check(batch, concurrency=self.concurrency, source="revalidate")
+            self.probes += len(batch)
+        self.cycles += 1
+        self.last_batch = len(batch)
+        return len(batch)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            if not self._claim():
+                # перепроверяет другой процесс; берём на себя, когда он завершится
+                self._stop.wait(IDLE)
+                continue
+            try:
+                n = self.run_once()
+            except Exception as e:
+                log.warning(f"pool revalidation error: {e}")
+                n = 0
+            # бюджет: n проверок занимают не меньше n / rate секунд; в простое новая
+            # востребованная комбинация (ProxyPool.want) будит сразу
+            until = t0 + (n / self.rate if n else IDLE)
+            while not self._stop.is_set():
+                left = until - time.monotonic()
+                if left <= 0:
+                    break
+                if self.pool.demand.wait(left):
+                    self.pool.demand.clear()
+                    if not n:
+                        break
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "owner": self.owner,
+            "rate": self.rate,
+            "concurrency": self.concurrency,
+            "cycles": self.cycles,
+            "probes": self.probes,
+            "alive": self.alive,
+            "last_batch": self.last_batch,
+            "inventory": self.pool.inventory(),
+        }
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import hashlib, json, os, threading, time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+from proxy import transport
+from tools.logging_setup import app_root, get_logger
+
+log = get_logger(__name__)
+
+# Дисковый кэш списков прокси: cache/sources/<hash>.body + .json (ETag,
+# Last-Modified, время загрузки). Чаще MIN_REFRESH источник не запрашиваем
+# вовсе, иначе — условный GET: на 304 тело берём с диска.
+MIN_REFRESH = 300.0  # c
+
+
+def default_cache_dir() -> Path:
+    return app_root() / "cache" / "sources"
+
+
+class SourceCache:
+    def __init__(self, root: Optional[Path] = None, min_interval: float = MIN_REFRESH):
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self.fresh = 0        # отдано с диска без запроса (min_interval)
+        self.revalidated = 0  # 304 — тело с диска
+        self.downloaded = 0   # 200 — новое тело
+        self.bytes_saved = 0  # не скачано благодаря кэшу
+
+    def _paths(self, url: str):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+        return self.root / f"{name}.json", self.root / f"{name}.body"
+
+    def _read(self, url: str):
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            return meta, body_path.read_bytes()
+        except (OSError, ValueError):
+            return None, None
+
+    def _write(self, url: str, meta: dict, body: Optional[bytes]) -> None:
+        meta_path, body_path = self._paths(url)
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            if body is not None:
+                tmp = body_path.with_name(body_path.name + ".tmp")
+                tmp.write_bytes(body)
+                os.replace(tmp, body_path)
+            tmp = meta_path.with_name(meta_path.name + ".tmp")
+            tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, meta_path)
+        except OSError as e:
+            log.warning(f"source cache write error: {e}")
+
+    def _count(self, attr: str, saved: int = 0) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+            self.bytes_saved += saved
+
+    def get(self, url: str, timeout: float = 10.0, min_interval: Optional[float] = None) -> str:
+        """
+        Текст источника. Ошибка сети при наличии копии на диске — отдаём копию
+        (с предупреждением в лог), без копии — исключение наружу.
+        """
+        interval = self.min_interval if min_interval is None else min_interval
+        meta, body = self._read(url)
+        now = time.time()
+        if meta is not None and now - meta.get("fetched", 0) < interval:
+            self._count("fresh", len(body))
+            return body.decode("utf-8", errors="replace")
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        session = transport.endpoint_session(urlsplit(url).hostname or url)
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and body is not None:
+                meta["fetched"] = now
+                self._write(url, meta, None)
+                self._count("revalidated", len(body))
+                return body.decode("utf-8", errors="replace")
+            response.raise_for_status()
+        except Exception as e:
+            if body is None:
+                raise
+            log.warning(f"source {url}: {e}; using cached copy")
+            return body.decode("utf-8", errors="replace")
+        content = response.content
+        self._write(url, {"url": url, "etag": response.headers.get("ETag"),
+                          "last_modified": response.headers.get("Last-Modified"), "fetched": now}, content)
+        self._count("downloaded")
+        return content.decode(response.encoding or "utf-8", errors="replace")
+
+    def stats(self) -> dict:
+        return {"fresh": self.fresh, "revalidated": self.revalidated,
+                "downloaded": self.downloaded, "bytes_saved": self.bytes_saved}
+
+
+_cache: Optional[SourceCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SourceCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SourceCache()
+    return _cache
+
+
+def set_cache(cache: Optional[SourceCache]) -> None:
+    global _cache
+    _cache = cache
+
+
+def fetch_text(url: str, timeout: float = 10.0, min_interval: Optional[float] = None) -> str:
+    return get_cache().get(url, timeout=timeout, min_interval=min_interval)
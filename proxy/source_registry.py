@@ -0,0 +1,301 @@
+from __future__ import annotations
+import json, os, re, statistics, threading, time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from proxy.geonode import GeonodeClient
+from proxy.ledger import CandidateLedger, get_ledger
+from proxy.models import Proxy
+from proxy.source_cache import MIN_REFRESH, fetch_text
+from proxy.sources import FETCH_DEADLINE, SOURCE_TIMEOUT, SPEEDX_REFRESH, SourceReport, fetch_concurrently
+from tools.logging_setup import app_root, get_logger
+
+log = get_logger(__name__)
+
+# Источники прокси — плагины с единым интерфейсом. Реестр помнит, откуда
+# пришёл каждый кандидат, и по итогам проверок ведёт статистику источника:
+# сколько дал, какая доля оказалась живой, медианная задержка живых.
+# По ней делится бюджет проверок: больше — тем, кто реально даёт живые.
+LATENCY_WINDOW = 200     # задержек на источник для медианы
+ORIGIN_LIMIT = 100_000   # помнить источник стольких последних кандидатов
+SAVE_INTERVAL = 5.0      # c: статистика на диск не чаще
+
+
+class ProxySource:
+    """
+    Плагин источника. Переопределяются url() и parse(); fetch() по умолчанию —
+    GET через дисковый кэш (proxy.source_cache). Многостраничные источники
+    переопределяют candidates() целиком. schemes — что источник умеет
+    отдавать, countries — пусто, если любые.
+    """
+    name = ""
+    schemes: Tuple[str, ...] = ("http",)
+    countries: Tuple[str, ...] = ()
+    min_interval: float = MIN_REFRESH
+    limit: int = 200  # кандидатов с одного запроса
+
+    def supports(self, scheme: str, country: str = "") -> bool:
+        scheme = scheme.lower()
+        if scheme == "https":
+            scheme = "http"
+        return scheme in self.schemes and (not country or not self.countries or country.upper() in self.countries)
+
+    def url(self, scheme: str, country: str) -> str:
+        raise NotImplementedError
+
+    def fetch(self, scheme: str, country: str) -> str:
+        return fetch_text(self.url(scheme, country), timeout=SOURCE_TIMEOUT, min_interval=self.min_interval)
+
+    def parse(self, text: str, scheme: str, country: str) -> List[Proxy]:
+        """По умолчанию — host:port построчно; страна — запрошенная (если источник фильтрует сам)."""
+        out = []
+        for line in text.splitlines():
+            host, sep, port = line.strip().partition(":")
+            if sep and port.isdigit():
+                out.append(Proxy(scheme, host, int(port), country=country or None))
+                if len(out) >= self.limit:
+                    break
+        return out
+
+    def candidates(self, scheme: str, country: str = "") -> List[Proxy]:
+        return self.parse(self.fetch(scheme, country), scheme, country)
+
+
+class TheSpeedX(ProxySource):
+    name = "thespeedx"
+    schemes = ("http", "socks4", "socks5")
+    min_interval = SPEEDX_REFRESH
+
+    def url(self, scheme, country):
+        return f"https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/{scheme}.txt"
+
+    def parse(self, text, scheme, country):
+        return [Proxy(scheme, p.host, p.port) for p in super().parse(text, scheme, "")]  # страну не знает
+
+
+class ProxyScrape(ProxySource):
+    name = "proxyscrape"
+    schemes = ("http", "socks4", "socks5")
+
+    def url(self, scheme, country):
+        return (f"https://api.proxyscrape.com/v2/?request=get&protocol={scheme}&timeout=10000"
+                f"&country={country or 'all'}&ssl=all&anonymity=all")
+
+
+class Geonode(ProxySource):
+    name = "geonode"
+    schemes = ("http", "socks4", "socks5")
+
+    def __init__(self, client: Optional[GeonodeClient] = None):
+        self.client = client or GeonodeClient(min_interval=self.min_interval)
+
+    def candidates(self, scheme, country=""):
+        # постранично и параллельно, фильтры — в запросе (proxy.geonode)
+        return list(self.client.stream(country, [scheme], target=self.limit))
+
+
+class ProxyListDownload(ProxySource):
+    name = "proxy-list.download"
+    schemes = ("http", "socks4", "socks5")
+
+    def url(self, scheme, country):
+        return f"https://www.proxy-list.download/api/v1/get?type={scheme}&country={country}"
+
+
+class FreeProxyList(ProxySource):
+    name = "free-proxy-list"
+    _ip_port = re.compile(r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{2,5})")
+
+    def url(self, scheme, country):
+        return "https://free-proxy-list.net/"
+
+    def parse(self, text, scheme, country):
+        # HTML: IP:PORT где угодно на странице, страну не знает
+        return [Proxy(scheme, ip, int(port)) for ip, port in self._ip_port.findall(text)[:self.limit]]
+
+
+class _Stats:
+    __slots__ = ("returned", "validated", "live", "latencies")
+
+    def __init__(self, returned=0, validated=0, live=0, latencies=()):
+        self.returned = returned
+        self.validated = validated
+        self.live = live
+        self.latencies = deque(latencies, maxlen=LATENCY_WINDOW)
+
+    @property
+    def live_share(self) -> float:
+        # Лаплас: новый источник — 0.5, а не 0 и не 1
+        return (self.live + 1) / (self.validated + 2)
+
+
+class SourceRegistry:
+    def __init__(self, path: Optional[Path] = None, ledger: Optional[CandidateLedger] = None):
+        self.path = Path(path) if path is not None else app_root() / "cache" / "source_stats.json"
+        self.ledger = ledger  # журнал кандидатов (proxy.ledger): сверка обновлений, годные вердикты
+        self._sources: "OrderedDict[str, ProxySource]" = OrderedDict()
+        self._stats: Dict[str, _Stats] = {}
+        self._origin: "OrderedDict[str, str]" = OrderedDict()  # Proxy.key -> имя источника
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Плагины
+    def register(self, source: ProxySource) -> ProxySource:
+        with self._lock:
+            self._sources[source.name] = source
+            self._stats.setdefault(source.name, _Stats())
+        return source
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._sources.pop(name, None)
+
+    def sources(self, scheme: Optional[str] = None, country: str = "") -> List[ProxySource]:
+        with self._lock:
+            items = list(self._sources.values())
+        return [s for s in items if scheme is None or s.supports(scheme, country)]
+
+    # ------------------------------------------------------------------
+    # Сбор и учёт
+    def gather(self, schemes: Sequence[str], country: str = "",
+               deadline: float = FETCH_DEADLINE) -> Tuple[Dict[str, List[Proxy]], List[SourceReport]]:
+        """Все подходящие источники × схемы одновременно; результат — по источникам."""
+        fetchers: Dict[str, Callable[[], list]] = {}
+        for scheme in dict.fromkeys(s.lower() for s in schemes):
+            for src in self.sources(scheme, country):
+                fetchers[f"{src.name}/{scheme}"] = (lambda src=src, scheme=scheme: src.candidates(scheme, country))
+        results, reports = fetch_concurrently(fetchers, deadline)
+        by_source: Dict[str, List[Proxy]] = {}
+        for name, items in results.items():
+            by_source.setdefault(name.split("/", 1)[0], []).extend(items)
+        for name, items in by_source.items():
+            self.note(name, items)
+            if self.ledger is not None:
+                self.ledger.observe(name, (p.key for p in items))
+        return by_source, reports
+
+    def note(self, name: str, items: Iterable[Proxy]) -> None:
+        """Запомнить, что эти кандидаты пришли из источника name."""
+        with self._lock:
+            st = self._stats.setdefault(name, _Stats())
+            for p in items:
+                st.returned += 1
+                self._origin[p.key] = name
+                self._origin.move_to_end(p.key)
+            while len(self._origin) > ORIGIN_LIMIT:
+                self._origin.popitem(last=False)
+
+    def record(self, key: str, ok: bool, ping_ms: Optional[float] = None) -> None:
+        """Итог проверки кандидата — в статистику его источника (если он известен)."""
+        with self._lock:
+            name = self._origin.pop(key, None)
+            if name is None:
+                return
+            st = self._stats.setdefault(name, _Stats())
+            st.validated += 1
+            if ok:
+                st.live += 1
+                if ping_ms is not None:
+                    st.latencies.append(float(ping_ms))
+        self._maybe_save()
+
+    def weight(self, name: str) -> float:
+        with self._lock:
+            st = self._stats.get(name)
+        return st.live_share if st else 0.5
+
+    def allocate(self, by_source: Dict[str, List[Proxy]], budget: int) -> List[Proxy]:
+        """
+        До budget кандидатов, поделённых между источниками пропорционально доле живых
+        (каждому — хотя бы один, чтобы новые и "исправившиеся" источники не выпадали);
+        недобор одного источника отдаётся остальным. Лучшие источники — первыми.
+        С журналом бюджет тратится только на новые и просроченные: живые с годным
+        вердиктом добавляются сверх бюджета, мёртвые с годным вердиктом отбрасываются.
+        """
+        reused: List[Proxy] = []
+        if self.ledger is not None:
+            fresh = {}
+            for n, items in by_source.items():
+                todo, known = self.ledger.split(items, key_of=lambda p: p.key)
+                fresh[n] = todo
+                reused.extend(p for p, c in known if c.get("ok"))
+            by_source = fresh
+        groups = {n: items for n, items in by_source.items() if items}
+        if not groups:
+            return reused
+        order = sorted(groups, key=self.weight, reverse=True)
+        total = sum(self.weight(n) for n in order)
+        quota = {n: min(len(groups[n]), max(1, int(budget * self.weight(n) / total))) for n in order}
+        spare = budget - sum(quota.values())
+        for n in order:
+            if spare <= 0:
+                break
+            extra = min(spare, len(groups[n]) - quota[n])
+            quota[n] += extra
+            spare -= extra
+        out = [p for n in order for p in groups[n][:quota[n]]]
+        return out[:budget] + reused
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: {
+                "returned": st.returned,
+                "validated": st.validated,
+                "live": st.live,
+                "live_share": round(st.live / st.validated, 3) if st.validated else None,
+                "median_ms": round(statistics.median(st.latencies)) if st.latencies else None,
+            } for name, st in self._stats.items()}
+
+    # ------------------------------------------------------------------
+    # Диск
+    def _load(self) -> None:
+        try:
+            if self.path.exists():
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                for name, x in data.items():
+                    self._stats[name] = _Stats(x.get("returned", 0), x.get("validated", 0), x.get("live", 0),
+                                               x.get("latencies", ()))
+        except Exception as e:
+            log.warning(f"source stats load error: {e}")
+
+    def _maybe_save(self) -> None:
+        if time.time() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._saved_at = time.time()
+            payload = json.dumps({name: {"returned": st.returned, "validated": st.validated, "live": st.live,
+                                         "latencies": list(st.latencies)} for name, st in self._stats.items()})
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            log.warning(f"source stats save error: {e}")
+
+
+BUILTIN_SOURCES = (TheSpeedX, ProxyScrape, Geonode, ProxyListDownload, FreeProxyList)
+
+_registry: Optional[SourceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> SourceRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                reg = SourceRegistry(ledger=get_ledger())
+                for cls in BUILTIN_SOURCES:
+                    reg.register(cls())
+                _registry = reg
+    return _registry
+
+
+def set_registry(registry: Optional[SourceRegistry]) -> None:
+    global _registry
+    _registry = registry
@@ -1,12 +1,89 @@
 from __future__ import annotations
-import requests
+import threading
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from proxy.models import Proxy
 from tools.logging_setup import get_logger
 
 log = get_logger(__name__)
 
+# Источники опрашиваются одновременно с общим сроком: сбор занимает время
+# самого медленного из дождавшихся, а не сумму. Опоздавшие не ждём —
+# их потоки доживают в фоне до собственного таймаута запроса.
+FETCH_DEADLINE = 12.0  # c на все источники
+SOURCE_TIMEOUT = 10.0  # c на запрос к одному источнику
+SPEEDX_REFRESH = 1800  # c: список на GitHub в сотни КБ обновляется редко
+
+
+@dataclass
+class SourceReport:
+    name: str
+    ok: bool
+    count: int = 0
+    ms: Optional[int] = None
+    error: Optional[str] = None  # "deadline" — не успел к общему сроку
+
+
+_last_reports: List[SourceReport] = []
+_reports_lock = threading.Lock()
+
+
+def last_source_reports() -> List[SourceReport]:
+    """Отчёт последнего сбора: по строке на источник."""
+    with _reports_lock:
+        return list(_last_reports)
+
+
+def fetch_concurrently(fetchers: Dict[str, Callable[[], list]],
+                       deadline: float = FETCH_DEADLINE) -> Tuple[Dict[str, list], List[SourceReport]]:
+    """
+    Запускает все fetchers параллельно и ждёт не дольше deadline.
+    Возвращает результаты успевших источников и отчёт по каждому.
+    """
+    global _last_reports
+    if not fetchers:
+        return {}, []
+    t0 = time.perf_counter()
+    started: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+
+    def _timed(name, fn):
+        started[name] = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            finished[name] = time.perf_counter()
+
+    ex = ThreadPoolExecutor(max_workers=len(fetchers), thread_name_prefix="proxy-source")
+    futures = {name: ex.submit(_timed, name, fn) for name, fn in fetchers.items()}
+    wait(futures.values(), timeout=deadline)
+    ex.shutdown(wait=False, cancel_futures=True)
+
+    results: Dict[str, list] = {}
+    reports: List[SourceReport] = []
+    for name, fut in futures.items():
+        if not fut.done():
+            reports.append(SourceReport(name, False, ms=int((time.perf_counter() - t0) * 1000), error="deadline"))
+            continue
+        ms = int((finished.get(name, t0) - started.get(name, t0)) * 1000)
+        try:
+            items = fut.result() or []
+        except Exception as e:
+            reports.append(SourceReport(name, False, ms=ms, error=str(e) or type(e).__name__))
+            continue
+        results[name] = items
+        reports.append(SourceReport(name, True, len(items), ms))
+    for r in reports:
+        if r.ok:
+            log.info(f"source {r.name}: {r.count} in {r.ms} ms")
+        else:
+            log.warning(f"source {r.name}: {r.error} after {r.ms} ms")
+    with _reports_lock:
+        _last_reports = reports
+    return results, reports
+
 def get_working_proxies(country: str = "US", scheme: str = "http", max_proxies: int = 20) -> List[Proxy]:
     """Получает рабочие прокси из простых источников"""
     proxies = []
@@ -36,64 +113,24 @@ def get_working_proxies(country: str = "US", scheme: str = "http", max_proxies:
         except:
             continue
     
-    # Пытаемся получить прокси из внешних источников
+    proxies = proxies[:max_proxies]
+    
+    # Пытаемся получить прокси из внешних источников: бюджет — то, что осталось после встроенных.
+    # Живые с годным вердиктом журнала реестр добавляет сверх бюджета — их не обрезаем
     try:
-        external_proxies = _fetch_from_sources(country, scheme, max_proxies)
+        external_proxies = _fetch_from_sources(country, scheme, max_proxies - len(proxies))
         proxies.extend(external_proxies)
     except Exception as e:
         log.warning(f"Не удалось получить внешние прокси: {e}")
     
-    return proxies[:max_proxies]
+    return proxies
 
 def _fetch_from_sources(country: str, scheme: str, max_proxies: int) -> List[Proxy]:
-    """Получает прокси из внешних источников"""
-    proxies = []
-    
-    try:
-        # TheSpeedX Proxy List
-        url = "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt"
-        response = requests.get(url, timeout=10)
-        if response.ok:
-            lines = response.text.strip().split('\n')
-            for line in lines[:max_proxies//2]:
-                if ':' in line:
-                    host, port = line.strip().split(':')
-                    try:
-                        proxy = Proxy(
-                            scheme=scheme,
-                            host=host,
-                            port=int(port),
-                            country=country
-                        )
-                        proxies.append(proxy)
-                    except:
-                        continue
-    except Exception as e:
-        log.warning(f"Ошибка получения прокси из TheSpeedX: {e}")
-    
-    try:
-        # ProxyScrape
-        url = f"https://api.proxyscrape.com/v2/?request=get&protocol={scheme}&timeout=10000&country={country}&ssl=all&anonymity=all"
-        response = requests.get(url, timeout=10)
-        if response.ok:
-            lines = response.text.strip().split('\n')
-            for line in lines[:max_proxies//2]:
-                if ':' in line:
-                    host, port = line.strip().split(':')
-                    try:
-                        proxy = Proxy(
-                            scheme=scheme,
-                            host=host,
-                            port=int(port),
-                            country=country
-                        )
-                        proxies.append(proxy)
-                    except:
-                        continue
-    except Exception as e:
-        log.warning(f"Ошибка получения прокси из ProxyScrape: {e}")
-    
-    return proxies
+    """Кандидаты из всех подходящих источников реестра — бюджет по доле живых у источника"""
+    from proxy.source_registry import get_registry  # реестр сам импортирует этот модуль
+    registry = get_registry()
+    by_source, _reports = registry.gather([scheme], country)
+    return registry.allocate(by_source, max_proxies)
 
 def gather_proxies_from_sources(country: str = "US", scheme: str = "http") -> List[Proxy]:
     """Основная функция для получения прокси из всех источников"""
@@ -0,0 +1,232 @@
+from __future__ import annotations
+import csv, json, sqlite3, threading, time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from proxy.cache import load_entries
+from proxy.index import proxy_key
+from proxy.models import Proxy
+from tools.logging_setup import app_root, get_logger
+
+log = get_logger(__name__)
+
+# Необязательный бэкенд ProxyPool: один SQLite-файл в режиме WAL вместо
+# proxies.csv + proxies_cache.json + sticky.json. GUI, API и CLI читают
+# его одновременно, запись — построчно, без перезаписи файлов целиком.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proxies (
+    key          TEXT PRIMARY KEY,
+    scheme       TEXT NOT NULL,
+    host         TEXT NOT NULL,
+    port         INTEGER NOT NULL,
+    username     TEXT,
+    password     TEXT,
+    country      TEXT,
+    added        REAL NOT NULL,
+    ok           INTEGER,            -- последняя проверка: 1/0, NULL — не проверяли
+    last_checked REAL
+);
+CREATE INDEX IF NOT EXISTS idx_proxies_select ON proxies (country, scheme, ok, last_checked);
+
+CREATE TABLE IF NOT EXISTS checks (
+    id      INTEGER PRIMARY KEY,
+    key     TEXT NOT NULL,
+    ok      INTEGER NOT NULL,
+    ip      TEXT,
+    country TEXT,
+    cc      TEXT,
+    ping_ms INTEGER,
+    error   TEXT,
+    ts      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_checks_key_ts ON checks (key, ts);
+
+CREATE TABLE IF NOT EXISTS sticky (
+    profile_id TEXT PRIMARY KEY,
+    key        TEXT NOT NULL,
+    scheme     TEXT NOT NULL,
+    host       TEXT NOT NULL,
+    port       INTEGER NOT NULL,
+    username   TEXT,
+    password   TEXT,
+    country    TEXT,
+    until      REAL NOT NULL
+);
+"""
+
+_PROXY_COLS = "scheme, host, port, username, password, country"
+HISTORY_TTL = 30 * 24 * 3600  # сколько хранить историю проверок
+
+
+def default_db_path() -> Path:
+    return app_root() / "cache" / "pool.db"
+
+
+def _cc(country: Optional[str]) -> Optional[str]:
+    return country.upper() if country else None
+
+
+def _row_proxy(r) -> Proxy:
+    return Proxy(r[0], r[1], int(r[2]), r[3] or None, r[4] or None, r[5] or None)
+
+
+class ProxyStore:
+    """Соединение на поток (sqlite3 не делит их между потоками), WAL, busy_timeout."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_db_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as con:
+            con.executescript(SCHEMA)
+            # строки, записанные до приведения кода страны к верхнему регистру
+            con.execute("UPDATE proxies SET country = upper(country) WHERE country <> upper(country)")
+        self.prune_checks(time.time() - HISTORY_TTL)
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(str(self.path), timeout=10)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def close(self) -> None:
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    def data_version(self) -> int:
+        """Меняется, когда другое соединение закоммитило изменения."""
+        return self._conn().execute("PRAGMA data_version").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Прокси
+    def add_proxies(self, proxies: Iterable[Proxy]) -> int:
+        now = time.time()
+        # код страны — в верхнем регистре: по нему фильтрует query() и индекс idx_proxies_select
+        rows = [(proxy_key(p), p.scheme, p.host, int(p.port), p.username, p.password, _cc(p.country), now)
+                for p in proxies]
+        with self._conn() as con:
+            cur = con.executemany(
+                f"INSERT INTO proxies (key, {_PROXY_COLS}, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET country = COALESCE(excluded.country, proxies.country)", rows)
+        return cur.rowcount
+
+    def stamp(self) -> Tuple[int, int]:
+        """(кол-во строк, max rowid) — по нему пул решает, можно ли дочитать только новые строки."""
+        n, top = self._conn().execute("SELECT count(*), COALESCE(max(rowid), 0) FROM proxies").fetchone()
+        return n, top
+
+    def iter_proxies(self, after_rowid: int = 0) -> Iterator[Tuple[int, Proxy]]:
+        cur = self._conn().execute(
+            f"SELECT rowid, {_PROXY_COLS} FROM proxies WHERE rowid > ? ORDER BY rowid", (after_rowid,))
+        for r in cur:
+            yield r[0], _row_proxy(r[1:])
+
+    def query(self, country: Optional[str] = None, scheme: Optional[str] = None,
+              ok: Optional[bool] = None, limit: int = 100) -> List[Proxy]:
+        """Выборка по индексу (country, scheme, ok, last_checked) — для API и CLI."""
+        where, args = [], []
+        if country:
+            where.append("country = ?")
+            args.append(country.upper())
+        if scheme:
+            where.append("scheme = ?")
+            args.append(scheme.lower())
+        if ok is not None:
+            where.append("ok = ?")
+            args.append(int(ok))
+        sql = f"SELECT {_PROXY_COLS} FROM proxies"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY last_checked DESC LIMIT ?"
+        return [_row_proxy(r) for r in self._conn().execute(sql, (*args, limit))]
+
+    # ------------------------------------------------------------------
+    # История проверок
+    def record_check(self, key: str, entry: dict) -> None:
+        """entry — запись кэша ProxyPool: {"ok", "ip", "country", "cc", "ping", "error", "ts"}."""
+        ok = int(bool(entry.get("ok")))
+        ts = entry.get("ts") or time.time()
+        with self._conn() as con:
+            con.execute("INSERT INTO checks (key, ok, ip, country, cc, ping_ms, error, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, ok, entry.get("ip"), entry.get("country"), entry.get("cc"), entry.get("ping"),
+                         entry.get("error"), ts))
+            con.execute("UPDATE proxies SET ok = ?, last_checked = ? WHERE key = ?", (ok, ts, key))
+
+    def latest_checks(self, since: float = 0.0) -> Dict[str, dict]:
+        """Последняя проверка каждого прокси не старше since — в формате кэша ProxyPool."""
+        cur = self._conn().execute(
+            "SELECT key, ok, ip, country, cc, ping_ms, ts FROM checks c WHERE ts >= ? "
+            "AND ts = (SELECT max(ts) FROM checks WHERE key = c.key)", (since,))
+        out = {}
+        for key, ok, ip, country, cc, ping, ts in cur:
+            out[key] = {"ok": True, "ip": ip, "country": country, "cc": cc, "ping": ping, "ts": ts} if ok \
+                else {"ok": False, "ts": ts}
+        return out
+
+    def prune_checks(self, older_than: float) -> int:
+        with self._conn() as con:
+            return con.execute("DELETE FROM checks WHERE ts < ?", (older_than,)).rowcount
+
+    # ------------------------------------------------------------------
+    # Sticky
+    def set_sticky(self, profile_id: str, p: Proxy, until: float) -> None:
+        with self._conn() as con:
+            con.execute(f"INSERT OR REPLACE INTO sticky (profile_id, key, {_PROXY_COLS}, until) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (profile_id, proxy_key(p), p.scheme, p.host, int(p.port), p.username, p.password,
+                         _cc(p.country), until))
+
+    def get_sticky(self, profile_id: str) -> Optional[Proxy]:
+        r = self._conn().execute(f"SELECT {_PROXY_COLS} FROM sticky WHERE profile_id = ? AND until > ?",
+                                 (profile_id, time.time())).fetchone()
+        return _row_proxy(r) if r else None
+
+    # ------------------------------------------------------------------
+    # Миграция
+    def migrate_from_files(self, csv_path: Path, cache_path: Path, sticky_path: Path) -> dict:
+        """Переносит proxies.csv, proxies_cache.json и sticky.json; повторный запуск ничего не дублирует."""
+        from proxy.pool import ProxyPool  # формат строк CSV — там же, где и чтение
+        stats = {"proxies": 0, "checks": 0, "sticky": 0}
+        if csv_path.exists():
+            with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
+                items = []
+                for r in csv.DictReader(f):
+                    try:
+                        items.append(ProxyPool._row_to_proxy(r))
+                    except Exception:
+                        continue
+            self.add_proxies(items)
+            stats["proxies"] = len(items)
+        known = set(self.latest_checks())
+        try:
+            checks = load_entries(cache_path)  # основной JSON и журнал proxy.cache
+        except Exception as e:
+            log.warning(f"{cache_path.name}: {e}")
+            checks = {}
+        for key, entry in checks.items():
+            if key not in known and isinstance(entry, dict) and "ts" in entry:
+                self.record_check(key, entry)
+                stats["checks"] += 1
+        for pid, x in _read_json(sticky_path).items():
+            try:
+                self.set_sticky(pid, Proxy(x["scheme"], x["host"], int(x["port"]), x.get("username"),
+                                           x.get("password"), x.get("country")), x.get("until", 0))
+                stats["sticky"] += 1
+            except Exception:
+                continue
+        log.info(f"pool migrated to sqlite: {stats}")
+        return stats
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+    except Exception as e:
+        log.warning(f"{path.name}: {e}")
+    return {}
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import bisect, threading
+from typing import Dict, List, Optional, Tuple
+from proxy.prober import norm_scheme
+
+# Таймауты проверки из наблюдаемых задержек, а не жёстко зашитые 3/5/6/8 c.
+# Для каждой пары (источник, схема) копится гистограмма задержек успешных
+# проверок; таймаут = перцентиль × запас, зажатый в [MIN_TIMEOUT, default].
+# Проверка, упёршаяся в таймаут, идёт в гистограмму отсчётом на его границе:
+# иначе таймаут умеет только сжиматься, и медленные, но рабочие прокси после
+# этого уже никогда не попадают в выборку. Когда таких больше 1 - PERCENTILE,
+# перцентиль встаёт на границу и таймаут растёт (× HEADROOM) обратно к default.
+PERCENTILE = 0.95
+HEADROOM = 1.5          # множитель к перцентилю
+MIN_TIMEOUT = 1.0       # c
+MIN_SAMPLES = 20        # пока данных меньше — используем default
+HINT_FACTOR = 3.0       # для прокси с известным ping: ping × HINT_FACTOR
+_MAX_COUNT = 10_000     # после этого гистограмма "стареет" (счётчики делятся пополам)
+
+# границы корзин, мс: 25 … ~30 000, геометрический шаг 1.25
+_EDGES: List[float] = []
+_e = 25.0
+while _e < 30_000:
+    _EDGES.append(round(_e, 1))
+    _e *= 1.25
+_EDGES.append(float("inf"))
+
+
+def is_timeout_error(error: Optional[str]) -> bool:
+    e = (error or "").lower()
+    return "timeout" in e or "timed out" in e
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = [0] * len(_EDGES)
+        self.total = 0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(_EDGES, ms)] += 1
+        self.total += 1
+        if self.total > _MAX_COUNT:
+            self.counts = [c // 2 for c in self.counts]
+            self.total = sum(self.counts)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        need = q * self.total
+        acc = 0
+        for edge, c in zip(_EDGES, self.counts):
+            acc += c
+            if acc >= need:
+                return edge if edge != float("inf") else _EDGES[-2]
+        return _EDGES[-2]
+
+
+class _Key:
+    __slots__ = ("hist", "probes", "ok", "timed_out", "last_timeout")
+
+    def __init__(self):
+        self.hist = LatencyHistogram()
+        self.probes = 0
+        self.ok = 0
+        self.timed_out = 0
+        self.last_timeout = 0.0
+
+
+class AdaptiveTimeouts:
+    def __init__(self, percentile: float = PERCENTILE, headroom: float = HEADROOM,
+                 min_timeout: float = MIN_TIMEOUT, min_samples: int = MIN_SAMPLES):
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self._keys: Dict[Tuple[str, str], _Key] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, source: str, scheme: str) -> _Key:
+        k = (source, norm_scheme(scheme))
+        entry = self._keys.get(k)
+        if entry is None:
+            entry = self._keys.setdefault(k, _Key())
+        return entry
+
+    def timeout_for(self, source: str = "default", scheme: str = "http", default: float = 5.0,
+                    hint_ms: Optional[float] = None) -> float:
+        """
+        Таймаут в секундах. default — прежнее жёсткое значение и верхняя граница.
+        hint_ms — известная задержка конкретного прокси (кэш): хороший прокси
+        не ждёт таймаут, рассчитанный на мёртвые.
+        """
+        with self._lock:
+            entry = self._get(source, scheme)
+            t = default
+            if entry.hist.total >= self.min_samples:
+                p = entry.hist.percentile(self.percentile)
+                if p is not None:
+                    t = p / 1000 * self.headroom
+            if hint_ms:
+                t = min(t, hint_ms / 1000 * HINT_FACTOR)
+            t = max(self.min_timeout, min(default, t))
+            entry.last_timeout = t
+            return t
+
+    def observe(self, source: str, scheme: str, latency_ms: Optional[float], ok: bool,
+                error: Optional[str] = None) -> None:
+        with self._lock:
+            entry = self._get(source, scheme)
+            entry.probes += 1
+            if ok and latency_ms is not None:
+                entry.ok += 1
+                entry.hist.add(latency_ms)
+            elif is_timeout_error(error):
+                entry.timed_out += 1
+                if entry.last_timeout:
+                    entry.hist.add(entry.last_timeout * 1000)
+
+    def stats(self) -> Dict[str, dict]:
+        """Для мониторинга: выбранный таймаут, перцентили и доля проверок, упёршихся в таймаут."""
+        out = {}
+        with self._lock:
+            for (source, scheme), e in self._keys.items():
+                out[f"{source}/{scheme}"] = {
+                    "samples": e.hist.total,
+                    "p50_ms": e.hist.percentile(0.5),
+                    "p95_ms": e.hist.percentile(0.95),
+                    "timeout_s": round(e.last_timeout, 2),
+                    "probes": e.probes,
+                    "ok": e.ok,
+                    "timeout_hits": e.timed_out,
+                    "timeout_hit_rate": round(e.timed_out / e.probes, 3) if e.probes else 0.0,
+                }
+        return out
+
+
+adaptive = AdaptiveTimeouts()
+
+
+def timeout_for(source: str = "default", scheme: str = "http", default: float = 5.0,
+                hint_ms: Optional[float] = None) -> float:
+    return adaptive.timeout_for(source, scheme, default, hint_ms)
+
+
+def observe(source: str, scheme: str, latency_ms: Optional[float], ok: bool, error: Optional[str] = None) -> None:
+    adaptive.observe(source, scheme, latency_ms, ok, error)
+
+
+def stats() -> Dict[str, dict]:
+    return adaptive.stats()
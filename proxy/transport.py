@@ -0,0 +1,147 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+# Лимиты по умолчанию; меняются через configure()
+MAX_PROXY_SESSIONS = 256     # сессий "через прокси" (LRU)
+MAX_ENDPOINT_SESSIONS = 32   # сессий к прямым endpoint-ам (ip-api, geonode, ...)
+POOL_MAXSIZE = 32            # keep-alive соединений на хост внутри одной сессии
+
+
+def _iter_conn_pools(session: requests.Session):
+    # один адаптер смонтирован и на http://, и на https://
+    adapters = {id(a): a for a in session.adapters.values()}
+    for adapter in adapters.values():
+        managers = [getattr(adapter, "poolmanager", None)]
+        managers += list(getattr(adapter, "proxy_manager", {}).values())
+        for m in managers:
+            if m is None:
+                continue
+            for key in list(m.pools.keys()):
+                pool = m.pools.get(key)
+                if pool is not None:
+                    yield pool
+
+
+def _conn_counts(session: requests.Session) -> tuple[int, int]:
+    conns = reqs = 0
+    for pool in _iter_conn_pools(session):
+        conns += getattr(pool, "num_connections", 0)
+        reqs += getattr(pool, "num_requests", 0)
+    return conns, reqs
+
+
+class SessionPool:
+    """LRU-набор requests.Session: одна сессия на ключ, keep-alive внутри."""
+
+    def __init__(self, max_sessions: int, pool_maxsize: int = POOL_MAXSIZE):
+        self.max_sessions = max_sessions
+        self.pool_maxsize = pool_maxsize
+        self._sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.hits = 0
+        self.evicted = 0
+        # счётчики соединений закрытых (вытесненных) сессий
+        self._closed_conns = 0
+        self._closed_reqs = 0
+
+    def _new_session(self, proxy_url: Optional[str]) -> requests.Session:
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        s.headers["User-Agent"] = "Mozilla/5.0"
+        if proxy_url:
+            s.proxies = {"http": proxy_url, "https": proxy_url}
+            # иначе HTTP(S)_PROXY и системные прокси перекрывают s.proxies —
+            # проверка уходит через системный прокси, а не через кандидата
+            s.trust_env = False
+        return s
+
+    def get(self, key: str, proxy_url: Optional[str] = None) -> requests.Session:
+        with self._lock:
+            s = self._sessions.get(key)
+            if s is not None:
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return s
+            s = self._new_session(proxy_url)
+            self._sessions[key] = s
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                _k, old = self._sessions.popitem(last=False)
+                self._retire(old)
+            return s
+
+    def _retire(self, s: requests.Session) -> None:
+        conns, reqs = _conn_counts(s)
+        self._closed_conns += conns
+        self._closed_reqs += reqs
+        self.evicted += 1
+        try:
+            s.close()
+        except Exception:
+            pass
+
+    def close_all(self) -> None:
+        with self._lock:
+            while self._sessions:
+                _k, s = self._sessions.popitem(last=False)
+                self._retire(s)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            conns, reqs = self._closed_conns, self._closed_reqs
+        for s in sessions:
+            c, r = _conn_counts(s)
+            conns += c
+            reqs += r
+        return {
+            "sessions": len(sessions),
+            "sessions_created": self.created,
+            "sessions_reused": self.hits,
+            "sessions_evicted": self.evicted,
+            "connections": conns,
+            "requests": reqs,
+            "connections_reused": max(0, reqs - conns),
+        }
+
+
+_proxy_sessions = SessionPool(MAX_PROXY_SESSIONS)
+_endpoint_sessions = SessionPool(MAX_ENDPOINT_SESSIONS)
+
+
+def configure(max_proxy_sessions: Optional[int] = None, max_endpoint_sessions: Optional[int] = None,
+              pool_maxsize: Optional[int] = None) -> None:
+    """Меняет лимиты пулов; действует на новые сессии, лишние вытесняются при следующем get()."""
+    if max_proxy_sessions is not None:
+        _proxy_sessions.max_sessions = max_proxy_sessions
+    if max_endpoint_sessions is not None:
+        _endpoint_sessions.max_sessions = max_endpoint_sessions
+    if pool_maxsize is not None:
+        _proxy_sessions.pool_maxsize = pool_maxsize
+        _endpoint_sessions.pool_maxsize = pool_maxsize
+
+
+def proxy_session(proxy_url: str) -> requests.Session:
+    """Сессия, которая ходит через proxy_url (http://, socks5h://, ...)."""
+    return _proxy_sessions.get(proxy_url, proxy_url)
+
+
+def endpoint_session(name: str = "default") -> requests.Session:
+    """Сессия для прямых запросов; name — логическая группа (обычно хост)."""
+    return _endpoint_sessions.get(name)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {"proxy": _proxy_sessions.stats(), "endpoint": _endpoint_sessions.stats()}
+
+
+def close_all() -> None:
+    _proxy_sessions.close_all()
+    _endpoint_sessions.close_all()
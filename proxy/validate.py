@@ -1,8 +1,13 @@
 from __future__ import annotations
-import time, requests
+import os, time
 from dataclasses import dataclass
 from typing import Optional
 from proxy.models import Proxy
+from proxy import timeouts, transport
+from proxy.geo import lookup_country
+from proxy.prober import extract_ip, probe
+
+VALIDATE_TIMEOUT = 5.0  # верхняя граница; фактический таймаут — proxy.timeouts
 
 @dataclass
 class ValidationResult:
@@ -12,41 +17,62 @@ class ValidationResult:
     cc: Optional[str] = None
     ping_ms: Optional[int] = None
     error: Optional[str] = None
+    # тайминги фаз — заполняются нативным пробником (proxy.prober / async_validate)
+    connect_ms: Optional[int] = None
+    handshake_ms: Optional[int] = None
+    first_byte_ms: Optional[int] = None
 
 def _proxies_dict(p: Proxy) -> dict:
     # при проверке всегда remote DNS для socks
     u = p.url(with_auth=bool(p.username), remote_dns=True)
     return {"http": u, "https": u}
 
-def validate_proxy(p: Proxy, timeout: float = 5.0) -> ValidationResult:
+def _validate_native(p: Proxy, timeout: float, echo_url: str) -> ValidationResult:
+    pt = probe(p, echo_url=echo_url, timeout=timeout)
+    if not pt.ok:
+        return ValidationResult(False, error=pt.error, connect_ms=pt.connect_ms, handshake_ms=pt.handshake_ms)
+    country, cc = lookup_country(pt.ip)
+    return ValidationResult(True, ip=pt.ip, country=country, cc=cc, ping_ms=pt.total_ms,
+                            connect_ms=pt.connect_ms, handshake_ms=pt.handshake_ms, first_byte_ms=pt.first_byte_ms)
+
+def validate_proxy(p: Proxy, timeout: Optional[float] = None, echo_url: Optional[str] = None, *,
+                   source: str = "validate", hint_ms: Optional[float] = None) -> ValidationResult:
+    """
+    Без echo_url (и без AICHROME_ECHO_URL) — через requests и httpbin/ipify.
+    С эхо-целью — нативный пробник proxy.prober: без сторонних библиотек,
+    с таймингами connect/handshake/first byte; подходит и локальный эхо-сервер.
+    timeout=None — по наблюдаемым задержкам для (source, схема), см. proxy.timeouts;
+    hint_ms — известный ping этого прокси.
+    """
+    if timeout is None:
+        timeout = timeouts.timeout_for(source, p.scheme, VALIDATE_TIMEOUT, hint_ms)
+    res = _validate(p, timeout, echo_url or os.environ.get("AICHROME_ECHO_URL"))
+    timeouts.observe(source, p.scheme, res.ping_ms, res.ok, res.error)
+    return res
+
+def _validate(p: Proxy, timeout: float, echo_url: Optional[str]) -> ValidationResult:
+    if echo_url:
+        return _validate_native(p, timeout, echo_url)
     t0 = time.perf_counter()
     try:
         # Сначала пробуем простую проверку
-        r = requests.get("https://httpbin.org/ip", proxies=_proxies_dict(p), timeout=timeout)
+        sess = transport.proxy_session(_proxies_dict(p)["http"])
+        r = sess.get("https://httpbin.org/ip", timeout=timeout)
         r.raise_for_status()
-        data = r.json()
-        ip = data.get("origin", "").split(',')[0].strip()
+        ip = extract_ip(r.content)
         
         if not ip:
             # Fallback на ipify
-            r2 = requests.get("https://api.ipify.org?format=json", proxies=_proxies_dict(p), timeout=timeout)
+            r2 = sess.get("https://api.ipify.org?format=json", timeout=timeout)
             r2.raise_for_status()
-            ip = r2.json().get("ip")
+            ip = extract_ip(r2.content)
+        if not ip:
+            return ValidationResult(False, error="echo: no ip")
         
         ping = int((time.perf_counter() - t0) * 1000)
         
-        # Получаем страну
-        country = None
-        cc = None
-        try:
-            rr = requests.get(f"http://ip-api.com/json/{ip}?fields=status,country,countryCode,message", timeout=3)
-            if rr.ok:
-                jj = rr.json()
-                if jj.get("status") == "success":
-                    country = jj.get("country")
-                    cc = jj.get("countryCode")
-        except:
-            pass  # Страна не критична
+        # Получаем страну (офлайн-индекс, затем ip-api.com)
+        country, cc = lookup_country(ip)
         
         return ValidationResult(True, ip=ip, country=country, cc=cc, ping_ms=ping)
         
@@ -0,0 +1,65 @@
+"""Tests for proxy.geo.GeoResolver against the local ip-api stand-in."""
+
+import threading
+
+import pytest
+
+from proxy import geoip
+from proxy.geo import GeoResolver
+from tools.local_services import GeoStandIn
+
+
+@pytest.fixture
+def geo_server(no_offline_geoip):
+    # без офлайн-индекса: проверяем именно сетевой путь
+    table = {f"10.0.{i // 256}.{i % 256}": "US" if i % 2 else "DE" for i in range(250)}
+    with GeoStandIn(table) as server:
+        yield server
+
+
+class TestGeoResolver:
+    """Batching, disk cache and TTL behaviour."""
+
+    def test_resolve_many_batches_by_100(self, geo_server, tmp_path):
+        resolver = GeoResolver(cache_path=tmp_path / "geo.json", batch_url=geo_server.batch_url)
+        ips = list(geo_server.table)
+        result = resolver.resolve_many(ips)
+        assert geo_server.batch_sizes == [100, 100, 50]
+        assert result["10.0.0.1"] == ("Country US", "US")
+        assert result["10.0.0.2"][1] == "DE"
+
+    def test_cache_persists_between_instances(self, geo_server, tmp_path):
+        path = tmp_path / "geo.json"
+        first = GeoResolver(cache_path=path, batch_url=geo_server.batch_url)
+        first.resolve_many(["10.0.0.1", "8.8.8.8"])
+        first.flush()
+        again = GeoResolver(cache_path=path, batch_url=geo_server.batch_url)
+        assert again.resolve_many(["10.0.0.1", "8.8.8.8"]) == {"10.0.0.1": ("Country US", "US"), "8.8.8.8": (None, None)}
+        assert geo_server.batch_sizes == [2]
+        assert again.stats["cache"] == 2
+
+    def test_expired_entries_are_refetched(self, geo_server, tmp_path):
+        path = tmp_path / "geo.json"
+        first = GeoResolver(cache_path=path, batch_url=geo_server.batch_url)
+        first.resolve_many(["10.0.0.1"])
+        first.flush()
+        GeoResolver(cache_path=path, batch_url=geo_server.batch_url, ttl=0).resolve_many(["10.0.0.1"])
+        assert geo_server.batch_sizes == [1, 1]
+
+    def test_concurrent_resolve_coalesces_into_one_batch(self, geo_server, tmp_path):
+        resolver = GeoResolver(cache_path=tmp_path / "geo.json", batch_url=geo_server.batch_url, window=0.2)
+        ips = [f"10.0.0.{i}" for i in range(20)]
+        out = {}
+        threads = [threading.Thread(target=lambda ip=ip: out.__setitem__(ip, resolver.resolve(ip))) for ip in ips]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert geo_server.batch_sizes == [20]
+        assert out["10.0.0.3"][1] == "US"
+
+    def test_offline_hit_carries_country_name(self, geo_server, tmp_path, monkeypatch):
+        monkeypatch.setattr(geoip, "_index", geoip.GeoIPIndex.from_ranges([("10.1.0.0", "10.1.255.255", "NL")]))
+        resolver = GeoResolver(cache_path=tmp_path / "geo.json", batch_url=geo_server.batch_url)
+        assert resolver.resolve("10.1.2.3") == ("The Netherlands", "NL")
+        assert resolver.stats["offline"] == 1 and geo_server.batch_sizes == []
@@ -0,0 +1,524 @@
+"""Tests for the in-memory indexed ProxyPool (proxy.pool / proxy.index)."""
+
+import json
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from proxy import health, ledger, source_registry
+from proxy import pool as pool_module
+from proxy.bulk import ProxyArray
+from proxy.cache import COMPACT_MIN, ValidationCache, journal_path
+from proxy.health import BACKOFF_BASE, BACKOFF_MAX, Health, HealthBook
+from proxy.index import KeySet, combo_for
+from proxy.lease import LeaseManager
+from proxy.ledger import CandidateLedger
+from proxy.models import Proxy
+from proxy.pool import CSV_HEADER, TTL_SECONDS, ProxyPool
+from proxy.revalidate import Revalidator
+from proxy.source_registry import SourceRegistry
+from proxy.store import ProxyStore
+from proxy.validate import ValidationResult
+from tools import proxy_pool
+from tools.lock_manager import ProfileLock
+
+
+@pytest.fixture
+def pool(tmp_path):
+    p = ProxyPool()
+    p.csv_path = tmp_path / "proxies.csv"
+    p.cache_path = tmp_path / "cache.json"
+    p.sticky_path = tmp_path / "sticky.json"
+    p.csv_path.write_text(",".join(CSV_HEADER) + "\n"
+                          "http,10.0.0.1,8080,,,US\n"
+                          "socks5,10.0.0.2,1080,,,DE\n"
+                          "http,10.0.0.3,3128,,,\n", encoding="utf-8")
+    return p
+
+
+class TestPoolIndex:
+    """Indexes by country/scheme/health and incremental reload of proxies.csv."""
+
+    def test_counts_by_country_and_scheme(self, pool):
+        assert pool.count() == 3
+        assert pool.count("us") == 1
+        assert pool.count(None, "http") == 2
+        assert pool.count("DE", "http") == 0
+
+    def test_append_is_parsed_incrementally(self, pool):
+        pool.refresh()
+        offset = pool._csv_offset
+        pool.append_to_csv([Proxy("http", "10.0.0.4", 80, country="US")])
+        assert pool.refresh() is True
+        assert pool._csv_offset > offset
+        assert pool.count("US", "http") == 2
+        assert pool.refresh() is False
+
+    def test_rewrite_triggers_full_reload(self, pool):
+        pool.refresh()
+        pool.csv_path.write_text("type,host,port,username,password,country\nHTTP,10.9.9.9,80,,,NL\n", encoding="utf-8")
+        pool.refresh()
+        assert [p.host for p in pool.read_csv()] == ["10.9.9.9"]
+        assert pool.count("NL", "http") == 1
+
+    def test_select_live_prefers_cached_healthy(self, pool):
+        pool.refresh()
+        key = pool._key(Proxy("socks5", "10.0.0.2", 1080))
+        pool._mem_cache[key] = {"ok": True, "ip": "203.0.113.5", "cc": "DE", "ts": time.time()}
+        pool.refresh(force=True)
+        p, vr = pool.select_live("de", "socks5")
+        assert p.host == "10.0.0.2" and vr.ip == "203.0.113.5"
+
+    def test_keyset_discard_keeps_positions(self):
+        ks = KeySet()
+        for k in "abcd":
+            ks.add(k)
+        ks.discard("b")
+        assert sorted(ks) == ["a", "c", "d"] and "b" not in ks
+        assert all(ks._keys[ks._pos[k]] == k for k in ks)
+
+
+class TestSqliteBackend:
+    """ProxyPool(backend="sqlite"): migration from files, shared access, sticky."""
+
+    def test_migrates_files_and_sees_other_writers(self, pool, tmp_path):
+        key = pool._key(Proxy("http", "10.0.0.1", 8080))
+        pool.cache_path.write_text(json.dumps({key: {"ok": True, "ip": "203.0.113.1", "ts": time.time()}}))
+        db = tmp_path / "pool.db"
+
+        def _open():
+            other = ProxyPool(backend="sqlite", db_path=db)
+            other.csv_path, other.cache_path, other.sticky_path = pool.csv_path, pool.cache_path, pool.sticky_path
+            return other
+
+        a = _open()
+        assert a.count() == 3 and a.count("US", "http") == 1
+        p, vr = a.select_live("US", "http")
+        assert p.host == "10.0.0.1" and vr.ip == "203.0.113.1"
+
+        b = _open()
+        b.append_to_csv([Proxy("socks5", "10.0.0.9", 1080, country="DE")])
+        assert a.refresh() is True and a.count("DE", "socks5") == 2
+
+        b.set_sticky("profile-1", p)
+        assert a.get_sticky("profile-1") == p
+        assert [x.host for x in a.store.query(country="us", ok=True)] == ["10.0.0.1"]
+
+    def test_country_code_is_stored_uppercase(self, tmp_path):
+        store = ProxyStore(tmp_path / "pool.db")
+        store.add_proxies([Proxy("http", "10.0.0.1", 8080, country="nl"), Proxy("http", "10.0.0.2", 8080, country="Nl")])
+        assert sorted(x.host for x in store.query(country="NL")) == ["10.0.0.1", "10.0.0.2"]
+        with store._conn() as con:
+            con.execute("UPDATE proxies SET country = 'de' WHERE host = '10.0.0.2'")  # строка из старой версии
+        assert [x.host for x in ProxyStore(tmp_path / "pool.db").query(country="de")] == ["10.0.0.2"]
+
+    def test_checks_from_other_pool_are_seen(self, pool, tmp_path):
+        a, b = (ProxyPool(backend="sqlite", db_path=tmp_path / "pool.db") for _ in range(2))
+        for x in (a, b):
+            x.csv_path, x.cache_path, x.sticky_path = pool.csv_path, pool.cache_path, pool.sticky_path
+        assert a.count("DE", "socks5") == 1
+        assert a.live("DE", "socks5") == []
+        key = b._key(Proxy("socks5", "10.0.0.2", 1080))
+        b._remember(key, {"ok": True, "ip": "203.0.113.2", "cc": "DE", "ts": time.time()})  # перепроверка в B
+        assert [(p.host, vr.ip) for p, vr in a.live("DE", "socks5")] == [("10.0.0.2", "203.0.113.2")]
+
+
+class TestValidationCache:
+    """proxy.cache.ValidationCache: coalesced atomic writes and eviction."""
+
+    def test_many_updates_one_write(self, tmp_path):
+        cache = ValidationCache(tmp_path / "c.json", interval=60)
+        for i in range(100):
+            cache[f"k{i}"] = {"ok": True, "ts": time.time()}
+        assert cache.writes == 0 and not (tmp_path / "c.json").exists()
+        assert cache.flush() is True and cache.flush() is False
+        assert cache.writes == 1
+        assert len(json.loads((tmp_path / "c.json").read_text())) == 100
+
+    def test_flush_appends_only_dirty_entries(self, tmp_path):
+        path = tmp_path / "c.json"
+        cache = ValidationCache(path, interval=60)
+        for i in range(100):
+            cache[f"k{i}"] = {"ok": True, "ts": time.time()}
+        cache.flush()
+        base = path.read_bytes()
+        cache["k1"] = cache["k200"] = {"ok": False, "ts": time.time()}
+        assert cache.flush() and path.read_bytes() == base
+        assert len(journal_path(path).read_text().splitlines()) == 2
+        again = ValidationCache(path)
+        assert len(again) == 101 and again["k1"]["ok"] is False
+        for _ in range(COMPACT_MIN // 100):  # журнал дорос до COMPACT_MIN строк — сводится в основной файл
+            for i in range(100):
+                cache[f"k{i}"] = {"ok": True, "ts": time.time()}
+            cache.flush()
+        assert not journal_path(path).exists() and len(json.loads(path.read_text())) == 101
+
+    def test_threshold_triggers_background_flush(self, tmp_path):
+        cache = ValidationCache(tmp_path / "c.json", interval=60, threshold=10)
+        for i in range(10):
+            cache[f"k{i}"] = {"ok": False, "ts": time.time()}
+        deadline = time.time() + 5
+        while cache.writes == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.writes == 1
+
+    def test_stale_negative_and_lru_eviction(self, tmp_path):
+        now = time.time()
+        path = tmp_path / "c.json"
+        path.write_text(json.dumps({"old_bad": {"ok": False, "ts": now - 2 * 3600},
+                                    "old_ok": {"ok": True, "ts": now - 2 * 3600},
+                                    "ancient": {"ok": True, "ts": now - 3 * 86400}}))
+        cache = ValidationCache(path, max_entries=2)
+        assert sorted(k for k, _ in cache.items()) == ["old_ok"]
+        cache["a"] = {"ok": True, "ts": now}
+        cache["b"] = {"ok": True, "ts": now}
+        assert "old_ok" not in cache and len(cache) == 2
+
+    def test_sync_picks_up_other_writer(self, tmp_path):
+        path = tmp_path / "c.json"
+        mine, other = ValidationCache(path, interval=60), ValidationCache(path, interval=60)
+        assert mine.sync() == []
+        other["k1"] = {"ok": True, "ts": time.time()}
+        other.flush()
+        assert mine.sync() == ["k1"] and mine["k1"]["ok"] is True
+        assert mine.sync() == []
+        for _ in range(COMPACT_MIN // 100):  # чужая запись свела журнал в основной файл
+            for i in range(100):
+                other[f"k{i}"] = {"ok": False, "ts": time.time()}
+            other.flush()
+        assert not journal_path(path).exists()
+        assert len(mine.sync()) == 100 and mine["k1"]["ok"] is False
+        mine["k1"] = {"ok": True, "ts": time.time()}
+        mine.flush()  # своя запись не затирает чужие
+        assert len(json.loads(path.read_text())) + len(journal_path(path).read_text().splitlines()) == 101
+
+    def test_select_live_does_not_rewrite_file_per_probe(self, pool):
+        pool.refresh()
+        for i in range(50):
+            pool._remember(f"k{i}", {"ok": False, "ts": time.time()})
+        assert pool._mem_cache.writes == 0
+        pool._save_cache()
+        assert pool._mem_cache.writes == 1 and pool.cache_path.exists()
+
+
+class TestRacingSelect:
+    """select_live races K probes; losers still land in the validation cache."""
+
+    def test_plan_reads_only_combo_entries(self, pool, monkeypatch):
+        pool.refresh()
+        us = pool._key(Proxy("http", "10.0.0.1", 8080))
+        pool._remember(us, {"ok": True, "ts": time.time() - TTL_SECONDS - 1})
+        for i in range(100):
+            pool._remember(f"other{i}", {"ok": False, "ts": time.time()})
+        monkeypatch.setattr(pool._mem_cache, "items", lambda: pytest.fail("whole cache scanned"))
+        k, first = pool._race_plan(combo_for("US", "http"))
+        assert first == [us] and k >= 1
+
+    def test_feed_uses_index_snapshot(self, pool, monkeypatch):
+        pool.refresh()
+        fed = []
+
+        def fake_validate_many(items, **kw):
+            pool._index.clear()  # refresh() в другом потоке перестраивает индекс
+            for p in items:
+                fed.append(p)
+                yield p, ValidationResult(False, error="x")
+
+        monkeypatch.setattr(pool_module, "validate_many", fake_validate_many)
+        assert pool._race(combo_for("US", "http")) == (None, None)
+        assert [p.host for p in fed] == ["10.0.0.1"]
+
+
+    def test_first_success_wins_and_losers_are_cached(self, pool, stand_ins):
+        farm = stand_ins.farm
+        fast = farm.add(1, scheme="socks5", latency=0.05)
+        slow = farm.add(3, scheme="socks5", latency=0.8)
+        dead = farm.dead(4)
+        pool.csv_path.write_text(",".join(CSV_HEADER) + "\n", encoding="utf-8")
+        pool.append_to_csv(Proxy("socks5", h, port, country="US") for h, port in fast + slow + dead)
+        t0 = time.perf_counter()
+        p, vr = pool.select_live("US", "socks5")
+        assert vr.ok and (p.host, p.port) == fast[0]
+        assert time.perf_counter() - t0 < 0.7
+        slow_keys = [pool._key(Proxy("socks5", h, port)) for h, port in slow]
+        deadline = time.time() + 5
+        while time.time() < deadline and not all(k in pool._mem_cache for k in slow_keys):
+            time.sleep(0.05)
+        assert all(pool._mem_cache.get(k)["ok"] for k in slow_keys)
+        k, first = pool._race_plan(("US", "socks5"))
+        assert first[0] == pool._key(p) and 4 <= k <= 32
+
+
+class TestHealth:
+    """proxy.health: EWMA latency, windowed success ratio, failure streaks, weighted choice."""
+
+    def test_update_and_roundtrip(self):
+        h = Health()
+        for ok, ping in [(True, 100), (True, 200), (False, None), (False, None)]:
+            h.update(ok, ping)
+        assert h.ewma_ms == pytest.approx(0.3 * 200 + 0.7 * 100)
+        assert h.success_ratio == 0.5 and h.streak == 2 and h.last_fail > 0
+        assert Health.from_list(h.to_list()).to_list() == h.to_list()
+
+    def test_fast_reliable_beats_flaky(self, tmp_path):
+        book = HealthBook(tmp_path / "h.json")
+        for _ in range(10):
+            book.record("good", True, 80)
+            book.record("flaky", False)
+            book.record("flaky", True, 80)
+            book.record("slow", True, 3000)
+        assert [k for _s, k in book.rank(["flaky", "slow", "good", "new"])][0] == "good"
+        assert book.score("flaky") < book.score("good")
+        picks = [book.weighted_choice(["good", "flaky", "slow"], random.Random(i)) for i in range(200)]
+        assert picks.count("good") > picks.count("flaky") and picks.count("good") > picks.count("slow")
+
+    def test_select_live_prefers_healthy(self, pool):
+        pool.refresh()
+        now = time.time()
+        keys = [pool._key(p) for p in pool.read_csv() if p.scheme == "http"]
+        for key in keys:
+            pool._remember(key, {"ok": True, "ip": key, "ping": 100, "ts": now})
+        for _ in range(8):
+            pool.health().record(keys[1], False)
+        wins = [pool.select_live(None, "http")[0] for _ in range(100)]
+        assert sum(pool._key(p) == keys[0] for p in wins) > 90
+
+
+class TestBackoff:
+    """Consecutive failures push a proxy out of candidate lists for exponentially longer."""
+
+    def test_interval_doubles_and_resets(self):
+        h = Health()
+        intervals = []
+        for _ in range(4):
+            h.update(False, ts=1000.0)
+            intervals.append(h.backoff_until() - 1000.0)
+        assert intervals == [BACKOFF_BASE * 2 ** i for i in range(4)]
+        for _ in range(30):
+            h.update(False, ts=1000.0)
+        assert h.backoff_until() - 1000.0 == BACKOFF_MAX
+        h.update(True, 50)
+        assert h.backoff_until() == 0
+
+    def test_backed_off_proxies_are_not_probed(self, pool):
+        pool.refresh()
+        book = pool.health()
+        for p in pool.read_csv():
+            book.record(pool._key(p), False)
+        t0 = time.perf_counter()
+        assert pool.select_live(None, "http") == (None, None)
+        assert time.perf_counter() - t0 < 0.5
+        assert book.skipped == 2
+        assert book.allowed(["fresh", pool._key(pool.read_csv()[0])]) == ["fresh"]
+
+
+@pytest.fixture
+def pick_state(tmp_path, monkeypatch):
+    """pick() с книгой здоровья, реестром источников и журналом кандидатов во tmp."""
+    book = HealthBook(tmp_path / "proxy_health.json")
+    registry = SourceRegistry(tmp_path / "source_stats.json")
+    journal = CandidateLedger(tmp_path / "candidate_ledger.json")
+    monkeypatch.setattr(health, "_book", book)
+    monkeypatch.setattr(source_registry, "_registry", registry)
+    monkeypatch.setattr(ledger, "_ledger", journal)
+    # TCP-стадия: первый кандидат отказал в connect, второй не дождался попытки
+    monkeypatch.setattr(proxy_pool, "prescreen_items", lambda items, addr_of: ([], items[:1], items[1:]))
+    monkeypatch.setattr(proxy_pool, "_probe_enhanced", lambda addr, proto, cc: (True, "US", 40.0))
+    return book, registry, journal
+
+
+class TestPickConnectStage:
+    """pick() records only real connect failures; untried addresses get the full probe."""
+
+    cands = [("192.0.2.1:80", "HTTP", ""), ("192.0.2.2:80", "HTTP", "")]
+    keys = ["http:192.0.2.1:80:", "http:192.0.2.2:80:"]
+
+    def test_untried_is_probed_not_backed_off(self, pick_state):
+        book, _registry, _journal = pick_state
+        assert [r[0] for r in proxy_pool.pick(candidates=self.cands, need=2)] == ["192.0.2.2:80"]
+        assert book.backed_off(self.keys[0])
+        assert not book.backed_off(self.keys[1]) and book.get(self.keys[1]).streak == 0
+
+    def test_source_yield_counts_only_tested(self, pick_state):
+        _book, registry, _journal = pick_state
+        registry.note("list", [Proxy("http", "192.0.2.1", 80), Proxy("http", "192.0.2.2", 80)])
+        proxy_pool.pick(candidates=self.cands, need=2)
+        # отказ connect — мимо, непроверенный по TCP прошёл полную проверку и жив
+        assert registry.stats()["list"] == {"returned": 2, "validated": 2, "live": 1,
+                                            "live_share": 0.5, "median_ms": 40}
+
+    def test_ledger_caches_only_tested_verdicts(self, pick_state):
+        _book, _registry, journal = pick_state
+        proxy_pool.pick(candidates=self.cands, need=2)
+        assert journal.verdict(self.keys[0])["ok"] is False
+        assert journal.verdict(self.keys[1])["ok"] is True  # не мёртвый вердикт за пропуск дедлайна
+
+    def test_reused_verdict_without_country_is_reprobed(self, pick_state, monkeypatch):
+        _book, _registry, journal = pick_state
+        monkeypatch.setattr(proxy_pool, "_proxy_cache", {})
+        monkeypatch.setattr(proxy_pool, "_gather_candidates", lambda types, country, budget=None: list(self.cands))
+        monkeypatch.setattr(proxy_pool, "prescreen_items", lambda items, addr_of: (items, [], []))
+        journal.record(self.keys[0], ValidationResult(True, ip="192.0.2.1", cc=None, ping_ms=30))
+        assert sorted(r[0] for r in proxy_pool.pick(country="US", need=2)) == ["192.0.2.1:80", "192.0.2.2:80"]
+
+
+class TestRevalidation:
+    """Background revalidation picks expiring live entries first and keeps the cache warm."""
+
+    def test_expiring_first_then_untested(self, pool, stand_ins):
+        farm = stand_ins.farm
+        addrs = farm.add(4, scheme="socks5", latency=0.01)
+        pool.csv_path.write_text(",".join(CSV_HEADER) + "\n", encoding="utf-8")
+        pool.append_to_csv(Proxy("socks5", h, port) for h, port in addrs)
+        keys = [pool._key(p) for p in pool.read_csv()]
+        now = time.time()
+        pool._remember(keys[0], {"ok": True, "ts": now})                    # свежий
+        pool._remember(keys[1], {"ok": True, "ts": now - TTL_SECONDS + 30})  # вот-вот истечёт
+        pool._remember(keys[2], {"ok": True, "ts": now - TTL_SECONDS - 60})  # уже истёк
+        due = [pool._key(p) for p in pool.due_for_check(10)]
+        assert due[:2] == [keys[2], keys[1]] and due[2:] == [keys[3]]
+
+        rv = Revalidator(pool, rate=100, concurrency=4)
+        assert rv.run_once() == 3 and rv.alive == 3
+        assert all(pool._mem_cache.get(k)["ts"] > now for k in keys[1:])
+        assert pool.due_for_check(10) == []
+
+    def test_one_revalidator_per_pool(self, pool):
+        rv = Revalidator(pool, rate=100)
+        rv.lock_path.write_text(str(os.getppid()), encoding="utf-8")  # живой чужой процесс
+        assert not rv._claim()
+        assert not rv.owner
+        rv.lock_path.write_text("999999999", encoding="utf-8")       # владелец умер
+        assert rv._claim() and rv.owner
+        rv.stop(timeout=0)
+        assert not rv.lock_path.exists()
+
+    def test_top_up_fills_wanted_inventory(self, pool, stand_ins):
+        farm = stand_ins.farm
+        live, dead = farm.add(5, scheme="http", latency=0.01), farm.dead(5)
+        pool.append_to_csv(Proxy("http", h, port, country="NL") for h, port in live + dead)
+        pool.want("nl", "http", target=3)
+        assert pool.inventory()["NL/http"] == (0, 3)
+        rv = Revalidator(pool, rate=100, concurrency=8)
+        for _ in range(3):
+            if pool.inventory()["NL/http"][0] >= 3:
+                break
+            rv.run_once()
+        assert pool.inventory()["NL/http"][0] >= 3
+        assert pool.top_up(10) == []
+        t0 = time.perf_counter()
+        p, vr = pool.select_live("NL", "http")
+        assert vr.ok and (p.host, p.port) in live
+        assert time.perf_counter() - t0 < 0.1
+
+    def test_other_process_sees_owner_results(self, pool):
+        pool.refresh()
+        owner = ProxyPool()
+        owner.csv_path, owner.cache_path, owner.sticky_path = pool.csv_path, pool.cache_path, pool.sticky_path
+        owner.refresh()
+        assert pool.live("US", "http") == []
+        owner._remember(owner._key(Proxy("http", "10.0.0.1", 8080)),
+                        {"ok": True, "ip": "203.0.113.1", "cc": "US", "ts": time.time()})
+        owner._save_cache()
+        assert [p.host for p, _ in pool.live("US", "http")] == ["10.0.0.1"]
+        p, vr = pool.select_live("US", "http")
+        assert p.host == "10.0.0.1" and vr.ip == "203.0.113.1"
+
+    def test_demand_is_shared_between_processes(self, pool):
+        pool.want("nl", "http", target=3)
+        assert str(os.getpid()) in json.loads(pool.wanted_path.read_text())
+        other = {str(os.getppid()): [["DE", "socks5", 2]], "999999999": [["FR", None, 5]]}  # живой и умерший
+        pool.wanted_path.write_text(json.dumps(other), encoding="utf-8")
+        assert pool.wanted() == {("NL", "http"): 3, ("DE", "socks5"): 2}  # свой заказ сохранён в памяти
+        assert set(pool.inventory()) == {"NL/http", "DE/socks5"}
+        pool.want("nl", "http", target=4)
+        assert set(json.loads(pool.wanted_path.read_text())) == {str(os.getppid()), str(os.getpid())}
+
+
+class TestLeases:
+    """proxy.lease: per-proxy lease cap, even spread, lifetime tied to ProfileLock."""
+
+    def _warm(self, pool, n):
+        pool.csv_path.write_text(",".join(CSV_HEADER) + "\n", encoding="utf-8")
+        pool.append_to_csv(Proxy("http", f"10.1.0.{i}", 8080, country="US") for i in range(n))
+        for p in pool.read_csv():
+            pool._remember(pool._key(p), {"ok": True, "ip": p.host, "ping": 100, "ts": time.time()})
+
+    def test_cap_and_even_spread(self, pool, tmp_path):
+        self._warm(pool, 3)
+        leases = LeaseManager(pool, max_leases=2, profiles_dir=tmp_path / "profiles")
+        got = [leases.acquire(f"p{i}", "US", "http")[0] for i in range(6)]
+        assert all(got) and sorted(leases.occupancy()["by_proxy"].values()) == [2, 2, 2]
+        assert leases.acquire("p0", "US", "http")[0] == got[0]
+        assert leases.acquire("p6", "US", "http") == (None, None)
+        assert leases.release("p3") and leases.acquire("p6", "US", "http")[0] == got[3]
+        assert leases.occupancy()["full"] == 3
+
+    def test_cap_holds_across_processes(self, pool, tmp_path, monkeypatch):
+        self._warm(pool, 1)
+        load = LeaseManager._load
+
+        def slow_load(self):  # шире окно между чтением файла и записью
+            load(self)
+            time.sleep(0.02)
+
+        monkeypatch.setattr(LeaseManager, "_load", slow_load)
+        (p,) = pool.read_csv()
+        # два менеджера над одним файлом — как GUI и API: общий только proxy_leases.json
+        managers = [LeaseManager(pool, max_leases=2, profiles_dir=tmp_path / "profiles") for _ in range(2)]
+        start = threading.Barrier(8)
+        granted = []
+
+        def _take(i):
+            start.wait()
+            if managers[i % 2].acquire(f"p{i}", "US", "http", prefer=p)[0] is not None:
+                granted.append(i)
+
+        threads = [threading.Thread(target=_take, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(granted) == 2
+        assert LeaseManager(pool, profiles_dir=tmp_path / "profiles").occupancy()["by_proxy"] == {p.key: 2}
+
+    def test_lease_follows_chrome_lifetime(self, pool, tmp_path):
+        self._warm(pool, 1)
+        leases = LeaseManager(pool, ttl=0.2, profiles_dir=tmp_path / "profiles")
+        leases.acquire("alive", "US", "http")
+        leases.acquire("gone", "US", "http")
+        ProfileLock(tmp_path / "profiles" / "alive").acquire(chrome_pid=os.getpid())
+        ProfileLock(tmp_path / "profiles" / "gone").acquire(chrome_pid=2 ** 22 + 1)
+        time.sleep(0.3)
+        assert leases.holder("alive") is not None and leases.holder("gone") is None
+        assert LeaseManager(pool, profiles_dir=tmp_path / "profiles").occupancy()["leases"] == 1
+
+    def test_warm_proxy_skips_launch_recheck(self, pool):
+        self._warm(pool, 2)
+        fresh, stale = pool.read_csv()
+        pool._remember(pool._key(stale), {"ok": True, "ping": 100, "ts": time.time() - TTL_SECONDS * 0.9})
+        assert pool.fresh_result(fresh).ping_ms == 100
+        assert pool.fresh_result(stale) is None and pool.fresh_result(Proxy("http", "10.9.9.9", 80)) is None
+
+
+class TestCompactProxy:
+    """Slotted frozen Proxy with a cached key, and the array-backed ProxyArray."""
+
+    def test_frozen_hashable_interned(self):
+        a = Proxy("socks5", "10.0.0.1", "1080", "u", "p", "".join(["U", "S"]))
+        b = Proxy("socks5", "10.0.0.1", 1080, "u", "p", "US")
+        assert not hasattr(a, "__dict__") and a.port == 1080
+        assert a == b and len({a, b}) == 1 and a.key == "socks5:10.0.0.1:1080:u"
+        assert a.country is b.country
+        with pytest.raises(AttributeError):
+            a.host = "10.0.0.2"
+
+    def test_array_roundtrip(self):
+        items = [Proxy("http", "203.0.113.7", 8080, country="NL"),
+                 Proxy("socks5", "proxy.example", 1080, "user", "secret"),
+                 Proxy("http", "010.0.0.1", 3128)]
+        arr = ProxyArray(items)
+        assert list(arr) == items and arr[-1] == items[-1] and arr[:2] == items[:2]
@@ -0,0 +1,172 @@
+"""Tests for the native CONNECT/SOCKS prober and the asyncio engine on local stand-ins."""
+
+import pytest
+
+from proxy import timeouts, transport
+from proxy.async_validate import validate_many
+from proxy.models import Proxy
+from proxy.prescreen import prescreen_items
+from proxy.prober import extract_ip, probe
+from proxy.timeouts import AdaptiveTimeouts
+from proxy.validate import validate_proxy
+from tools.local_services import EchoStandIn, FakeProxy, ProxyFarm
+
+
+pytestmark = pytest.mark.usefixtures("no_offline_geoip")
+
+
+@pytest.fixture(scope="module")
+def echo():
+    with EchoStandIn(ip="203.0.113.7") as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def proxies():
+    servers = {
+        "http": FakeProxy("http", auth=("u", "p")),
+        "socks4": FakeProxy("socks4"),
+        "socks5": FakeProxy("socks5", auth=("u", "p")),
+    }
+    for s in servers.values():
+        s.start()
+    yield servers
+    for s in servers.values():
+        s.stop()
+
+
+class TestProbe:
+    """Handshakes, auth and timing fields of proxy.prober.probe."""
+
+    def test_extract_ip_rejects_block_pages(self):
+        assert extract_ip(b'{"ip": "203.0.113.7"}') == "203.0.113.7"
+        assert extract_ip(b'{"origin": "203.0.113.7, 10.0.0.1"}') == "203.0.113.7"
+        assert extract_ip(b"2001:db8::1\n") == "2001:db8::1"
+        assert extract_ip(b"<html><body>Access denied</body></html>") is None
+        assert extract_ip(b'{"ip": "captive.portal"}') is None
+
+    @pytest.mark.parametrize("scheme", ["http", "socks4", "socks5"])
+    def test_probe_reports_exit_ip_and_timings(self, echo, proxies, scheme):
+        fp = proxies[scheme]
+        res = probe(Proxy(scheme, fp.host, fp.port, "u", "p"), echo_url=echo.url + "/ip", timeout=3)
+        assert res.ok, res.error
+        assert res.ip == "203.0.113.7"
+        assert None not in (res.connect_ms, res.handshake_ms, res.first_byte_ms, res.total_ms)
+
+    def test_socks4a_hostname_target(self, echo, proxies):
+        fp = proxies["socks4"]
+        url = echo.url.replace("127.0.0.1", "localhost")
+        assert probe(Proxy("socks4", fp.host, fp.port), echo_url=url, timeout=3).ok
+
+    @pytest.mark.parametrize("scheme", ["http", "socks5"])
+    def test_wrong_password_fails(self, echo, proxies, scheme):
+        fp = proxies[scheme]
+        res = probe(Proxy(scheme, fp.host, fp.port, "u", "wrong"), echo_url=echo.url, timeout=3)
+        assert not res.ok and res.error
+
+    def test_proxy_session_ignores_environment_proxy(self, echo, monkeypatch):
+        for var in ("NO_PROXY", "no_proxy"):
+            monkeypatch.delenv(var, raising=False)
+        monkeypatch.setenv("HTTP_PROXY", "http://127.0.0.1:9")
+        with ProxyFarm(seed=2) as farm:
+            (host, port), = farm.add(1)
+            session = transport.SessionPool(4).get("env", f"http://{host}:{port}")
+            assert session.get(echo.url + "/ip", timeout=3).json()["ip"] == "203.0.113.7"
+
+    def test_validate_proxy_uses_native_prober_with_echo_url(self, echo, proxies, geo_stand_in):
+        geo_stand_in.table["203.0.113.7"] = "NL"
+        fp = proxies["socks5"]
+        vr = validate_proxy(Proxy("socks5", fp.host, fp.port, "u", "p"), timeout=3, echo_url=echo.url)
+        assert vr.ok and vr.ip == "203.0.113.7" and vr.first_byte_ms is not None
+        assert vr.cc == "NL"
+
+
+class TestPrescreen:
+    """TCP stage: refused connects are dead, addresses that never got a try are untried."""
+
+    def test_untried_is_not_dead(self):
+        with ProxyFarm(seed=4) as farm:
+            live = farm.add(1)
+            refused = farm.dead(1)
+            items = live + refused
+            ok, dead, untried = prescreen_items(items, lambda a: a)
+            assert (ok, dead, untried) == (live, refused, [])
+            # дедлайн истёк раньше попыток — ни один адрес не признан мёртвым
+            ok, dead, untried = prescreen_items(items, lambda a: a, deadline=0)
+            assert (ok, dead, untried) == ([], [], items)
+
+
+class TestAsyncEngine:
+    """validate_many streams results for every scheme."""
+
+    def test_validate_many_mixed(self, echo, proxies):
+        items = [Proxy(s, fp.host, fp.port, "u", "p") for s, fp in proxies.items()]
+        items.append(Proxy("http", "127.0.0.1", 1))
+        results = {p.scheme + str(p.port): vr for p, vr in validate_many(items, echo_url=echo.url, geo=False, timeout=3)}
+        assert len(results) == 4
+        assert sum(vr.ok for vr in results.values()) == 3
+        assert all(vr.handshake_ms is not None for vr in results.values() if vr.ok)
+
+
+class TestAdaptiveTimeouts:
+    """proxy.timeouts: percentile-based timeouts clamped to [min, default]."""
+
+    def test_default_until_enough_samples(self):
+        t = AdaptiveTimeouts(min_samples=5)
+        t.observe("src", "http", 100, True)
+        assert t.timeout_for("src", "http", default=5.0) == 5.0
+
+    def test_fast_source_gets_short_timeout(self):
+        t = AdaptiveTimeouts(min_samples=5, min_timeout=0.5)
+        for _ in range(50):
+            t.observe("fast", "socks5h", 200, True)
+        t.observe("fast", "socks5", None, False, "timeout 5.0s")
+        assert 0.5 <= t.timeout_for("fast", "socks5", default=5.0) < 1.0
+        assert t.timeout_for("other", "socks5", default=5.0) == 5.0
+        st = t.stats()["fast/socks5"]
+        assert st["samples"] == 50 and st["timeout_hits"] == 1
+
+    def test_timeouts_widen_limit_back_toward_default(self):
+        t = AdaptiveTimeouts(min_samples=5, min_timeout=0.5)
+        for _ in range(50):
+            t.observe("src", "http", 200, True)
+        narrow = t.timeout_for("src", "http", default=5.0)
+        assert narrow < 1.0
+        for _ in range(10):  # медленные рабочие прокси упираются в сжатый таймаут
+            t.observe("src", "http", None, False, f"timeout {narrow}s")
+        assert t.timeout_for("src", "http", default=5.0) > narrow
+        for _ in range(200):
+            t.timeout_for("src", "http", default=5.0)
+            t.observe("src", "http", None, False, "timed out")
+        assert t.timeout_for("src", "http", default=5.0) == 5.0
+
+    def test_hint_caps_timeout(self):
+        t = AdaptiveTimeouts(min_timeout=0.5)
+        assert t.timeout_for("src", "http", default=5.0, hint_ms=300) == pytest.approx(0.9)
+
+    def test_validate_proxy_records_observation(self, echo, proxies, geo_stand_in, monkeypatch):
+        t = AdaptiveTimeouts()
+        monkeypatch.setattr(timeouts, "adaptive", t)
+        geo_stand_in.table["203.0.113.7"] = "NL"
+        p = Proxy("socks4", proxies["socks4"].host, proxies["socks4"].port)
+        assert validate_proxy(p, echo_url=echo.url, source="test").ok
+        st = t.stats()["test/socks4"]
+        assert st["probes"] == 1 and st["ok"] == 1 and st["timeout_s"] == 5.0
+
+
+class TestProxyFarm:
+    """tools.local_services.ProxyFarm behaviours used by the benchmark."""
+
+    def test_live_failing_blackhole_dead(self, echo):
+        with ProxyFarm(seed=1) as farm:
+            (live,) = farm.add(1, scheme="socks5", latency=0.01)
+            (failing,) = farm.add(1, scheme="http", fail_rate=1.0)
+            (hole,) = farm.add(1, scheme="http", blackhole=True)
+            (dead,) = farm.dead(1)
+            res = {name: probe(Proxy(scheme, *addr), echo_url=echo.url, timeout=0.5)
+                   for name, scheme, addr in [("live", "socks5", live), ("failing", "http", failing),
+                                               ("hole", "http", hole), ("dead", "http", dead)]}
+        assert res["live"].ok and res["live"].handshake_ms >= 10
+        assert "502" in res["failing"].error
+        assert res["hole"].error.startswith("timeout")
+        assert not res["dead"].ok and res["dead"].connect_ms is None
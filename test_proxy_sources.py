@@ -0,0 +1,191 @@
+"""Tests for proxy source gathering (proxy.sources)."""
+
+import time
+
+import pytest
+
+from proxy import source_cache, source_registry
+from proxy.geonode import GeonodeClient
+from proxy.ledger import CHECK_TTL, CandidateLedger
+from proxy.models import Proxy
+from proxy.source_cache import SourceCache
+from proxy.source_registry import ProxySource, SourceRegistry
+from proxy.sources import fetch_concurrently, get_working_proxies, last_source_reports
+from proxy.validate import ValidationResult
+from tools.local_services import GeonodeStandIn, ListStandIn
+
+
+class TestConcurrentFetch:
+    """All sources run at once; the overall deadline bounds gathering time."""
+
+    def test_deadline_partial_results_and_reports(self):
+        def slow():
+            time.sleep(2)
+            return ["late"]
+
+        def broken():
+            raise ConnectionError("refused")
+
+        t0 = time.perf_counter()
+        results, reports = fetch_concurrently({
+            "fast": lambda: ["a", "b"],
+            "medium": lambda: time.sleep(0.2) or ["c"],
+            "broken": broken,
+            "slow": slow,
+        }, deadline=0.5)
+        assert time.perf_counter() - t0 < 1.0
+        assert results == {"fast": ["a", "b"], "medium": ["c"]}
+        by_name = {r.name: r for r in reports}
+        assert by_name["fast"].ok and by_name["fast"].count == 2
+        assert by_name["medium"].ms >= 200
+        assert not by_name["broken"].ok and by_name["broken"].error == "refused"
+        assert by_name["slow"].error == "deadline"
+        assert last_source_reports() == reports
+
+
+class TestSourceCache:
+    """proxy.source_cache: min refresh interval, conditional GET, stale copy on errors."""
+
+    def test_conditional_get_and_min_interval(self, tmp_path):
+        with ListStandIn({"/http.txt": "1.1.1.1:80\n2.2.2.2:8080\n"}) as server:
+            url = server.url + "/http.txt"
+            cache = SourceCache(tmp_path, min_interval=0)
+            assert cache.get(url) == "1.1.1.1:80\n2.2.2.2:8080\n"
+            assert cache.get(url).startswith("1.1.1.1") and server.not_modified == 1
+            assert cache.get(url, min_interval=60).startswith("1.1.1.1")
+            assert server.hits["/http.txt"] == 2
+            server.set("/http.txt", "3.3.3.3:3128\n")
+            assert cache.get(url) == "3.3.3.3:3128\n"
+            assert cache.stats() == {"fresh": 1, "revalidated": 1, "downloaded": 2, "bytes_saved": 48}
+        # источник недоступен — отдаём копию с диска
+        assert SourceCache(tmp_path, min_interval=0).get(url, timeout=1) == "3.3.3.3:3128\n"
+
+
+class TestSourceRegistry:
+    """proxy.source_registry: plugins, per-source yield stats, budget by live share."""
+
+    def test_stats_and_allocation(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(source_cache, "_cache", SourceCache(tmp_path / "sources", min_interval=0))
+        with ListStandIn({"/good.txt": "1.1.1.1:80\n1.1.1.2:80\n1.1.1.3:80\n",
+                          "/bad.txt": "2.2.2.1:80\n2.2.2.2:80\n2.2.2.3:80\n"}) as server:
+
+            class Listed(ProxySource):
+                schemes = ("http",)
+
+                def __init__(self, name):
+                    self.name = name
+
+                def url(self, scheme, country):
+                    return f"{server.url}/{self.name}.txt"
+
+            registry = SourceRegistry(tmp_path / "source_stats.json")
+            registry.register(Listed("good"))
+            registry.register(Listed("bad"))
+            assert registry.sources("socks5") == []
+            by_source, reports = registry.gather(["http"], "US")
+        assert {r.name for r in reports} == {"good/http", "bad/http"}
+        assert [p.host for p in by_source["good"]] == ["1.1.1.1", "1.1.1.2", "1.1.1.3"]
+        assert by_source["bad"][0].country == "US"
+
+        for p in by_source["good"]:
+            registry.record(p.key, True, 100 + p.port)
+        for p in by_source["bad"]:
+            registry.record(p.key, False)
+        registry.record("http:9.9.9.9:80:", True)  # источник неизвестен — не учитывается
+        stats = registry.stats()
+        assert stats["good"] == {"returned": 3, "validated": 3, "live": 3, "live_share": 1.0, "median_ms": 180}
+        assert stats["bad"]["live_share"] == 0.0 and stats["bad"]["median_ms"] is None
+
+        # бюджет 4: почти весь — продуктивному источнику, но и плохому хотя бы один
+        picked = registry.allocate(by_source, 4)
+        assert [p.host for p in picked] == ["1.1.1.1", "1.1.1.2", "1.1.1.3", "2.2.2.1"]
+
+        registry.save()
+        assert SourceRegistry(tmp_path / "source_stats.json").stats()["good"]["live"] == 3
+
+
+class TestCandidateLedger:
+    """proxy.ledger: a refresh validates only new and expired candidates."""
+
+    def test_refresh_diff_and_reuse(self, tmp_path):
+        ledger = CandidateLedger(tmp_path / "candidate_ledger.json")
+        first = [Proxy("http", "1.1.1.1", 80), Proxy("http", "1.1.1.2", 80), Proxy("http", "1.1.1.3", 80)]
+        assert ledger.observe("list", (p.key for p in first)) == {"new": 3, "expired": 0, "reused": 0}
+        ledger.record(first[0].key, ValidationResult(True, cc="US", ping_ms=120))
+        ledger.record(first[1].key, ValidationResult(False))
+        # живой вердикт истёк
+        ledger._checks[first[2].key] = {"ok": True, "ping": 90, "ts": time.time() - CHECK_TTL - 1}
+
+        second = first + [Proxy("http", "1.1.1.4", 80)]
+        assert ledger.observe("list", (p.key for p in second)) == {"new": 1, "expired": 1, "reused": 2}
+        todo, known = ledger.split(second, key_of=lambda p: p.key)
+        assert [p.host for p in todo] == ["1.1.1.3", "1.1.1.4"]
+        assert [(p.host, ledger.result(e).ok) for p, e in known] == [("1.1.1.1", True), ("1.1.1.2", False)]
+        assert ledger.result(known[0][1]).ping_ms == 120
+
+        stats = ledger.stats()
+        assert stats["sources"]["list"]["hit_rate"] == 0.286 and stats["hit_rate"] == 0.286
+        assert (stats["new"], stats["expired"], stats["reused"]) == (4, 1, 2)
+
+        ledger.flush()
+        again = CandidateLedger(tmp_path / "candidate_ledger.json")
+        assert again.verdict(first[0].key)["cc"] == "US"
+        assert again.observe("list", [first[0].key]) == {"new": 0, "expired": 0, "reused": 1}
+
+    def test_allocate_spends_budget_on_unchecked(self, tmp_path):
+        ledger = CandidateLedger(tmp_path / "candidate_ledger.json")
+        registry = SourceRegistry(tmp_path / "source_stats.json", ledger=ledger)
+        items = [Proxy("http", f"1.1.1.{i}", 80) for i in range(1, 7)]
+        ledger.record(items[0].key, ValidationResult(True, ping_ms=50))
+        ledger.record(items[1].key, ValidationResult(False))
+        picked = registry.allocate({"list": items}, 2)
+        # бюджет 2 — на непроверенные; живой с годным вердиктом сверх бюджета, мёртвый отброшен
+        assert [p.host for p in picked] == ["1.1.1.3", "1.1.1.4", "1.1.1.1"]
+
+    def test_working_proxies_keep_reused_past_builtins(self, tmp_path, monkeypatch):
+        ledger = CandidateLedger(tmp_path / "candidate_ledger.json")
+        registry = SourceRegistry(tmp_path / "source_stats.json", ledger=ledger)
+        items = [Proxy("http", f"1.1.1.{i}", 80) for i in range(1, 21)]
+        ledger.record(items[0].key, ValidationResult(True, ping_ms=50))
+        monkeypatch.setattr(source_registry, "_registry", registry)
+        monkeypatch.setattr(registry, "gather", lambda schemes, country: ({"list": items}, []))
+        proxies = get_working_proxies("US", "http", max_proxies=10)
+        # 8 встроенных + 2 из бюджета + живой из журнала сверх бюджета
+        assert len(proxies) == 11 and proxies[-1].host == "1.1.1.1"
+
+
+class TestGeonodeClient:
+    """proxy.geonode: parallel pages up to a target, filters pushed into the query."""
+
+    def test_pages_filters_and_streaming(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(source_cache, "_cache", SourceCache(tmp_path / "sources", min_interval=0))
+        records = [{"ip": f"10.1.{i // 250}.{i % 250}", "port": str(8000 + i % 7),
+                    "country": "US" if i % 2 else "DE",
+                    "protocols": ["http", "socks5"] if i % 3 == 0 else ["http"],
+                    "upTime": 95 if i % 4 else 50, "speed": "fast"} for i in range(400)]
+        with GeonodeStandIn(records, delay=0.3) as server:
+            client = GeonodeClient(base_url=server.api_url, page_size=20, min_interval=0)
+            t0 = time.perf_counter()
+            got = list(client.stream("us", ["http"], target=50, min_uptime=90, speed="fast"))
+            elapsed = time.perf_counter() - t0
+            queries = list(server.queries)
+        assert len(got) == 50 and len({p.key for p in got}) == 50
+        assert all(p.scheme == "http" and p.country == "US" for p in got)
+        # три страницы по 20 — одновременно, а не 3 × 0.3 c
+        assert sorted(int(q["page"]) for q in queries) == [1, 2, 3]
+        assert elapsed < 0.8
+        assert all(q["country"] == "US" and q["protocols"] == "http" and q["filterUpTime"] == "90"
+                   and q["speed"] == "fast" and q["limit"] == "20" for q in queries)
+
+        with GeonodeStandIn(records) as server:
+            client = GeonodeClient(base_url=server.api_url, page_size=100, min_interval=0)
+            stream = client.stream("", ["http", "socks5"], target=1000)
+            first = next(stream)
+            assert first.host.startswith("10.1.")
+            rest = list(stream)
+        # запись с двумя протоколами — два прокси; лишние страницы пусты
+        assert len(rest) + 1 == 400 + sum(1 for i in range(400) if i % 3 == 0)
+
+        dead = GeonodeClient(base_url="http://127.0.0.1:9/api/proxy-list", min_interval=0, timeout=2)
+        with pytest.raises(Exception):
+            list(dead.stream("US", ["http"], target=10))  # все страницы упали
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Память на один прокси: прежний dataclass с __dict__, нынешний Proxy
+(slots, frozen, интернирование) и плотный proxy.bulk.ProxyArray.
+
+    python tools/bench_memory.py
+    python tools/bench_memory.py --sizes 100000,500000 -o mem.json
+
+Каждый вариант строится из одних и тех же "сырых" чисел, а строки хостов
+создаются внутри замера — как при чтении proxies.csv. bytes_per_proxy —
+прирост tracemalloc после построения списка (без временных объектов),
+peak_bytes_per_proxy — пик во время построения.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+if __name__ == "__main__":  # запуск как скрипта: корень репозитория в sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from proxy.bulk import ProxyArray
+from proxy.models import Proxy
+
+SIZES = (10_000, 100_000)
+SCHEMES = ("http", "socks5", "socks4")
+COUNTRIES = ("US", "DE", "NL", "FR", "GB", "RU", "BR", "IN", "JP", "SG", "", "", "")
+AUTH_SHARE = 0.05  # доля прокси с логином/паролем
+
+
+@dataclass
+class DictProxy:
+    """Proxy до перехода на slots — для сравнения."""
+    scheme: str
+    host: str
+    port: int
+    username: Optional[str] = None
+    password: Optional[str] = None
+    country: Optional[str] = None
+
+
+def _raw(n, seed):
+    rng = random.Random(seed)
+    return [(rng.randrange(3), rng.getrandbits(32), rng.randrange(1, 65536), rng.randrange(len(COUNTRIES)),
+             rng.random() < AUTH_SHARE) for _ in range(n)]
+
+
+def _rows(raw):
+    for s, ip, port, cc, auth in raw:
+        host = f"{ip >> 24}.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}"
+        user, pwd = (f"u{ip & 0xffff}", f"p{port}") if auth else (None, None)
+        # схема и страна приходят из CSV как новые строки, а не литералы
+        yield "".join(SCHEMES[s]), host, port, user, pwd, "".join(COUNTRIES[cc]) or None
+
+
+BUILDERS = {
+    "dataclass": lambda raw: [DictProxy(*r) for r in _rows(raw)],
+    "proxy_slots": lambda raw: [Proxy(*r) for r in _rows(raw)],
+    "proxy_array": lambda raw: ProxyArray(Proxy(*r) for r in _rows(raw)),
+}
+
+
+def measure(kind, n, seed):
+    raw = _raw(n, seed)
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    obj = BUILDERS[kind](raw)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(obj) == n
+    return {
+        "kind": kind,
+        "n": n,
+        "bytes_per_proxy": round((current - base) / n, 1),
+        "peak_bytes_per_proxy": round((peak - base) / n, 1),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Memory per proxy: dataclass vs slotted Proxy vs ProxyArray")
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("-o", "--output", help="файл для JSON (по умолчанию stdout)")
+    args = ap.parse_args(argv)
+
+    results = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        for kind in BUILDERS:
+            res = measure(kind, n, args.seed)
+            print(f"{kind:>12} n={n:<7} {res['bytes_per_proxy']} B/proxy  peak {res['peak_bytes_per_proxy']} B/proxy",
+                  file=sys.stderr)
+            results.append(res)
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                       "auth_share": AUTH_SHARE, "seed": args.seed},
+              "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
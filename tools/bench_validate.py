@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Воспроизводимый бенчмарк проверки прокси — без интернета.
+
+Поднимает локальную ферму фейковых прокси (HTTP CONNECT и SOCKS5 с задержкой,
+джиттером, отказами и "чёрными дырами"), эхо-сервер и заглушку ip-api, затем
+гоняет validate_proxy, validate_candidates, pick и ProxyPool.select_live
+на 100 / 1 000 / 10 000 кандидатах. Каждый замер — в отдельном процессе,
+чтобы пиковый RSS не смешивался. Результат — JSON для сравнения между коммитами.
+
+    python tools/bench_validate.py
+    python tools/bench_validate.py --sizes 100,1000 --targets validate_candidates,pick -o bench.json
+
+Поля результата: proxies_per_s — обработанных кандидатов в секунду
+(select_live — проверок в секунду), p50_ms/p95_ms — задержка одной проверки
+(validate_proxy и select_live — время вызова, пакетные цели — ping живых).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+if __name__ == "__main__":  # запуск как скрипта: корень репозитория в sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from proxy import geo, geoip, health, timeouts
+from proxy.geo import GeoResolver
+from proxy.models import Proxy
+from proxy.pool import CSV_HEADER, ProxyPool
+from proxy.validate import validate_proxy
+from tools import proxy_pool
+from tools.local_services import EchoStandIn, GeoStandIn, ProxyFarm
+
+TARGETS = ("validate_proxy", "validate_candidates", "pick", "select_live")
+SIZES = (100, 1000, 10000)
+# доли кандидатов по поведению; остаток — мёртвые адреса (connect refused)
+MIX = {"live": 0.3, "slow": 0.1, "blackhole": 0.1}
+VALIDATE_WORKERS = 32   # потоков для последовательного API validate_proxy
+SELECT_CALLS = 5        # вызовов select_live на замер, каждый с пустым кэшем
+# источник в proxy.timeouts.stats() — по нему считаем реально сделанные проверки
+SOURCES = {"validate_proxy": "validate", "validate_candidates": "proxy_lab", "pick": "pick", "select_live": "pool"}
+
+
+def _loopback_hosts(n):
+    # на macOS из 127/8 настроен только 127.0.0.1
+    if sys.platform == "darwin" or n <= 1:
+        return ["127.0.0.1"]
+    return [f"127.0.{i // 250}.{i % 250 + 1}" for i in range(n)]
+
+
+def _pct(values, q):
+    if not values:
+        return None
+    v = sorted(values)
+    return round(v[min(len(v) - 1, int(q * len(v)))], 1)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+    except Exception:
+        return None
+
+
+def _probes(source):
+    return sum(v["probes"] for k, v in timeouts.stats().items() if k.startswith(source + "/"))
+
+
+def _build_candidates(farm, n, args):
+    """[(scheme, host, port)] в перемешанном, но воспроизводимом порядке."""
+    hosts = _loopback_hosts(args.hosts)
+    schemes = args.schemes.split(",")
+    out = []
+    for kind, share in MIX.items():
+        k = int(n * share)
+        for i, scheme in enumerate(schemes):
+            cnt = k // len(schemes) + (1 if i < k % len(schemes) else 0)
+            if not cnt:
+                continue
+            latency = args.latency / 1000 * (args.slow_factor if kind == "slow" else 1)
+            addrs = farm.add(cnt, scheme=scheme, latency=latency, jitter=args.jitter / 1000,
+                             fail_rate=args.fail_rate, blackhole=kind == "blackhole", hosts=hosts)
+            out.extend((scheme, h, p) for h, p in addrs)
+    rest = n - len(out)
+    out.extend((schemes[i % len(schemes)], h, p) for i, (h, p) in enumerate(farm.dead(rest, hosts=hosts)))
+    farm.rng.shuffle(out)
+    return out
+
+
+# ------------------------------------------------------------------
+# Цели
+def _run_validate_proxy(cands, args):
+    def _one(c):
+        t0 = time.perf_counter()
+        vr = validate_proxy(Proxy(c[0], c[1], c[2]))
+        return (time.perf_counter() - t0) * 1000, vr.ok
+
+    with ThreadPoolExecutor(VALIDATE_WORKERS) as ex:
+        res = list(ex.map(_one, cands))
+    return [ms for ms, _ok in res], sum(ok for _ms, ok in res)
+
+
+def _as_lab(cands):
+    return [(f"{h}:{p}", s.upper(), "") for s, h, p in cands]
+
+
+def _run_validate_candidates(cands, args):
+    res = proxy_pool.validate_candidates(_as_lab(cands))
+    live = [r.ping_ms for r in res if r.alive]
+    return live, len(live)
+
+
+def _run_pick(cands, args):
+    # полный проход без early exit — меряем пропускную способность, а не время до 6 живых
+    types = sorted({s.upper() for s, _h, _p in cands})
+    res = proxy_pool.pick(types=types, need=len(cands), limit_test=len(cands), early_exit=False,
+                          candidates=_as_lab(cands))
+    return [r[3] for r in res], len(res)
+
+
+def _run_select_live(cands, args):
+    tmp = Path(args.tmp)
+    pool = ProxyPool()
+    pool.csv_path, pool.cache_path, pool.sticky_path = tmp / "proxies.csv", tmp / "cache.json", tmp / "sticky.json"
+    pool.csv_path.write_text(",".join(CSV_HEADER) + "\n", encoding="utf-8")
+    pool.append_to_csv(Proxy(s, h, p) for s, h, p in cands)
+    pool.refresh()
+    latencies, live = [], 0
+    for _ in range(SELECT_CALLS):
+        pool._mem_cache.clear()
+        t0 = time.perf_counter()
+        p, _vr = pool.select_live(None, None)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        live += p is not None
+    return latencies, live
+
+
+RUNNERS = {
+    "validate_proxy": _run_validate_proxy,
+    "validate_candidates": _run_validate_candidates,
+    "pick": _run_pick,
+    "select_live": _run_select_live,
+}
+
+
+def run_one(target, n, args):
+    """Один замер в текущем процессе: окружение, прогон, метрики."""
+    with tempfile.TemporaryDirectory() as tmp, ProxyFarm(seed=args.seed) as farm, EchoStandIn() as echo:
+        args.tmp = tmp
+        cands = _build_candidates(farm, n, args)
+        table = {h: "NL" for h in _loopback_hosts(args.hosts)}
+        with GeoStandIn(table) as geo_server:
+            os.environ["AICHROME_ECHO_URL"] = echo.url + "/ip"
+            geoip.set_index(None)
+            geo._resolver = GeoResolver(cache_path=Path(tmp) / "geo.json", batch_url=geo_server.batch_url)
+            timeouts.adaptive = timeouts.AdaptiveTimeouts()
+            health.set_book(health.HealthBook(Path(tmp) / "proxy_health.json"))
+            proxy_pool._proxy_cache.clear()
+
+            t0 = time.perf_counter()
+            latencies, live = RUNNERS[target](cands, args)
+            elapsed = time.perf_counter() - t0
+        probes = _probes(SOURCES[target])
+    done = probes if target == "select_live" else n
+    return {
+        "target": target,
+        "n": n,
+        "elapsed_s": round(elapsed, 3),
+        "proxies_per_s": round(done / elapsed, 1) if elapsed else None,
+        "probes": probes,
+        "live": live,
+        "p50_ms": _pct(latencies, 0.50),
+        "p95_ms": _pct(latencies, 0.95),
+        "peak_rss_mb": _peak_rss_mb(),
+        "connections": farm.connections,
+    }
+
+
+def _passthrough(args):
+    return ["--seed", str(args.seed), "--hosts", str(args.hosts), "--schemes", args.schemes,
+            "--latency", str(args.latency), "--jitter", str(args.jitter),
+            "--slow-factor", str(args.slow_factor), "--fail-rate", str(args.fail_rate)]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline proxy validation benchmark")
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    ap.add_argument("--targets", default=",".join(TARGETS))
+    ap.add_argument("--schemes", default="http,socks5", help="схемы фейковых прокси")
+    ap.add_argument("--latency", type=float, default=40.0, help="задержка рукопожатия, мс")
+    ap.add_argument("--jitter", type=float, default=20.0, help="± мс к задержке")
+    ap.add_argument("--slow-factor", type=float, default=20.0, help="во сколько раз медленнее 'slow' прокси")
+    ap.add_argument("--fail-rate", type=float, default=0.05, help="доля отказов на рукопожатии")
+    ap.add_argument("--hosts", type=int, default=64, help="сколько адресов 127.0.x.y использовать")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--in-process", action="store_true", help="все замеры в одном процессе (RSS общий)")
+    ap.add_argument("--single", help=argparse.SUPPRESS)  # target:n — дочерний процесс
+    ap.add_argument("-o", "--output", help="файл для JSON (по умолчанию stdout)")
+    args = ap.parse_args(argv)
+
+    if args.single:
+        target, n = args.single.split(":")
+        print(json.dumps(run_one(target, int(n), args)))
+        return
+
+    results = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        for target in args.targets.split(","):
+            if target not in RUNNERS:
+                ap.error(f"unknown target {target}")
+            if args.in_process:
+                res = run_one(target, n, args)
+            else:
+                cmd = [sys.executable, os.path.abspath(__file__), "--single", f"{target}:{n}"] + _passthrough(args)
+                out = subprocess.run(cmd, capture_output=True, text=True)
+                if out.returncode != 0:
+                    res = {"target": target, "n": n, "error": out.stderr.strip().splitlines()[-1:]}
+                else:
+                    res = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{target:>20} n={n:<6} {res.get('proxies_per_s')} proxies/s  "
+                  f"p50={res.get('p50_ms')} p95={res.get('p95_ms')} ms  rss={res.get('peak_rss_mb')} MB",
+                  file=sys.stderr)
+            results.append(res)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "mix": MIX,
+            "schemes": args.schemes,
+            "latency_ms": args.latency,
+            "jitter_ms": args.jitter,
+            "slow_factor": args.slow_factor,
+            "fail_rate": args.fail_rate,
+            "hosts": args.hosts,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
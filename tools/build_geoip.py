@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Пересборка офлайн-индекса GeoIP (proxy/geoip.py).
+
+Вход: CSV диапазонов "start,end,cc" (db-ip country lite, ip2location lite,
+в т.ч. .csv.gz) или .mmdb (нужен пакет maxminddb).
+Выход: бинарный индекс, по умолчанию data/geoip.idx.
+
+    python tools/build_geoip.py dbip-country-lite.csv.gz
+    python tools/build_geoip.py GeoLite2-Country.mmdb -o data/geoip.idx
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+if __name__ == "__main__":  # запуск как скрипта: корень репозитория в sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from proxy.geoip import GeoIPIndex, default_index_path
+
+try:
+    import maxminddb
+except Exception:  # pragma: no cover - опциональная зависимость
+    maxminddb = None
+
+
+def _mmdb_ranges(path):
+    if maxminddb is None:
+        raise SystemExit("для .mmdb нужен пакет maxminddb: pip install maxminddb")
+    with maxminddb.open_database(str(path)) as reader:
+        for network, record in reader:
+            cc = ((record or {}).get("country") or (record or {}).get("registered_country") or {}).get("iso_code")
+            if not cc:
+                continue
+            net = ipaddress.ip_network(network)
+            yield str(net.network_address), str(net.broadcast_address), cc
+
+
+def build(src, dst):
+    t0 = time.perf_counter()
+    if str(src).endswith(".mmdb"):
+        idx = GeoIPIndex.from_ranges(_mmdb_ranges(src))
+    else:
+        idx = GeoIPIndex.from_csv(src)
+    idx.save(dst)
+    print(f"[geoip] {len(idx)} ranges, {len(idx.codes)} countries, "
+          f"{idx.nbytes / 1_000_000:.1f} MB -> {dst} ({time.perf_counter() - t0:.1f}s)")
+    return idx
+
+
+def bench(idx, n=200_000):
+    ips = [f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}"
+           for _ in range(n)]
+    t0 = time.perf_counter()
+    hits = sum(1 for ip in ips if idx.lookup(ip))
+    dt = time.perf_counter() - t0
+    print(f"[geoip] lookup: {dt / n * 1e9:.0f} ns/ip, hit rate {hits / n:.0%}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build offline GeoIP range index")
+    ap.add_argument("source", help="CSV (start,end,cc), .csv.gz или .mmdb")
+    ap.add_argument("-o", "--output", default=str(default_index_path()))
+    ap.add_argument("--bench", action="store_true", help="замерить скорость поиска после сборки")
+    args = ap.parse_args(argv)
+    idx = build(args.source, args.output)
+    if args.bench:
+        bench(idx)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,54 +5,26 @@ Geonode Proxy Fetcher
 Рабочий скрипт для получения прокси с Geonode.com
 """
 
-import requests
-import json
+import os
 import random
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def fetch_geonode_proxies(country="", limit=50):
+if __name__ == "__main__":  # запуск как скрипта: корень репозитория в sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from proxy import transport
+from proxy.geo import lookup_countries
+from proxy.geonode import GeonodeClient
+
+def iter_geonode_proxies(country="", limit=50, protocols=("http", "https"), min_uptime=None, speed=None):
+    """(addr, PROTO, cc) по мере прихода страниц Geonode; фильтры — на стороне API (proxy.geonode)"""
+    for p in GeonodeClient().stream(country or "", protocols, target=limit, min_uptime=min_uptime, speed=speed):
+        yield (f"{p.host}:{p.port}", p.scheme.upper(), p.country or "")
+
+def fetch_geonode_proxies(country="", limit=50, protocols=("http", "https"), min_uptime=None, speed=None):
     """Получает прокси с Geonode API"""
     try:
-        # API URL для получения прокси
-        api_url = 'https://proxylist.geonode.com/api/proxy-list'
-        params = {
-            'limit': limit,
-            'page': 1,
-            'sort_by': 'lastChecked',
-            'sort_type': 'desc',
-            'protocols': 'http,https'
-        }
-        
-        if country:
-            params['country'] = country.upper()
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(api_url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            proxies = data.get('data', [])
-            
-            # Конвертируем в нужный формат
-            result = []
-            for proxy in proxies:
-                ip = proxy.get('ip')
-                port = proxy.get('port')
-                country_code = proxy.get('country', '').upper()
-                protocols = proxy.get('protocols', ['http'])
-                
-                if ip and port:
-                    for protocol in protocols:
-                        result.append((f"{ip}:{port}", protocol.upper(), country_code))
-            
-            return result
-        else:
-            print(f"Ошибка API: {response.status_code}")
-            return []
-            
+        return list(iter_geonode_proxies(country, limit, protocols, min_uptime, speed))
     except Exception as e:
         print(f"Ошибка получения прокси: {e}")
         return []
@@ -64,9 +36,10 @@ def test_proxy(proxy_tuple):
     try:
         # Быстрая проверка через ipify.org
         test_url = 'https://api.ipify.org?format=json'
-        proxy_dict = {protocol.lower(): f'{protocol.lower()}://{addr}'}
+        scheme = 'http' if protocol.upper() in ('HTTP', 'HTTPS') else protocol.lower()
+        session = transport.proxy_session(f'{scheme}://{addr}')
         
-        response = requests.get(test_url, proxies=proxy_dict, timeout=5)
+        response = session.get(test_url, timeout=5)
         
         if response.status_code == 200:
             result_ip = response.json().get('ip')
@@ -77,53 +50,50 @@ def test_proxy(proxy_tuple):
     except Exception:
         return None
 
-def get_candidates(country=None, types=None, limit=50):
+def get_candidates(country=None, types=None, limit=50, min_uptime=None, speed=None):
     """Новый API для совместимости с proxy_pool.py"""
     if not types:
         types = ["HTTP", "HTTPS"]
     
-    # Получаем прокси
-    all_proxies = fetch_geonode_proxies(country or "", limit * 2)
-    
-    # Фильтруем по типам
-    filtered = []
-    for addr, protocol, country_code in all_proxies:
-        if protocol.upper() in [t.upper() for t in types]:
-            filtered.append({
-                "addr": addr,
-                "proto": protocol.upper(),
-                "cc": country_code
-            })
-    
-    return filtered[:limit]
+    # типы фильтрует сам Geonode
+    proxies = fetch_geonode_proxies(country or "", limit, [t.lower() for t in types], min_uptime, speed)
+    return [{"addr": addr, "proto": protocol, "cc": country_code} for addr, protocol, country_code in proxies]
 
 def get_working_proxies(country="", limit=20, test_limit=50):
     """Получает рабочие прокси с Geonode"""
     print(f"🔍 Получаю прокси с Geonode для страны: {country or 'любой'}")
     
-    # Получаем прокси
-    all_proxies = fetch_geonode_proxies(country, test_limit)
-    print(f"📡 Получено {len(all_proxies)} прокси")
-    
-    if not all_proxies:
-        return []
-    
-    # Тестируем прокси параллельно
+    # Тестируем прокси параллельно — начиная с первой пришедшей страницы
     working_proxies = []
+    exit_ips = {}
     
     with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(test_proxy, proxy) for proxy in all_proxies]
+        futures = []
+        try:
+            for proxy in iter_geonode_proxies(country, test_limit):
+                futures.append(executor.submit(test_proxy, proxy))
+        except Exception as e:
+            print(f"Ошибка получения прокси: {e}")
+        print(f"📡 Получено {len(futures)} прокси")
+        if not futures:
+            return []
         
         for future in as_completed(futures):
             result = future.result()
             if result:
                 addr, protocol, country, real_ip = result
                 working_proxies.append((addr, protocol, country))
+                exit_ips[addr] = real_ip
                 print(f"✅ {addr} ({country}) -> {real_ip}")
                 
                 if len(working_proxies) >= limit:
                     break
     
+    # страна выходного IP точнее, чем метаданные Geonode; все IP — одним batch-запросом
+    geo = lookup_countries(exit_ips.values())
+    working_proxies = [(addr, protocol, (geo.get(exit_ips.get(addr), (None, None))[1] or country).upper())
+                       for addr, protocol, country in working_proxies]
+    
     print(f"🎯 Найдено {len(working_proxies)} рабочих прокси")
     return working_proxies
 
@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""
+Локальные заглушки внешних сервисов и прокси для офлайн-тестов и бенчмарков.
+
+    with GeoStandIn({"1.2.3.4": "US"}) as geo:
+        GeoResolver(batch_url=geo.batch_url).resolve("1.2.3.4")
+
+Для нагрузочных прогонов (tools/bench_validate.py) — ProxyFarm: тысячи
+прокси с задержкой, джиттером, отказами и "чёрными дырами" в одном потоке.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import selectors
+import socket
+import socketserver
+import struct
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def do_GET(self):
+        self.server.service._count(self)
+        self.server.service.handle_get(self, urlsplit(self.path))
+
+    def do_POST(self):
+        self.server.service._count(self)
+        self.server.service.handle_post(self, urlsplit(self.path), self._body())
+
+
+class LocalService:
+    """HTTP-сервер на 127.0.0.1:<случайный порт> в фоновом потоке."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.service = self
+        self.hits = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, handler):
+        path = urlsplit(handler.path).path
+        with self._lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+
+    def handle_get(self, h, url):
+        h._reply(404, {"error": "not found"})
+
+    def handle_post(self, h, url, body):
+        h._reply(404, {"error": "not found"})
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class GeoStandIn(LocalService):
+    """
+    Заглушка ip-api.com: GET /json/<ip> и POST /batch (список IP или {"query": ip}).
+    table: ip -> ISO-код; неизвестные IP отвечают status=fail.
+    """
+
+    def __init__(self, table=None, **kw):
+        super().__init__(**kw)
+        self.table = dict(table or {})
+        self.batch_sizes = []
+
+    @property
+    def batch_url(self):
+        return f"{self.url}/batch?fields=status,country,countryCode,query"
+
+    @property
+    def json_url(self):
+        return self.url + "/json/{ip}?fields=status,country,countryCode,message"
+
+    def _record(self, ip):
+        cc = self.table.get(ip)
+        if not cc:
+            return {"status": "fail", "message": "invalid query", "query": ip}
+        return {"status": "success", "country": f"Country {cc}", "countryCode": cc, "query": ip}
+
+    def handle_get(self, h, url):
+        if url.path.startswith("/json/"):
+            h._reply(200, self._record(url.path[len("/json/"):]))
+        else:
+            super().handle_get(h, url)
+
+    def handle_post(self, h, url, body):
+        if url.path != "/batch":
+            return super().handle_post(h, url, body)
+        items = json.loads(body or b"[]")
+        if len(items) > 100:
+            return h._reply(422, {"message": "too many queries"})
+        self.batch_sizes.append(len(items))
+        ips = [i.get("query") if isinstance(i, dict) else i for i in items]
+        h._reply(200, [self._record(ip) for ip in ips])
+
+
+class EchoStandIn(LocalService):
+    """Эхо-цель для proxy.prober: отвечает {"ip": <адрес клиента>} на любой GET."""
+
+    def __init__(self, ip=None, **kw):
+        super().__init__(**kw)
+        self.ip = ip  # фиксированный ответ вместо адреса клиента
+
+    def handle_get(self, h, url):
+        h._reply(200, {"ip": self.ip or h.client_address[0]})
+
+
+class ListStandIn(LocalService):
+    """
+    Раздаёт списки прокси как GitHub raw / API источников: GET <path> -> текст,
+    с ETag и Last-Modified; на совпавший If-None-Match / If-Modified-Since — 304.
+    lists: path -> текст; менять можно на ходу (set()).
+    """
+
+    def __init__(self, lists=None, **kw):
+        super().__init__(**kw)
+        self.lists = {}
+        self.not_modified = 0
+        for path, text in (lists or {}).items():
+            self.set(path, text)
+
+    def set(self, path, text):
+        body = text.encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        self.lists[path] = (body, etag, formatdate(time.time(), usegmt=True))
+
+    def handle_get(self, h, url):
+        item = self.lists.get(url.path)
+        if item is None:
+            return super().handle_get(h, url)
+        body, etag, modified = item
+        if h.headers.get("If-None-Match") == etag or (
+                not h.headers.get("If-None-Match") and h.headers.get("If-Modified-Since") == modified):
+            with self._lock:
+                self.not_modified += 1
+            h.send_response(304)
+            h.send_header("ETag", etag)
+            h.send_header("Content-Length", "0")
+            h.end_headers()
+            return
+        h.send_response(200)
+        h.send_header("Content-Type", "text/plain; charset=utf-8")
+        h.send_header("ETag", etag)
+        h.send_header("Last-Modified", modified)
+        h.send_header("Content-Length", str(len(body)))
+        h.end_headers()
+        h.wfile.write(body)
+
+
+class GeonodeStandIn(LocalService):
+    """
+    Заглушка proxylist.geonode.com: GET /api/proxy-list с limit/page и фильтрами
+    country, protocols (через запятую), filterUpTime (минимум, %) и speed.
+    records — записи в формате Geonode: {"ip", "port", "country", "protocols",
+    "upTime", "speed" ("fast" | "medium" | "slow")}. delay — c на ответ страницы.
+    """
+
+    def __init__(self, records=(), delay=0.0, **kw):
+        super().__init__(**kw)
+        self.records = list(records)
+        self.delay = delay
+        self.queries = []  # параметры каждого запроса
+
+    @property
+    def api_url(self):
+        return self.url + "/api/proxy-list"
+
+    def handle_get(self, h, url):
+        if url.path != "/api/proxy-list":
+            return super().handle_get(h, url)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        with self._lock:
+            self.queries.append(q)
+        if self.delay:
+            time.sleep(self.delay)
+        rows = self.records
+        if q.get("country"):
+            rows = [r for r in rows if r.get("country") == q["country"].upper()]
+        if q.get("protocols"):
+            want = set(q["protocols"].split(","))
+            rows = [r for r in rows if want & set(r.get("protocols", ()))]
+        if q.get("filterUpTime"):
+            rows = [r for r in rows if r.get("upTime", 0) >= float(q["filterUpTime"])]
+        if q.get("speed"):
+            rows = [r for r in rows if r.get("speed") == q["speed"]]
+        limit, page = int(q.get("limit", 100)), int(q.get("page", 1))
+        h._reply(200, {"data": rows[(page - 1) * limit:page * limit], "total": len(rows), "page": page, "limit": limit})
+
+
+class _ProxyHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        proxy = self.server.proxy
+        sock = self.request
+        sock.settimeout(10)
+        try:
+            target = proxy._handshake(sock)
+            if target is None:
+                return
+            upstream = socket.create_connection(target, timeout=10)
+        except Exception:
+            return
+        proxy._ok(sock)
+        _relay(sock, upstream)
+
+
+def _relay(a, b):
+    sel = selectors.DefaultSelector()
+    sel.register(a, selectors.EVENT_READ, b)
+    sel.register(b, selectors.EVENT_READ, a)
+    try:
+        while True:
+            events = sel.select(timeout=10)
+            if not events:
+                return
+            for key, _mask in events:
+                data = key.fileobj.recv(65536)
+                if not data:
+                    return
+                key.data.sendall(data)
+    except OSError:
+        pass
+    finally:
+        sel.close()
+        b.close()
+
+
+def _recv_exact(sock, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("closed")
+        buf += chunk
+    return buf
+
+
+class FakeProxy:
+    """
+    Локальный прокси: scheme http (CONNECT), socks4/4a или socks5;
+    auth=(user, password) включает проверку логина.
+    """
+
+    def __init__(self, scheme="http", auth=None, host="127.0.0.1", port=0):
+        self.scheme = scheme
+        self.auth = auth
+        self.server = socketserver.ThreadingTCPServer((host, port), _ProxyHandler)
+        self.server.daemon_threads = True
+        self.server.proxy = self
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def _handshake(self, sock):
+        with self._lock:
+            self.connections += 1
+        if self.scheme == "http":
+            return self._http_connect(sock)
+        if self.scheme == "socks4":
+            return self._socks4(sock)
+        return self._socks5(sock)
+
+    def _ok(self, sock):
+        if self.scheme == "http":
+            sock.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        elif self.scheme == "socks4":
+            sock.sendall(b"\x00\x5a" + b"\x00" * 6)
+        else:
+            sock.sendall(b"\x05\x00\x00\x01" + b"\x00" * 6)
+
+    def _http_connect(self, sock):
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return None
+            buf += chunk
+        lines = buf.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")
+        method, target = lines[0].split()[:2]
+        if method != "CONNECT":
+            sock.sendall(b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n")
+            return None
+        if self.auth:
+            token = base64.b64encode(f"{self.auth[0]}:{self.auth[1]}".encode()).decode()
+            if f"Proxy-Authorization: Basic {token}" not in lines:
+                sock.sendall(b"HTTP/1.1 407 Proxy Authentication Required\r\nContent-Length: 0\r\n\r\n")
+                return None
+        host, port = target.rsplit(":", 1)
+        return host, int(port)
+
+    def _socks4(self, sock):
+        head = _recv_exact(sock, 8)
+        port = struct.unpack(">H", head[2:4])[0]
+        user = b""
+        while not user.endswith(b"\x00"):
+            user += _recv_exact(sock, 1)
+        host = socket.inet_ntoa(head[4:8])
+        if head[4:7] == b"\x00\x00\x00":
+            name = b""
+            while not name.endswith(b"\x00"):
+                name += _recv_exact(sock, 1)
+            host = name[:-1].decode("idna")
+        if self.auth and user[:-1].decode() != self.auth[0]:
+            sock.sendall(b"\x00\x5b" + b"\x00" * 6)
+            return None
+        return host, port
+
+    def _socks5(self, sock):
+        n = _recv_exact(sock, 2)[1]
+        methods = _recv_exact(sock, n)
+        if self.auth:
+            if 2 not in methods:
+                sock.sendall(b"\x05\xff")
+                return None
+            sock.sendall(b"\x05\x02")
+            _recv_exact(sock, 1)
+            user = _recv_exact(sock, _recv_exact(sock, 1)[0]).decode()
+            pwd = _recv_exact(sock, _recv_exact(sock, 1)[0]).decode()
+            if (user, pwd) != tuple(self.auth):
+                sock.sendall(b"\x01\x01")
+                return None
+            sock.sendall(b"\x01\x00")
+        else:
+            sock.sendall(b"\x05\x00")
+        _ver, _cmd, _rsv, atyp = _recv_exact(sock, 4)
+        if atyp == 1:
+            host = socket.inet_ntoa(_recv_exact(sock, 4))
+        elif atyp == 4:
+            host = socket.inet_ntop(socket.AF_INET6, _recv_exact(sock, 16))
+        else:
+            host = _recv_exact(sock, _recv_exact(sock, 1)[0]).decode("idna")
+        port = struct.unpack(">H", _recv_exact(sock, 2))[0]
+        return host, port
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name=f"FakeProxy-{self.scheme}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class ProxyFarm:
+    """
+    Много фейковых прокси (HTTP CONNECT/absolute-form GET и SOCKS5 без auth)
+    на одном asyncio-цикле в фоновом потоке — по слушающему порту на прокси.
+
+        with ProxyFarm(seed=1) as farm:
+            addrs = farm.add(100, scheme="socks5", latency=0.05, jitter=0.02)
+            dead = farm.dead(50)
+
+    latency/jitter — задержка ответа на рукопожатие, c; fail_rate — доля
+    соединений, на которые прокси отвечает ошибкой; blackhole — принимает
+    соединение и молчит. Исходящие соединения идут с адреса прокси, поэтому
+    при хостах 127.x.y.z эхо-сервер видит у каждого прокси свой "выходной IP".
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.connections = 0
+        self._servers = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def add(self, n, scheme="http", latency=0.0, jitter=0.0, fail_rate=0.0, blackhole=False, hosts=("127.0.0.1",)):
+        """Запускает n прокси с одинаковым поведением; возвращает [(host, port)]."""
+        profile = {"scheme": scheme, "latency": latency, "jitter": jitter,
+                   "fail_rate": fail_rate, "blackhole": blackhole}
+        return self._run(self._add(n, profile, hosts))
+
+    async def _add(self, n, profile, hosts):
+        out = []
+        for i in range(n):
+            host = hosts[i % len(hosts)]
+            prof = dict(profile, host=host)
+            server = await asyncio.start_server(
+                lambda r, w, prof=prof: self._handle(r, w, prof), host, 0, backlog=64)
+            self._servers.append(server)
+            out.append((host, server.sockets[0].getsockname()[1]))
+        return out
+
+    def dead(self, n, hosts=("127.0.0.1",)):
+        """n адресов, где никто не слушает (connect получает отказ)."""
+        out = []
+        for i in range(n):
+            with socket.socket() as s:
+                s.bind((hosts[i % len(hosts)], 0))
+                out.append(s.getsockname()[:2])
+        return out
+
+    async def _handle(self, reader, writer, prof):
+        self.connections += 1
+        upstream = None
+        try:
+            if prof["blackhole"]:
+                await reader.read()
+                return
+            delay = prof["latency"] + self.rng.uniform(-prof["jitter"], prof["jitter"])
+            if delay > 0:
+                await asyncio.sleep(delay)
+            fail = self.rng.random() < prof["fail_rate"]
+            if prof["scheme"] == "http":
+                target, reply, initial = await self._http_head(reader, fail)
+            else:
+                target, reply, initial = await self._socks5_head(reader, writer, fail)
+            if target is None:
+                writer.write(reply)
+                await writer.drain()
+                return
+            up_reader, upstream = await asyncio.open_connection(*target, local_addr=(prof["host"], 0))
+            if reply:
+                writer.write(reply)
+            if initial:
+                upstream.write(initial)
+            await asyncio.gather(_pipe(reader, upstream), _pipe(up_reader, writer))
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            for w in (upstream, writer):
+                if w is not None:
+                    w.close()
+
+    @staticmethod
+    async def _http_head(reader, fail):
+        head = await reader.readuntil(b"\r\n\r\n")
+        if fail:
+            return None, b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n", b""
+        method, target, version = head.split(b"\r\n", 1)[0].decode("latin-1").split()
+        if method == "CONNECT":
+            host, port = target.rsplit(":", 1)
+            return (host, int(port)), b"HTTP/1.1 200 Connection established\r\n\r\n", b""
+        # обычный HTTP-прокси: GET http://host:port/path -> GET /path
+        u = urlsplit(target)
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        first = f"{method} {path} {version}".encode()
+        return (u.hostname, u.port or 80), b"", first + head[head.index(b"\r\n"):]
+
+    @staticmethod
+    async def _socks5_head(reader, writer, fail):
+        n = (await reader.readexactly(2))[1]
+        await reader.readexactly(n)
+        writer.write(b"\x05\x00")
+        _ver, _cmd, _rsv, atyp = await reader.readexactly(4)
+        if atyp == 1:
+            host = socket.inet_ntoa(await reader.readexactly(4))
+        elif atyp == 4:
+            host = socket.inet_ntop(socket.AF_INET6, await reader.readexactly(16))
+        else:
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode("idna")
+        port = struct.unpack(">H", await reader.readexactly(2))[0]
+        if fail:
+            return None, b"\x05\x01\x00\x01" + b"\x00" * 6, b""
+        return (host, port), b"\x05\x00\x00\x01" + b"\x00" * 6, b""
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ProxyFarm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        async def _close():
+            for server in self._servers:
+                server.close()
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._run(_close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
@@ -1,21 +1,26 @@
 from __future__ import annotations
 import json
-import os
 import platform
 import subprocess
 import time
 from pathlib import Path
 from typing import Optional
 
+import psutil
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 
 def _pid_exists(pid: int) -> bool:
+    # не os.kill(pid, 0): на Windows сигнал 0 — CTRL_C_EVENT, а не проверка
     if pid <= 0:
         return False
-    try:
-        os.kill(pid, 0)
-    except OSError:
-        return False
-    return True
+    return psutil.pid_exists(pid)
 
 
 def _proc_cmdline(pid: int) -> str:
@@ -84,6 +89,14 @@ class ProfileLock:
     def update_pid(self, chrome_pid: int) -> None:
         self.acquire(chrome_pid=chrome_pid)
 
+    def chrome_alive(self, since: float = 0.0) -> Optional[bool]:
+        """Whether the recorded Chrome is alive; None if no PID yet or the lock predates `since`."""
+        data = self.read()
+        pid = data.get("chrome_pid")
+        if not pid or data.get("ts", 0) < since:
+            return None
+        return _pid_exists(pid)
+
     def release_if_dead(self) -> None:
         data = self.read()
         pid = data.get("chrome_pid")
@@ -92,3 +105,50 @@ class ProfileLock:
                 self.lock_path.unlink(missing_ok=True)
             except Exception:
                 pass
+
+
+class FileLock:
+    """Short cross-process lock around a read-modify-write of a shared file; the OS drops it if the holder dies."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fh = None
+
+    def acquire(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, "a+b")
+        try:
+            if msvcrt is not None:
+                fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)  # retries for ~10 s, then raises
+                        break
+                    except OSError:
+                        continue
+            else:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            fh.close()
+            raise
+        self._fh = fh
+
+    def release(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is None:
+            return
+        try:
+            if msvcrt is not None:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            fh.close()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -9,17 +9,33 @@ import time
 import os
 import sys
 import pathlib
-import json
-import re
+import heapq
+import threading
 from typing import Iterable, List, Tuple, Dict, Optional
 import requests
 import concurrent.futures
+from proxy import timeouts, transport
+from proxy.geo import lookup_countries, lookup_country
+from proxy.health import get_book
+from proxy.index import proxy_key
+from proxy.ledger import get_ledger
+from proxy.models import Proxy
+from proxy.prescreen import prescreen_items
+from proxy.prober import default_echo_url, extract_ip
+from proxy.validate import ValidationResult
+from proxy.source_registry import get_registry
+from proxy.sources import FETCH_DEADLINE
 from collections import deque
 from datetime import datetime, timedelta
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 EXEDIR = pathlib.Path(sys.executable).parent if getattr(sys, "frozen", False) else pathlib.Path.cwd()
 
+PICK_WORKERS = 24  # потоков проверки в pick()
+# верхние границы таймаутов; фактические — по наблюдаемым задержкам (proxy.timeouts)
+PROBE_TIMEOUT = 8.0
+QUICK_TIMEOUT = 6.0
+
 # Кеш прокси (TTL 10 минут)
 _proxy_cache = {}
 _cache_ttl = 600  # 10 минут
@@ -81,96 +97,31 @@ def _read_csv_proxies():
                 out.append((hostport, ptype, cc))
     return out
 
-def _gather_from_proxyscrape(types: List[str], country: str = "") -> List[Tuple[str, str, str]]:
-    """Собирает прокси с ProxyScrape API"""
-    try:
-        url = "https://api.proxyscrape.com/v2/?request=get&protocol=http&timeout=10000&country=" + country
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            proxies = []
-            for line in response.text.strip().split('\n'):
-                if ':' in line:
-                    host, port = line.strip().split(':', 1)
-                    proxies.append((f"{host}:{port}", "HTTP", country))
-            return proxies[:50]  # Ограничиваем
-    except Exception:
-        pass
-    return []
-
-def _gather_from_geonode(types: List[str], country: str = "") -> List[Tuple[str, str, str]]:
-    """Собирает прокси с GeoNode API"""
-    try:
-        url = f"https://proxylist.geonode.com/api/proxy-list?limit=50&page=1&sort_by=lastChecked&sort_type=desc&country={country}&protocols=http"
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            proxies = []
-            for proxy in data.get('data', []):
-                host = proxy.get('ip')
-                port = proxy.get('port')
-                country_code = proxy.get('country', '').upper()
-                if host and port:
-                    proxies.append((f"{host}:{port}", "HTTP", country_code))
-            return proxies
-    except Exception:
-        pass
-    return []
-
-def _gather_from_proxylist(types: List[str], country: str = "") -> List[Tuple[str, str, str]]:
-    """Собирает прокси с proxy-list.download"""
-    try:
-        url = "https://www.proxy-list.download/api/v1/get?type=http"
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            proxies = []
-            for line in response.text.strip().split('\n'):
-                if ':' in line:
-                    host, port = line.strip().split(':', 1)
-                    proxies.append((f"{host}:{port}", "HTTP", ""))
-            return proxies[:30]
-    except Exception:
-        pass
-    return []
-
-def _gather_from_free_proxy_list(types: List[str], country: str = "") -> List[Tuple[str, str, str]]:
-    """Собирает прокси с free-proxy-list.net"""
-    try:
-        url = "https://free-proxy-list.net/"
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            # Простой парсинг HTML для поиска IP:PORT
-            proxies = []
-            ip_port_pattern = r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{2,5})'
-            matches = re.findall(ip_port_pattern, response.text)
-            for ip, port in matches[:20]:  # Ограничиваем
-                proxies.append((f"{ip}:{port}", "HTTP", ""))
-            return proxies
-    except Exception:
-        pass
-    return []
+def _scheme_of(proto: str) -> str:
+    return "http" if proto.upper() in ("HTTP", "HTTPS") else proto.lower()
 
-def _gather_candidates(types: List[str], country: str = "") -> List[Tuple[str, str, str]]:
-    """Агрегирует прокси из всех источников"""
+def _gather_candidates(types: List[str], country: str = "", deadline: float = FETCH_DEADLINE,
+                       budget: Optional[int] = None) -> List[Tuple[str, str, str]]:
+    """
+    Агрегирует прокси из всех источников; внешние — одновременно, не дольше deadline
+    (плагины proxy.source_registry). budget — сколько внешних кандидатов взять: делится
+    между источниками по доле живых среди ранее проверенных.
+    """
     all_proxies = []
     
     # 1. Локальный CSV (приоритет)
     csv_proxies = _read_csv_proxies()
     all_proxies.extend(csv_proxies)
     
-    # 2. Внешние источники
-    sources = [
-        _gather_from_proxyscrape,
-        _gather_from_geonode,
-        _gather_from_proxylist,
-        _gather_from_free_proxy_list,
-    ]
-    
-    for source_func in sources:
-        try:
-            proxies = source_func(types, country)
-            all_proxies.extend(proxies)
-        except Exception:
-            continue
+    # 2. Внешние источники — что успело к сроку
+    registry = get_registry()
+    by_source, _reports = registry.gather([_scheme_of(t) for t in types], country, deadline)
+    if budget is None:
+        external = [p for items in by_source.values() for p in items]
+    else:
+        external = registry.allocate(by_source, budget)
+    for p in external:
+        all_proxies.append((f"{p.host}:{p.port}", p.scheme.upper(), p.country or ""))
     
     # Дедупликация по адресу
     seen = set()
@@ -192,31 +143,23 @@ def _probe_enhanced(addr: str, proto: str, want_country: str = "", retries: int
     """
     host, port = addr.split(":", 1)
     scheme = "http" if proto.upper() in ("HTTP", "HTTPS") else proto.lower()
-    proxies = {"http": f"{scheme}://{addr}", "https": f"{scheme}://{addr}"}
+    session = transport.proxy_session(f"{scheme}://{addr}")
     
     start_time = time.time()
+    timeout = timeouts.timeout_for("pick", scheme, PROBE_TIMEOUT)
     
     for attempt in range(retries):
+        t_try = time.time()
         try:
             # Проверяем через ipify.org
-            response = requests.get("https://api.ipify.org?format=json", 
-                                 proxies=proxies, timeout=8, 
-                                 headers={"User-Agent": "Mozilla/5.0"})
+            response = session.get(default_echo_url(), timeout=timeout)
             
             if response.status_code == 200:
-                data = response.json()
-                ip = data.get("ip")
+                ip = extract_ip(response.content)
                 if ip:
+                    timeouts.observe("pick", scheme, (time.time() - t_try) * 1000, True)
                     # Проверяем страну
-                    country = ""
-                    try:
-                        geo_response = requests.get(f"http://ip-api.com/json/{ip}?fields=countryCode", 
-                                                  timeout=5)
-                        if geo_response.status_code == 200:
-                            geo_data = geo_response.json()
-                            country = (geo_data.get("countryCode") or "").upper()
-                    except Exception:
-                        pass
+                    country = (lookup_country(ip)[1] or "").upper()
                     
                     # Если указана страна - проверяем соответствие
                     if want_country and country and country != want_country.upper():
@@ -225,17 +168,37 @@ def _probe_enhanced(addr: str, proto: str, want_country: str = "", retries: int
                     ping_ms = (time.time() - start_time) * 1000
                     return True, country, ping_ms
                     
-        except Exception:
-            if attempt < retries - 1:
-                time.sleep(1)
+        except (requests.exceptions.ConnectTimeout, requests.exceptions.ConnectionError) as e:
+            # соединение не установилось — повтор ничего не даст
+            timeouts.observe("pick", scheme, None, False, str(e))
+            break
+        except Exception as e:
+            # таймаут чтения и т.п. — повторяем сразу, без sleep
+            timeouts.observe("pick", scheme, None, False, str(e))
             continue
     
     return False, "", 0
 
-def pick(country: str = "", types: List[str] = None, need: int = 6, limit_test: int = 160) -> List[Tuple[str, str, str, float]]:
+def _health_key(addr: str, proto: str) -> str:
+    """Ключ в proxy.health — тот же, что у ProxyPool."""
+    host, port = addr.rsplit(":", 1)
+    return proxy_key(Proxy(_scheme_of(proto), host, int(port)))
+
+def _health_key_of(c: Tuple[str, str, str]) -> str:
+    try:
+        return _health_key(c[0], c[1])
+    except ValueError:
+        return ""
+
+def pick(country: str = "", types: List[str] = None, need: int = 6, limit_test: int = 160,
+         max_ping_ms: Optional[float] = None, early_exit: bool = True,
+         candidates: Optional[List[Tuple[str, str, str]]] = None) -> List[Tuple[str, str, str, float]]:
     """
     Основная функция выбора прокси
     Возвращает [(addr, proto, country, ping_ms)]
+    early_exit — остановиться, как только найдено need живых (с ping <= max_ping_ms,
+    если задан); оставшиеся проверки отменяются/бросаются.
+    candidates — готовый список [(addr, proto, cc)] вместо сбора из источников (без кеша).
     """
     types = [t.upper() for t in (types or ["HTTP"])]
     country = country.upper()
@@ -244,60 +207,149 @@ def pick(country: str = "", types: List[str] = None, need: int = 6, limit_test:
     cache_key = (country, tuple(types))
     now = datetime.now()
     
-    if cache_key in _proxy_cache:
+    if candidates is None and cache_key in _proxy_cache:
         cached_data, cache_time = _proxy_cache[cache_key]
         if now - cache_time < timedelta(seconds=_cache_ttl):
             return cached_data[:need]
     
     # Собираем кандидатов
-    candidates = _gather_candidates(types, country)
+    own_candidates = candidates is None
+    if own_candidates:
+        candidates = _gather_candidates(types, country, budget=limit_test)
     if not candidates:
         return []
     
+    # Упавшие подряд ждут своего backoff (proxy.health) — отсеиваем до любой сети
+    book = get_book()
+    candidates = book.allowed(candidates, key_of=_health_key_of)
+    if not candidates:
+        return []
+    
+    # Из источников: живые с годным вердиктом журнала (proxy.ledger) — сразу в результат,
+    # мёртвые — мимо; проверяются только новые и просроченные
+    ledger = get_ledger()
+    reused: List[Tuple[str, str, str, float]] = []
+    if own_candidates:
+        candidates, known = ledger.split(candidates, key_of=_health_key_of)
+        for c, entry in known:
+            cc = (entry.get("cc") or "").upper()
+            if not entry.get("ok") or (country and cc and cc != country):
+                continue
+            if entry.get("ping") is None or (country and not cc):
+                candidates.append(c)  # жив, но пинг или страна под этот запрос не известны — перепроверяем
+                continue
+            reused.append((c[0], c[1], cc, float(entry["ping"])))
+    
+    # Стадия 1: TCP connect по всем кандидатам; до HTTP-проверки доходят отвечающие
+    # и не успевшие получить попытку до дедлайна (untried) — о них ничего не известно
+    candidates, dead, untried = prescreen_items(candidates, lambda c: c[0].rsplit(":", 1))
+    candidates += untried
+    registry = get_registry()
+    # сбоем считаем только настоящий отказ connect: untried в backoff не уходят
+    for c in dead:
+        key = _health_key_of(c)
+        if key:
+            book.record(key, False)
+            registry.record(key, False)  # доля живых у источника — по реальным попыткам
+            ledger.record(key, ValidationResult(False))  # вердикт — только проверенным
+    if not candidates and not reused:
+        return []
+    
+    # Известные по истории быстрые и стабильные — первыми, ненадёжные — в конец;
+    # без истории остаются в порядке TCP connect (сортировка устойчивая)
+    scores = {c[0]: book.score(_health_key(c[0], c[1])) for c in candidates}
+    candidates.sort(key=lambda c: -scores[c[0]])
+    
     # Ограничиваем количество тестов
     candidates = candidates[:limit_test]
     
-    # Параллельная проверка
-    tested_proxies = []
+    # Параллельная проверка; seen_ips общий для 24 потоков — под локом
     seen_ips = set()
+    seen_lock = threading.Lock()
     
     def _test_proxy(proxy_data):
         addr, proto, _ = proxy_data
         ok, real_country, ping = _probe_enhanced(addr, proto, country)
+        key = _health_key(addr, proto)
+        # итог — в статистику источника кандидата (proxy.source_registry);
+        # чужая страна для источника — всё равно живой
+        registry.record(key, ok or bool(real_country), ping if ok else None)
+        ledger.record(key, ValidationResult(ok or bool(real_country), cc=real_country or None,
+                                            ping_ms=int(ping) if ok else None))
+        if ok or not real_country:
+            # чужая страна — прокси жив, в историю здоровья не пишем
+            book.record(key, ok, ping if ok else None)
         if ok:
             ip = addr.split(":")[0]
-            if ip not in seen_ips:
+            with seen_lock:
+                if ip in seen_ips:
+                    return None
                 seen_ips.add(ip)
-                return (addr, proto, real_country, ping)
+            return (addr, proto, real_country, ping)
         return None
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=24) as executor:
-        results = list(executor.map(_test_proxy, candidates))
-        tested_proxies = [r for r in results if r is not None]
+    # top-K по пингу: max-куча (-ping), K = need
+    heap: List[Tuple[float, int, Tuple[str, str, str, float]]] = []
+    good = 0
+    for seq, r in enumerate(reused, start=-len(reused)):
+        ip = r[0].split(":")[0]
+        if ip in seen_ips:
+            continue
+        seen_ips.add(ip)
+        heapq.heappush(heap, (-r[3], seq, r))
+        if len(heap) > need:
+            heapq.heappop(heap)
+        if max_ping_ms is None or r[3] <= max_ping_ms:
+            good += 1
+    if early_exit and good >= need:
+        candidates = []
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=PICK_WORKERS)
+    try:
+        futures = [executor.submit(_test_proxy, c) for c in candidates]
+        for seq, fut in enumerate(concurrent.futures.as_completed(futures)):
+            r = fut.result()
+            if r is None:
+                continue
+            heapq.heappush(heap, (-r[3], seq, r))
+            if len(heap) > need:
+                heapq.heappop(heap)
+            if max_ping_ms is None or r[3] <= max_ping_ms:
+                good += 1
+            if early_exit and good >= need:
+                break
+    finally:
+        # не ждём хвост медленных/мёртвых проверок
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # Сортируем по пингу
-    tested_proxies.sort(key=lambda x: x[3])
+    tested_proxies = sorted((item[2] for item in heap), key=lambda x: x[3])
     
     # Кешируем результат
-    _proxy_cache[cache_key] = (tested_proxies, now)
+    if own_candidates:
+        _proxy_cache[cache_key] = (tested_proxies, now)
     
     return tested_proxies[:need]
 
-def quick_probe(host: str, port: int, proto: str = "HTTP", timeout: int = 6) -> bool:
-    """Быстрая проверка прокси"""
+def quick_probe(host: str, port: int, proto: str = "HTTP", timeout: Optional[float] = None) -> bool:
+    """Быстрая проверка прокси; timeout=None — по наблюдаемым задержкам (proxy.timeouts)"""
+    scheme = "http" if proto.upper() in ("HTTP", "HTTPS") else proto.lower()
+    timeout = timeout or timeouts.timeout_for("quick", scheme, QUICK_TIMEOUT)
+    t0 = time.time()
     try:
-        scheme = "http" if proto.upper() in ("HTTP", "HTTPS") else proto.lower()
-        proxies = {"http": f"{scheme}://{host}:{port}", "https": f"{scheme}://{host}:{port}"}
-        response = requests.get("https://api.ipify.org?format=json", 
-                             proxies=proxies, timeout=timeout, 
-                             headers={"User-Agent": "Mozilla/5.0"})
-        return response.ok and bool(response.json().get("ip"))
-    except Exception:
+        session = transport.proxy_session(f"{scheme}://{host}:{port}")
+        response = session.get(default_echo_url(), timeout=timeout)
+        ok = response.ok and bool(extract_ip(response.content))
+        timeouts.observe("quick", scheme, (time.time() - t0) * 1000 if ok else None, ok)
+        return ok
+    except Exception as e:
+        timeouts.observe("quick", scheme, None, False, str(e))
         return False
 
 # === Proxy Lab helpers ===
 from typing import NamedTuple, Iterable
 import time, concurrent.futures
+from proxy.models import Proxy
+from proxy.async_validate import DEFAULT_CONCURRENCY, validate_many
 
 class ProbeResult(NamedTuple):
     addr: str         # "host:port"
@@ -346,40 +398,43 @@ def parse_lines_to_candidates(text: str, default_type="HTTP", default_cc="") ->
             seen.add(a)
     return uniq
 
-def validate_candidates(cands: Iterable[tuple[str,str,str]], want_cc: str|None=None, timeout=5.0, max_workers=24) -> list[ProbeResult]:
+def validate_candidates(cands: Iterable[tuple[str,str,str]], want_cc: str|None=None, timeout: float|None=None, max_workers=DEFAULT_CONCURRENCY, prescreen=True, echo_url: str|None=None) -> list[ProbeResult]:
     """
-    Проверяем через ipify и cc через ip-api. Быстро и многопоточно.
+    Проверяем через ipify и cc через ip-api. Асинхронно (proxy.async_validate), max_workers — общий лимит.
+    prescreen — сначала быстрый TCP connect, HTTP-проверка только для отвечающих.
+    echo_url — своя эхо-цель (например, локальная) вместо ipify.
+    timeout=None — адаптивный, по задержкам прошлых проверок (proxy.timeouts).
     """
     want_cc = (want_cc or "").upper()
-    def _one(item):
-        addr, proto, cc_meta = item
-        scheme = {"HTTP":"http","HTTPS":"http","SOCKS5":"socks5h","SOCKS4":"socks4a"}.get(proto.upper(),"http")
-        proxies = {"http": f"{scheme}://{addr}", "https": f"{scheme}://{addr}"}
-        t0 = time.perf_counter()
-        try:
-            r = requests.get("https://api.ipify.org?format=json", proxies=proxies, timeout=timeout)
-            if r.status_code != 200:
-                return ProbeResult(addr, proto, None, None, None, False, f"ipify {r.status_code}")
-            ip = (r.json() or {}).get("ip")
-            ping = int((time.perf_counter()-t0)*1000)
-            cc = None
-            try:
-                g = requests.get(f"http://ip-api.com/json/{ip}?fields=countryCode,status", timeout=timeout)
-                if g.ok and (g.json() or {}).get("status") == "success":
-                    cc = (g.json().get("countryCode") or "").upper()
-            except Exception:
-                pass
-            alive = True if ip else False
-            if alive and want_cc and cc and cc != want_cc:
-                return ProbeResult(addr, proto, ip, cc, ping, False, f"CC {cc}!= {want_cc}")
-            return ProbeResult(addr, proto, ip, cc, ping, alive, None)
-        except Exception as e:
-            return ProbeResult(addr, proto, None, None, None, False, str(e))
+    items, out = {}, []
     cands = list(cands)
-    out = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-        for res in ex.map(_one, cands):
-            out.append(res)
+    if prescreen:
+        cands, dead, untried = prescreen_items(cands, lambda c: c[0].rsplit(":", 1))
+        cands += untried  # не успели к дедлайну TCP-стадии — проверяем полностью
+        out.extend(ProbeResult(addr, proto, None, None, None, False, "tcp connect failed") for addr, proto, _cc in dead)
+    for addr, proto, _cc in cands:
+        scheme = {"HTTP": "http", "HTTPS": "http", "SOCKS5": "socks5", "SOCKS4": "socks4"}.get(proto.upper(), "http")
+        try:
+            host, port = addr.rsplit(":", 1)
+            items[addr] = (Proxy(scheme, host, int(port)), proto)
+        except ValueError as e:
+            out.append(ProbeResult(addr, proto, None, None, None, False, str(e)))
+    live = []
+    for p, vr in validate_many([p for p, _ in items.values()], concurrency=max_workers, timeout=timeout, geo=False, echo_url=echo_url, source="proxy_lab"):
+        addr = f"{p.host}:{p.port}"
+        proto = items[addr][1]
+        if not vr.ok:
+            out.append(ProbeResult(addr, proto, None, None, None, False, vr.error))
+        else:
+            live.append((addr, proto, vr))
+    # страны всех живых — одним batch-запросом (proxy.geo), а не запросом на IP
+    geo = lookup_countries([vr.ip for _a, _p, vr in live])
+    for addr, proto, vr in live:
+        cc = (geo.get(vr.ip, (None, None))[1] or "").upper() or None
+        if want_cc and cc and cc != want_cc:
+            out.append(ProbeResult(addr, proto, vr.ip, cc, vr.ping_ms, False, f"CC {cc}!= {want_cc}"))
+            continue
+        out.append(ProbeResult(addr, proto, vr.ip, cc, vr.ping_ms, True, None))
     # живые первыми, сортировка по ping
     out.sort(key=lambda r: (not r.alive, r.ping_ms or 1_000_000))
     return out
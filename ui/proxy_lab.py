@@ -1,21 +1,28 @@
 from __future__ import annotations
 import queue
 import threading
+import time
 import tkinter as tk
 from tkinter import messagebox, ttk
 from typing import Callable, Dict, List, Optional, Tuple
 
+from proxy.ledger import get_ledger
 from proxy.models import Proxy
 from proxy.parse import parse_lines_to_candidates
 from proxy.pool import ProxyPool
+from proxy.source_registry import get_registry
 from proxy.sources import gather_proxies_from_sources
-from proxy.validate import ValidationResult, validate_proxy
+from proxy.async_validate import validate_many
+from proxy.validate import ValidationResult
 from tools.logging_setup import get_logger
 
 log = get_logger(__name__)
 
 ApplyCallback = Callable[[Proxy, Optional[ValidationResult]], None]
-Key = Tuple[str, str, int, str]
+Key = str  # Proxy.key
+
+POLL_INTERVAL_MS = 50    # как часто UI забирает результаты проверки
+DRAIN_BUDGET_S = 0.015   # сколько максимум тратим на разбор очереди за один тик
 
 
 class ProxyLabFrame(ttk.LabelFrame):
@@ -36,6 +43,7 @@ class ProxyLabFrame(ttk.LabelFrame):
 
         self.queue: queue.Queue = queue.Queue()
         self._parsed: List[Proxy] = []
+        self._from_sources = False  # список из источников — годные вердикты журнала не перепроверяем
         self._results: List[Tuple[Proxy, ValidationResult]] = []
         self._result_map: Dict[Key, Tuple[Proxy, ValidationResult]] = {}
         self._tree_map: Dict[Key, str] = {}
@@ -43,6 +51,7 @@ class ProxyLabFrame(ttk.LabelFrame):
         self._ok_index: int = 0
         self._pending_action: Optional[str] = None
         self._validation_total: int = 0
+        self._ok_count: int = 0
 
         self._build()
         self.sync_with_parent(
@@ -130,11 +139,8 @@ class ProxyLabFrame(ttk.LabelFrame):
     def _set_status(self, text: str) -> None:
         self.status_var.set(text)
 
-    def _make_key(self, proxy: Proxy) -> Key:
-        return (proxy.scheme.lower(), proxy.host, int(proxy.port), proxy.username or "")
-
     def _select_in_tree(self, proxy: Proxy) -> None:
-        key = self._make_key(proxy)
+        key = proxy.key
         iid = self._tree_map.get(key)
         if iid:
             self.tree.selection_set(iid)
@@ -180,6 +186,7 @@ class ProxyLabFrame(ttk.LabelFrame):
         self.prog.grid_remove()
         self.btn_parse.config(state="normal")
         self._parsed = proxies
+        self._from_sources = True
         if not proxies:
             self._pending_action = None
             self.btn_val.config(state="disabled")
@@ -204,17 +211,19 @@ class ProxyLabFrame(ttk.LabelFrame):
                 "",
             )
             iid = self.tree.insert("", "end", values=values)
-            self._tree_map[self._make_key(proxy)] = iid
+            self._tree_map[proxy.key] = iid
         self._set_status(f"Найдено {len(proxies)} прокси")
         self._update_apply_button()
 
     def _reset_state(self) -> None:
         self._parsed = []
+        self._from_sources = False
         self._results = []
         self._result_map.clear()
         self._ok_list = []
         self._ok_index = 0
         self._validation_total = 0
+        self._ok_count = 0
         self._pending_action = None if self._pending_action not in {"first", "next"} else self._pending_action
         self.btn_best.config(state="disabled")
         self.btn_next.config(state="disabled")
@@ -243,13 +252,24 @@ class ProxyLabFrame(ttk.LabelFrame):
         self._ok_list = []
         self._ok_index = 0
         self._validation_total = len(self._parsed)
+        self._ok_count = 0
         self.queue = queue.Queue()
-        threading.Thread(target=self._worker_validate, args=(self._parsed,), daemon=True).start()
-        self.after(50, self._poll_results)
-
-    def _worker_validate(self, items: List[Proxy]) -> None:
-        for proxy in items:
-            result = validate_proxy(proxy)
+        threading.Thread(target=self._worker_validate, args=(self._parsed, self._from_sources), daemon=True).start()
+        self.after(POLL_INTERVAL_MS, self._poll_results)
+
+    def _worker_validate(self, items: List[Proxy], reuse: bool = False) -> None:
+        # reuse — годные вердикты журнала (proxy.ledger) сразу,
+        # проверяются только новые и просроченные; вставленный вручную список — всегда заново
+        ledger = get_ledger()
+        if reuse:
+            items, known = ledger.split(items, key_of=lambda p: p.key)
+            for proxy, entry in known:
+                self.queue.put((proxy, ledger.result(entry)))
+        # результаты приходят по мере готовности, не в порядке списка
+        registry = get_registry()
+        for proxy, result in validate_many(items, source="proxy_lab"):
+            registry.record(proxy.key, result.ok, result.ping_ms)  # доля живых у источника
+            ledger.record(proxy.key, result)
             self.queue.put((proxy, result))
         self.queue.put(None)
 
@@ -258,35 +278,50 @@ class ProxyLabFrame(ttk.LabelFrame):
         self._begin_validation(auto=False)
 
     def _poll_results(self) -> None:
-        try:
-            item = self.queue.get_nowait()
-        except queue.Empty:
-            self.after(100, self._poll_results)
-            return
-        if item is None:
+        # забираем всё, что накопилось, но не дольше DRAIN_BUDGET_S за тик — UI остаётся отзывчивым
+        deadline = time.perf_counter() + DRAIN_BUDGET_S
+        batch: List[Tuple[Proxy, ValidationResult]] = []
+        finished = False
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                break
+            batch.append(item)
+            if len(batch) % 64 == 0 and time.perf_counter() > deadline:
+                break
+        if batch:
+            self._apply_results(batch)
+        if finished:
             self._on_validation_complete()
             return
-        proxy, result = item
-        key = self._make_key(proxy)
-        self._results.append((proxy, result))
-        self._result_map[key] = (proxy, result)
-        iid = self._tree_map.get(key)
-        if iid:
-            self.tree.item(
-                iid,
-                values=(
-                    proxy.host,
-                    proxy.scheme,
-                    proxy.port,
-                    proxy.username or "",
-                    proxy.country or "",
-                    result.ping_ms or "",
-                    "yes" if result.ok else "no",
-                ),
-            )
-        ok_count = sum(1 for _p, _r in self._results if _r.ok)
-        self._set_status(f"OK: {ok_count}/{self._validation_total}")
-        self.after(30, self._poll_results)
+        self.after(POLL_INTERVAL_MS, self._poll_results)
+
+    def _apply_results(self, batch: List[Tuple[Proxy, ValidationResult]]) -> None:
+        for proxy, result in batch:
+            key = proxy.key
+            self._results.append((proxy, result))
+            self._result_map[key] = (proxy, result)
+            if result.ok:
+                self._ok_count += 1
+            iid = self._tree_map.get(key)
+            if iid:
+                self.tree.item(
+                    iid,
+                    values=(
+                        proxy.host,
+                        proxy.scheme,
+                        proxy.port,
+                        proxy.username or "",
+                        proxy.country or "",
+                        result.ping_ms or "",
+                        "yes" if result.ok else "no",
+                    ),
+                )
+        self._set_status(f"OK: {self._ok_count} · проверено {len(self._results)}/{self._validation_total}")
 
     def _on_validation_complete(self) -> None:
         self.prog.stop()
@@ -329,7 +364,7 @@ class ProxyLabFrame(ttk.LabelFrame):
         except (ValueError, TypeError):
             return None
         proxy = Proxy(values[1], values[0], port, values[3] or None, None, values[4] or None)
-        key = self._make_key(proxy)
+        key = proxy.key
         data = self._result_map.get(key)
         result = data[1] if data else None
         return proxy, result